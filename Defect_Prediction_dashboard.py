@@ -2,14 +2,20 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import requests
-from requests.auth import HTTPBasicAuth
 import os
 import spacy
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.cluster import KMeans
 import io
 import datetime
-from light_client import LIGHTClient
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict
+from analysis_cache import cached_answer, input_digest, lookup_answer
+from cortex_client import get_cortex_client
+from extract_text_from_adf import extract_text_from_adf
+from jira_client import get_jira_client
 
 # --- Streamlit UI ---
 st.set_page_config(page_title="Defect Prediction Dashboard", layout="wide")
@@ -22,35 +28,8 @@ def extract_text_from_description(desc_dict):
     # If it's already a string, return as-is
     if isinstance(desc_dict, str):
         return desc_dict
-
-    # Walk nested structures (dicts/lists) and collect 'text' fields recursively
-    texts = []
-
-    def _walk(node):
-        if node is None:
-            return
-        
-        if isinstance(node, str):
-            texts.append(node)
-            return
-        if isinstance(node, dict):
-            # If this dict directly contains a text field, collect it
-            if 'text' in node and isinstance(node['text'], str):
-                texts.append(node['text'])
-            # Otherwise, iterate all values
-            for v in node.values():
-                _walk(v)
-            return
-        if isinstance(node, list):
-            for item in node:
-                _walk(item)
-            return
-
-    _walk(desc_dict)
-
-    if texts:
-        # Join collected text fragments with spaces and normalize whitespace
-        return ' '.join(t.strip() for t in texts if t and isinstance(t, str))
+    if isinstance(desc_dict, dict):
+        return extract_text_from_adf(desc_dict)
 
     # Fallback: stringify the object
     return str(desc_dict)
@@ -64,10 +43,9 @@ def fetch_all_projects():
             "Content-Type": "application/json"
         }
         
-        response = requests.get(
+        response = get_jira_client(f"https://{JIRA_DOMAIN}", YOUR_USER, API_TOKEN).get(
             url,
             headers=headers,
-            auth=HTTPBasicAuth(YOUR_USER, API_TOKEN),
             timeout=10
         )
         
@@ -82,98 +60,154 @@ def fetch_all_projects():
         st.error(f"❌ Failed to fetch projects: {str(e)}")
         return []
 
-def fetch_bugs_for_project(project_key):
-    """Fetch all bugs for a specific project from Jira using the new /rest/api/3/search/jql API (POST)."""
-    try:
-        url = f"https://{JIRA_DOMAIN}/rest/api/3/search/jql"
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
+BUG_FIELDS = ["key", "summary", "description", "priority", "created", "status", "resolutiondate", "project"]
+BUG_PAGE_SIZE = 100
+BUG_FETCH_WORKERS = int(os.getenv("BUG_FETCH_WORKERS", "6"))  # projects fetched concurrently (requests still go through the Jira rate limit)
+BUG_JQL_PROJECTS_PER_QUERY = 50  # combined mode: project keys per "project in (...)" query
+
+def bug_from_issue(issue):
+    fields = issue.get('fields', {})
+    return {
+        'key': issue.get('key', 'Unknown'),
+        'summary': fields.get('summary', 'N/A'),
+        'description': fields.get('description', ''),
+        'priority': (fields.get('priority') or {}).get('name', 'N/A'),
+        'created': fields.get('created', ''),
+        'status': (fields.get('status') or {}).get('name', 'N/A'),
+        'resolutiondate': fields.get('resolutiondate', None),
+        'project': (fields.get('project') or {}).get('key') or issue.get('key', '').split('-')[0]
+    }
 
+def search_bugs(jql):
+    """
+    All issues matching `jql`, following nextPageToken until the last page.
+    Raises requests.HTTPError on a non-200 response; safe to call from worker threads (no Streamlit calls).
+    """
+    url = f"https://{JIRA_DOMAIN}/rest/api/3/search/jql"
+    headers = {
+        "Accept": "application/json",
+        "Content-Type": "application/json"
+    }
+    client = get_jira_client(f"https://{JIRA_DOMAIN}", YOUR_USER, API_TOKEN)
+    bugs = []
+    page_token = None
+    while True:
         # Use issuetype filter and POST body per Jira migration guidance
-        jql = f'project = "{project_key}" AND issuetype = Bug'
         payload = {
             "jql": jql,
-            "maxResults": 200,
+            "maxResults": BUG_PAGE_SIZE,
             # request resolutiondate so we can compute aging
-            "fields": ["key", "summary", "description", "priority", "created", "status", "resolutiondate"]
+            "fields": BUG_FIELDS
         }
-
-        response = requests.post(
-            url,
-            headers=headers,
-            json=payload,
-            auth=HTTPBasicAuth(YOUR_USER, API_TOKEN),
-            timeout=30
-        )
-
-        # Handle migration / removed API message explicitly
-        if response.status_code == 410:
-            st.error("❌ Jira API endpoint removed (410). Please ensure your Jira instance supports /rest/api/3/search/jql. See: https://developer.atlassian.com/changelog/#CHANGE-2046")
-            return []
-
+        if page_token:
+            payload["nextPageToken"] = page_token
+        response = client.post(url, headers=headers, json=payload, timeout=30, idempotent=True)  # a search; safe to resend
         if response.status_code != 200:
-            st.error(f"❌ Error fetching bugs: {response.status_code} - {response.text}")
-            return []
-
+            raise requests.HTTPError(f"{response.status_code} - {response.text}", response=response)
         data = response.json()
-        issues = data.get('issues', [])
-
-        bugs = []
-        for issue in issues:
-            fields = issue.get('fields', {})
-            bug = {
-                'key': issue.get('key', 'Unknown'),
-                'summary': fields.get('summary', 'N/A'),
-                'description': fields.get('description', ''),
-                'priority': fields.get('priority', {}).get('name', 'N/A'),
-                'created': fields.get('created', ''),
-                'status': fields.get('status', {}).get('name', 'N/A'),
-                'resolutiondate': fields.get('resolutiondate', None)
-            }
-            bugs.append(bug)
-
-        return bugs
-
-    except requests.exceptions.RequestException as e:
+        bugs.extend(bug_from_issue(issue) for issue in data.get('issues', []))
+        page_token = data.get('nextPageToken')
+        if data.get('isLast') or not page_token:
+            return bugs
+
+def _report_fetch_error(e):
+    # Handle migration / removed API message explicitly
+    if isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code == 410:
+        st.error("❌ Jira API endpoint removed (410). Please ensure your Jira instance supports /rest/api/3/search/jql. See: https://developer.atlassian.com/changelog/#CHANGE-2046")
+    elif isinstance(e, requests.HTTPError):
+        st.error(f"❌ Error fetching bugs: {e}")
+    elif isinstance(e, requests.exceptions.RequestException):
         st.error(f"❌ Network/Request error fetching bugs: {e}")
-        return []
-    except Exception as e:
+    else:
         st.error(f"❌ Failed to fetch bugs: {str(e)}")
+
+def fetch_bugs_for_project(project_key):
+    """Fetch all bugs for a specific project from Jira using the new /rest/api/3/search/jql API (POST)."""
+    try:
+        return search_bugs(f'project = "{project_key}" AND issuetype = Bug')
+    except Exception as e:
+        _report_fetch_error(e)
         return []
 
+def fetch_bugs_for_projects(project_keys, combined=False, on_progress=None):
+    """
+    Fetch bugs for many projects with a bounded thread pool, each query fully paginated.
+    combined=True sends one `project in (...)` query per BUG_JQL_PROJECTS_PER_QUERY projects
+    instead of one query per project. on_progress(done, total, label, count) is called from
+    the calling (Streamlit) thread as queries finish. Returns (bugs, [(label, error), ...]).
+    """
+    if combined:
+        queries = []
+        for i in range(0, len(project_keys), BUG_JQL_PROJECTS_PER_QUERY):
+            group = project_keys[i:i + BUG_JQL_PROJECTS_PER_QUERY]
+            keys = ", ".join('"' + key + '"' for key in group)
+            label = f"{group[0]}–{group[-1]} ({len(group)} projects)" if len(group) > 1 else group[0]
+            queries.append((label, f'project in ({keys}) AND issuetype = Bug'))
+    else:
+        queries = [(key, f'project = "{key}" AND issuetype = Bug') for key in project_keys]
+
+    bugs, errors = [], []
+    if not queries:
+        return bugs, errors
+    with ThreadPoolExecutor(max_workers=max(1, min(BUG_FETCH_WORKERS, len(queries)))) as pool:
+        futures = {pool.submit(search_bugs, jql): label for label, jql in queries}
+        for done, future in enumerate(as_completed(futures), 1):
+            label = futures[future]
+            try:
+                found = future.result()
+                bugs.extend(found)
+            except Exception as e:
+                found = []
+                errors.append((label, e))
+            if on_progress:
+                on_progress(done, len(queries), label, len(found))
+    return bugs, errors
+
 # --- Cortex API Call to Get Root Cause / Preventive Recommendations ---
 def call_model(model_name: str, prompt: str) -> str:
-    url = f"{CORTEX_BASE}/model/ask/{model_name}"
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    response = client.post(url, data={"q": prompt}, headers=headers)
-    response.raise_for_status()
-    msg = response.json().get("message", "").strip()
+    msg = get_cortex_client().ask(model_name, prompt)
     if not msg:
         raise ValueError("Model returned empty output.")
     return msg
 
-def get_root_cause(description: str) -> str:
-    prompt = f"The following is a defect description from a Jira issue. What could be the root cause of this issue? Description: '{description}'"
-    try:
-        response_text = call_model(GENERATOR_MODEL_NAME, prompt)
-        return response_text
-    except Exception as e:
-        st.error(f"Error during model call: {e}")
-        return "Unknown Root Cause"
+def root_cause_prompt(description):
+    return f"The following is a defect description from a Jira issue. What could be the root cause of this issue? Description: '{description}'"
+
+def recommendations_prompt(root_cause_or_category, description=""):
+    return (
+        f"The following is the root cause analysis of a defect: '{root_cause_or_category}'. "
+        f"Defect description (optional): '{(description or '')[:1000]}'. "
+        "Based on this specific root cause, what are the most important prevention and solution steps? "
+        "Provide 3-5 specific, actionable recommendations."
+    )
 
-def get_preventive_recommendations(root_cause_or_category, description="", high_level_cause="", contributing_factor="") -> str:
+def get_preventive_recommendations(root_cause_or_category, description="", high_level_cause="", contributing_factor="", defect_key=None, raise_errors=False) -> str:
     """
     Generate preventive recommendations based on:
     1. Root cause hierarchy (for ALM mode)
-    2. AI-generated root cause analysis
+    2. AI-generated root cause analysis (cached on disk per defect)
     
     Combines both for comprehensive prevention strategy.
+    If the model call fails, only the hierarchy part is returned, unless `raise_errors` is set.
     """
     if not root_cause_or_category or root_cause_or_category == "Unknown Root Cause":
         return "No recommendations available for unknown root cause."
     
+    # Get AI-based recommendations from root cause analysis
+    prompt = recommendations_prompt(root_cause_or_category, description)
+    response_text = None
+    try:
+        response_text = cached_answer("recommendations", defect_key, GENERATOR_MODEL_NAME, prompt, lambda: call_model(GENERATOR_MODEL_NAME, prompt))
+    except Exception as e:
+        if raise_errors:
+            raise
+        # Silent fallback if AI call fails
+        pass
+    
+    return combine_recommendations(high_level_cause, contributing_factor, response_text)
+
+def combine_recommendations(high_level_cause, contributing_factor, ai_recommendations) -> str:
+    """The ALM hierarchy recommendations for the cause followed by the model's; either may be missing."""
     recommendations_list = []
     
     # Step 1: Get hierarchy-based recommendations for ALM
@@ -183,21 +217,10 @@ def get_preventive_recommendations(root_cause_or_category, description="", high_
             recommendations_list.append("**Based on Root Cause Hierarchy:**")
             recommendations_list.append(hierarchy_recs)
     
-    # Step 2: Get AI-based recommendations from root cause analysis
-    prompt = (
-        f"The following is the root cause analysis of a defect: '{root_cause_or_category}'. "
-        f"Defect description (optional): '{(description or '')[:1000]}'. "
-        "Based on this specific root cause, what are the most important prevention and solution steps? "
-        "Provide 3-5 specific, actionable recommendations."
-    )
-    try:
-        response_text = call_model(GENERATOR_MODEL_NAME, prompt)
-        if response_text:
-            recommendations_list.append("\n**Based on Root Cause Analysis:**")
-            recommendations_list.append(response_text)
-    except Exception as e:
-        # Silent fallback if AI call fails
-        pass
+    # Step 2: AI-based recommendations from root cause analysis
+    if ai_recommendations:
+        recommendations_list.append("\n**Based on Root Cause Analysis:**")
+        recommendations_list.append(ai_recommendations)
     
     # If we have recommendations, return combined result
     if recommendations_list:
@@ -607,11 +630,8 @@ if not st.session_state.jira_configured:
 YOUR_USER = st.session_state.stored_email
 JIRA_DOMAIN = st.session_state.stored_jira_url.replace("https://", "").replace("http://", "")
 API_TOKEN = st.session_state.stored_api_token
-CORTEX_BASE = "https://api.cortex.lilly.com"
 GENERATOR_MODEL_NAME = "jira-automation-lilly-openai-v21"
 
-client = LIGHTClient()
-
 # --- Display Configuration Status ---
 st.success(f"✅ Connected to Jira | Email: {YOUR_USER}")
 if st.button("🔄 Change Jira Configuration"):
@@ -631,14 +651,58 @@ if mode is None:
     st.info("ℹ️ Please select a data source above to continue.")
     st.stop()
 
+# --- NLP preprocessing ---
+SPACY_MODEL = "en_core_web_sm"
+NLP_BATCH_SIZE = int(os.getenv("NLP_BATCH_SIZE", "256"))
+NLP_PROCESSES = int(os.getenv("NLP_PROCESSES", "1"))  # >1 lemmatises in worker processes (spaCy n_process)
+LEMMA_CACHE_SIZE = int(os.getenv("LEMMA_CACHE_SIZE", "50000"))
+
+@st.cache_resource
+def load_nlp():
+    """spaCy model loaded once per server; parser and NER are not needed for lemmas and stop words."""
+    return spacy.load(SPACY_MODEL, disable=["parser", "ner"])
+
+@st.cache_resource
+def get_lemma_cache():
+    """Cleaned lemma text per description (keyed by text hash), shared across reruns and sessions."""
+    return {"entries": OrderedDict(), "lock": threading.Lock()}
+
+def lemmatize_descriptions(texts):
+    """
+    Lemmatise descriptions (alphabetic, non-stop-word tokens), reusing cached results and
+    running only unseen texts through nlp.pipe in batches.
+    """
+    cache = get_lemma_cache()
+    entries, lock = cache["entries"], cache["lock"]
+    keys = [hashlib.sha1(text.encode("utf-8")).hexdigest() for text in texts]
+    results = {}
+    missing = {}
+    with lock:
+        for key, text in zip(keys, texts):
+            if key in entries:
+                entries.move_to_end(key)
+                results[key] = entries[key]
+            else:
+                missing[key] = text
+
+    if missing:
+        docs = load_nlp().pipe(missing.values(), batch_size=NLP_BATCH_SIZE, n_process=NLP_PROCESSES)
+        for key, doc in zip(missing, docs):
+            results[key] = " ".join(token.lemma_ for token in doc if token.is_alpha and not token.is_stop)
+        with lock:
+            for key in missing:
+                entries[key] = results[key]
+            while len(entries) > LEMMA_CACHE_SIZE:
+                entries.popitem(last=False)
+
+    return [results[key] for key in keys]
+
 # Function to preprocess descriptions
 def preprocess_descriptions(bugs, desc_field='description', key_field='key', is_alm_manual=False):
     """
     When is_alm_manual=True, prefer 'Root Cause Description' as description and 'Root Cause Category' as summary/category
     """
-    nlp = spacy.load("en_core_web_sm")
-    processed = []
-    valid_bugs = []
+    candidates = []
     
     for bug in bugs:
         # For ALM/manual uploads always use 'Root Cause Description' for clustering, fallback to empty string
@@ -661,10 +725,12 @@ def preprocess_descriptions(bugs, desc_field='description', key_field='key', is_
             # Skip if no usable description
             continue
 
-        doc = nlp(str(desc))
-        tokens = [token.lemma_ for token in doc if token.is_alpha and not token.is_stop]
-        cleaned = " ".join(tokens)
+        candidates.append((bug, key, desc))
 
+    processed = []
+    valid_bugs = []
+    lemmas = lemmatize_descriptions([desc for _, _, desc in candidates])
+    for (bug, key, desc), cleaned in zip(candidates, lemmas):
         if cleaned.strip():
             processed.append(cleaned)
             # ensure key field present for downstream
@@ -697,6 +763,139 @@ def cluster_defects(descriptions, bugs, num_clusters=3):
     return bugs
 
 # Function to display bug analysis
+DETAIL_PAGE_SIZE = int(os.getenv("DETAIL_PAGE_SIZE", "10"))  # defects per page in the detailed view
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))  # concurrent model calls for "Analyse this page"
+
+def analyse_defect(defect_id, description, high_level, contributing):
+    """
+    Root cause and recommendations for one defect (both cached on disk). Raises if either model
+    call fails; makes no Streamlit calls, so it can run in worker threads.
+    """
+    prompt = root_cause_prompt(description)
+    root_cause = cached_answer("root_cause", defect_id, GENERATOR_MODEL_NAME, prompt, lambda: call_model(GENERATOR_MODEL_NAME, prompt))
+    recommendations = get_preventive_recommendations(
+        root_cause, description, high_level_cause=high_level, contributing_factor=contributing, defect_key=defect_id, raise_errors=True,
+    )
+    return root_cause, recommendations
+
+def stored_defect_analysis(defect_id, description, high_level, contributing):
+    """A previously computed analysis from the disk cache, or None; never calls the model."""
+    root_cause = lookup_answer("root_cause", defect_id, GENERATOR_MODEL_NAME, root_cause_prompt(description))
+    if root_cause is None:
+        return None
+    recommendations = lookup_answer("recommendations", defect_id, GENERATOR_MODEL_NAME, recommendations_prompt(root_cause, description))
+    if recommendations is None:
+        return None
+    return root_cause, combine_recommendations(high_level, contributing, recommendations)
+
+def defect_fields(row, is_jira_mode):
+    """(defect id, summary, description, root cause category) of a row, by mode."""
+    if is_jira_mode:
+        return (row.get('key', 'N/A'), row.get('summary', 'N/A'), row.get('description', ''), row.get('mapped_category', 'Unknown'))
+    # ALM/Manual upload mode
+    return (
+        row.get('Defect Id', row.get('key', 'N/A')),
+        row.get('summary', row.get('Root Cause Category', 'N/A')),
+        row.get('description', row.get('Root Cause Description', '')),
+        row.get('mapped_category', row.get('Root Cause Category', 'Unknown')),
+    )
+
+BULK_ANALYSIS_WORKERS = int(os.getenv("BULK_ANALYSIS_WORKERS", "6"))  # concurrent defects in a bulk analysis job
+BULK_EXPORT_COLUMNS = ["Defect ID", "Summary", "High Level Cause", "Contributing Factor", "Root Cause", "Recommendations", "Error"]
+
+class BulkAnalysisJob:
+    """
+    Root cause + recommendations for many defects on a bounded thread pool, kept in session state
+    so it survives reruns. Workers only touch this object (never Streamlit); the page polls it.
+    """
+
+    def __init__(self, defects, workers=BULK_ANALYSIS_WORKERS):
+        self.total = len(defects)
+        self.results = []
+        self.lock = threading.Lock()
+        self.finished_shown = False
+        self.executor = ThreadPoolExecutor(max_workers=max(1, min(workers, self.total or 1)))
+        self.futures = [self.executor.submit(self._analyse, defect) for defect in defects]
+        self.executor.shutdown(wait=False)
+
+    def _analyse(self, defect):
+        row = {
+            "Defect ID": defect["defect_id"],
+            "Summary": defect["summary"],
+            "High Level Cause": defect["high_level"],
+            "Contributing Factor": defect["contributing"],
+            "Root Cause": "",
+            "Recommendations": "",
+            "Error": "",
+        }
+        try:
+            row["Root Cause"], row["Recommendations"] = analyse_defect(defect["defect_id"], defect["description"], defect["high_level"], defect["contributing"])
+        except Exception as e:
+            row["Error"] = str(e)
+        with self.lock:
+            self.results.append(row)
+
+    @property
+    def running(self):
+        return not all(future.done() for future in self.futures)
+
+    def cancel(self):
+        for future in self.futures:
+            future.cancel()
+
+    def results_frame(self):
+        with self.lock:
+            return pd.DataFrame(list(self.results), columns=BULK_EXPORT_COLUMNS)
+
+def start_bulk_analysis(df, is_jira_mode):
+    defects = []
+    for _, row in df.iterrows():
+        defect_id, defect_summary, defect_description, _ = defect_fields(row, is_jira_mode)
+        defects.append({
+            "defect_id": defect_id,
+            "summary": defect_summary,
+            "description": defect_description,
+            "high_level": row.get('mapped_category', 'Unknown'),
+            "contributing": row.get('contributing_factor', 'Unknown'),
+        })
+    st.session_state['bulk_analysis_job'] = BulkAnalysisJob(defects)
+
+def bulk_results_excel(results_df):
+    excel_file = io.BytesIO()
+    with pd.ExcelWriter(excel_file, engine='openpyxl') as writer:
+        results_df.to_excel(writer, index=False, sheet_name='Defect Analysis')
+    return excel_file.getvalue()
+
+def show_bulk_analysis():
+    """Progress, results and exports of the session's bulk analysis job; polls while it runs."""
+    job = st.session_state.get('bulk_analysis_job')
+    if job is None:
+        return
+
+    @st.fragment(run_every=2 if job.running else None)
+    def bulk_progress():
+        results_df = job.results_frame()
+        done = len(results_df)
+        if job.running:
+            st.progress(done / job.total if job.total else 1.0, text=f"Analysed {done}/{job.total} defects...")
+            if st.button("⏹️ Cancel bulk analysis", key="bulk_cancel"):
+                job.cancel()
+        elif not job.finished_shown:
+            # one full rerun so the page stops polling and shows the final state
+            job.finished_shown = True
+            st.rerun()
+        else:
+            failed = int((results_df["Error"] != "").sum())
+            st.success(f"✅ Bulk analysis finished: {done}/{job.total} defects analysed" + (f", {failed} failed" if failed else ""))
+        st.dataframe(results_df, width='stretch')
+        if not job.running and done:
+            export_col1, export_col2 = st.columns(2)
+            export_col1.download_button("⬇️ Download CSV", results_df.to_csv(index=False).encode("utf-8-sig"), file_name="defect_analysis.csv", mime="text/csv")
+            export_col2.download_button("⬇️ Download Excel", bulk_results_excel(results_df), file_name="defect_analysis.xlsx",
+                                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+    bulk_progress()
+
 def display_bug_analysis(df, is_jira_mode=False):
     # Add month column
     df = add_month_column(df, date_col='created')
@@ -738,23 +937,62 @@ def display_bug_analysis(df, is_jira_mode=False):
     # Show all fields for both Jira and ALM/manual modes to provide full context
     st.dataframe(df.head(50), width='stretch')
 
+    # --- Bulk analysis of every filtered defect ---
+    st.subheader("⚡ Bulk Analysis")
+    job = st.session_state.get('bulk_analysis_job')
+    if job is None or not job.running:
+        if st.button(f"⚡ Analyse all {len(df)} filtered defects", key="bulk_start"):
+            start_bulk_analysis(df, is_jira_mode)
+    show_bulk_analysis()
+    # The per-defect buttons would repeat model calls the bulk job is already making
+    bulk_job = st.session_state.get('bulk_analysis_job')
+    bulk_running = bulk_job is not None and bulk_job.running
+
     # --- Enhanced Preventive Recommendations with Full Defect Details ---
     st.subheader("💡 Defect Analysis & Prevention Recommendations")
+    # Paginated and lazy: model calls only happen for defects the user asks to analyse;
+    # results already in the analysis cache are shown straight away
+    total_pages = max(1, -(-len(df) // DETAIL_PAGE_SIZE))
+    if st.session_state.get("detail_page", 1) > total_pages:
+        # filters can shrink the result below the page the user was on
+        st.session_state["detail_page"] = total_pages
+    page = st.number_input(f"Page (of {total_pages}, {DETAIL_PAGE_SIZE} defects per page)", min_value=1, max_value=total_pages, step=1, key="detail_page")
+    page_df = df.iloc[(page - 1) * DETAIL_PAGE_SIZE:page * DETAIL_PAGE_SIZE]
+
+    analyses = st.session_state.setdefault('defect_analyses', {})
+    page_defects = []
+    for idx, row in page_df.iterrows():
+        defect_id, defect_summary, defect_description, root_cause_category = defect_fields(row, is_jira_mode)
+        high_level = row.get('mapped_category', 'Unknown')
+        contributing = row.get('contributing_factor', 'Unknown')
+        analysis_key = input_digest(defect_id, defect_description, high_level, contributing)
+        if analysis_key not in analyses:
+            stored = stored_defect_analysis(defect_id, defect_description, high_level, contributing)
+            if stored is not None:
+                analyses[analysis_key] = stored
+        page_defects.append((idx, row, analysis_key))
+
+    pending = [(idx, row, key) for idx, row, key in page_defects if key not in analyses]
+    if bulk_running:
+        st.info("Per-defect analysis is disabled while the bulk analysis is running.")
+    if pending and st.button(f"🔎 Analyse all {len(pending)} remaining defects on this page", key=f"analyse_page_{page}", disabled=bulk_running):
+        with st.spinner(f"Analyzing {len(pending)} defects..."):
+            with ThreadPoolExecutor(max_workers=max(1, min(ANALYSIS_WORKERS, len(pending)))) as pool:
+                futures = {}
+                for idx, row, key in pending:
+                    defect_id, _, defect_description, _ = defect_fields(row, is_jira_mode)
+                    futures[pool.submit(analyse_defect, defect_id, defect_description, row.get('mapped_category', 'Unknown'), row.get('contributing_factor', 'Unknown'))] = (key, defect_id)
+                for future in as_completed(futures):
+                    key, defect_id = futures[future]
+                    try:
+                        analyses[key] = future.result()
+                    except Exception as e:
+                        st.error(f"Error during model call for {defect_id}: {e}")
     st.write("---")
     
-    for idx, row in df.iterrows():
+    for idx, row, analysis_key in page_defects:
         # Extract key fields based on mode
-        if is_jira_mode:
-            defect_id = row.get('key', 'N/A')
-            defect_summary = row.get('summary', 'N/A')
-            defect_description = row.get('description', '')
-            root_cause_category = row.get('mapped_category', 'Unknown')
-        else:
-            # ALM/Manual upload mode
-            defect_id = row.get('Defect Id', row.get('key', 'N/A'))
-            defect_summary = row.get('summary', row.get('Root Cause Category', 'N/A'))
-            defect_description = row.get('description', row.get('Root Cause Description', ''))
-            root_cause_category = row.get('mapped_category', row.get('Root Cause Category', 'Unknown'))
+        defect_id, defect_summary, defect_description, root_cause_category = defect_fields(row, is_jira_mode)
         
         # Create expandable section for each defect
         # For ALM/manual mode show a snippet of the Description in the expander title
@@ -787,9 +1025,24 @@ def display_bug_analysis(df, is_jira_mode=False):
             
             # Root Cause Analysis Section
             st.subheader("🔎 Root Cause Analysis")
-            with st.spinner(f"Analyzing root cause for {defect_id}..."):
-                root_cause = get_root_cause(defect_description)
-            st.write(f"**Root Cause:** {root_cause}")
+            analysis = analyses.get(analysis_key)
+            if analysis is None and st.button("🔎 Analyse", key=f"analyse_{idx}", disabled=bulk_running):
+                with st.spinner(f"Analyzing root cause for {defect_id}..."):
+                    try:
+                        analysis = analyses[analysis_key] = analyse_defect(
+                            defect_id,
+                            defect_description,
+                            row.get('mapped_category', 'Unknown'),
+                            row.get('contributing_factor', 'Unknown')
+                        )
+                    except Exception as e:
+                        st.error(f"Error during model call: {e}")
+            if analysis is None:
+                st.info("Click Analyse to generate the root cause and prevention recommendations for this defect.")
+                root_cause, recommendations = None, None
+            else:
+                root_cause, recommendations = analysis
+                st.write(f"**Root Cause:** {root_cause}")
             
             # Mapped Category Info - Detailed hierarchy for both modes
             st.subheader("📊 Root Cause Analysis Hierarchy")
@@ -813,25 +1066,15 @@ def display_bug_analysis(df, is_jira_mode=False):
                 st.write(f"**Root Cause Description:** {row.get('Root Cause Description', 'N/A')}")
             
             # Prevention & Solution Section
-            st.subheader("✅ Defect Prevention & Solution")
-            with st.spinner(f"Generating prevention recommendations for {defect_id}..."):
-                # Use hierarchy-based recommendations for both Jira and ALM modes
-                high_level = row.get('mapped_category', 'Unknown')
-                contributing = row.get('contributing_factor', 'Unknown')
+            if recommendations is not None:
+                st.subheader("✅ Defect Prevention & Solution")
                 # For ALM/manual uploads, present the ALM defect Description as the Summary here
                 if not is_jira_mode:
                     st.write(f"**Summary:** {defect_description}")
                 # Show the Description used to generate recommendations (explicit label)
                 st.write(f"**Description Used For Recommendations:** {defect_description}")
-                recommendations = get_preventive_recommendations(
-                    root_cause,
-                    defect_description,
-                    high_level_cause=high_level,
-                    contributing_factor=contributing
-                )
-            
-            st.write("**Recommended Preventive Actions:**")
-            st.write(recommendations)
+                st.write("**Recommended Preventive Actions:**")
+                st.write(recommendations)
             
             # Additional Context
             st.subheader("📌 Additional Context")
@@ -1081,20 +1324,18 @@ if mode == "Fetch Bugs from Jira":
         if selected_project:
             # If user chooses All Projects, fetch bugs across every project and aggregate
             if selected_project == "All Projects":
+                combined_jql = st.checkbox("Use a single combined JQL query (project in (...))", value=False)
                 if st.button("🔍 Fetch Bugs for All Projects"):
-                    with st.spinner("Fetching bugs from all Jira projects..."):
-                        all_bugs = []
-                        for p in projects:
-                            key = p.get('key')
-                            try:
-                                bugs = fetch_bugs_for_project(key)
-                                if bugs:
-                                    # tag each bug with its project key for clarity
-                                    for b in bugs:
-                                        b['project'] = key
-                                    all_bugs.extend(bugs)
-                            except Exception as e:
-                                st.warning(f"Failed to fetch for project {key}: {e}")
+                    progress = st.progress(0.0, text="Fetching bugs from all Jira projects...")
+
+                    def show_progress(done, total, label, count):
+                        progress.progress(done / total, text=f"Fetched {label}: {count} bugs ({done}/{total})")
+
+                    project_keys = [p.get('key') for p in projects if p.get('key')]
+                    all_bugs, fetch_errors = fetch_bugs_for_projects(project_keys, combined=combined_jql, on_progress=show_progress)
+                    progress.empty()
+                    for label, e in fetch_errors:
+                        st.warning(f"Failed to fetch for project {label}: {e}")
 
                     if all_bugs:
                         st.subheader(f"✅ Fetched {len(all_bugs)} bugs across {len(projects)} projects")
@@ -45,6 +45,7 @@ const GenerateButton = ({
   const generateTestScriptsHandler = async () => {
     try {
       let context_json = {};
+      let contextId;
 
       // 🧠 Manual input (include regardless of generationType if provided)
       const manualInput = manualInputRef?.current?.value?.trim();
@@ -60,10 +61,13 @@ const GenerateButton = ({
       // 🧠 Case 2: File uploaded (from fileContext)
       if (fileContext && Object.keys(fileContext).length > 0) {
         // fileContext is the response from /upload_context
-        // so it looks like { filename: "...", context: "...", message: "..." }
+        // so it looks like { filename: "...", context: "...", message: "...", context_id: "..." }
 
-        // If it's a JSON file, parse the context string safely
-        if (fileContext.filename?.endsWith(".json")) {
+        // The server keeps the extracted text; send its id instead of the whole document
+        if (fileContext.context_id) {
+          contextId = fileContext.context_id;
+        } else if (fileContext.filename?.endsWith(".json")) {
+          // If it's a JSON file, parse the context string safely
           try {
             context_json["file_context"] = JSON.parse(fileContext.context);
           } catch (e) {
@@ -93,6 +97,7 @@ const GenerateButton = ({
         description: selectedStory?.description,
         requirement_text: selectedStory?.acceptance_criteria,
         context_json: context_json,
+        context_id: contextId,
       });
       if (generationType === "manual") {
         // User is generating the test scripts manually
@@ -100,7 +105,8 @@ const GenerateButton = ({
         endpoint = "generate-test-script-from-manual-input";
         body = JSON.stringify({
           manual_input: context_json["manual_input"],
-          context: context_json["file_context"] || "No context provided",
+          context: context_json["file_context"] || (contextId ? undefined : "No context provided"),
+          context_id: contextId,
         });
       }
       const resp = await fetch(`${config.fetchUrl}/${endpoint}`, {
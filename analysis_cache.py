@@ -0,0 +1,94 @@
+import hashlib
+import os
+import time
+
+from dotenv import load_dotenv
+
+from sqlite_store import SQLiteStore, lazy_singleton
+
+load_dotenv()
+
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", os.path.join(".cache", "analysis_cache.sqlite3"))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "20000"))
+
+
+def input_digest(*parts) -> str:
+    """Hash of everything a model answer depends on (the prompt, so a changed description or template misses)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part or "").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class AnalysisCache(SQLiteStore):
+    """
+    Disk-backed cache of the dashboard's per-defect model answers (root cause, recommendations).
+    One row per (kind, defect key, model); a row is reused only while its input digest matches,
+    and storing a new answer for a defect replaces the old one.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS analyses ("
+        " kind TEXT NOT NULL, defect_key TEXT NOT NULL, model TEXT NOT NULL, input_digest TEXT NOT NULL,"
+        " value TEXT NOT NULL, accessed_at REAL NOT NULL,"
+        " PRIMARY KEY (kind, defect_key, model))",
+        "CREATE INDEX IF NOT EXISTS idx_analyses_accessed ON analyses (accessed_at)",
+    )
+
+    def __init__(self, path=ANALYSIS_CACHE_PATH, max_entries=ANALYSIS_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        super().__init__(path)
+
+    def get(self, kind, defect_key, model, digest):
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM analyses WHERE kind = ? AND defect_key = ? AND model = ? AND input_digest = ?",
+                (kind, defect_key, model, digest),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE analyses SET accessed_at = ? WHERE kind = ? AND defect_key = ? AND model = ?",
+                (time.time(), kind, defect_key, model),
+            )
+            return row[0]
+
+    def put(self, kind, defect_key, model, digest, value):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analyses (kind, defect_key, model, input_digest, value, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, defect_key, model, digest, value, time.time()),
+            )
+            conn.execute(
+                "DELETE FROM analyses WHERE rowid IN ("
+                " SELECT rowid FROM analyses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+
+get_analysis_cache = lazy_singleton(AnalysisCache)
+
+
+def lookup_answer(kind, defect_key, model, prompt):
+    """The cached answer for `prompt`, or None; never calls the model."""
+    digest = input_digest(prompt)
+    return get_analysis_cache().get(kind, str(defect_key) if defect_key else digest, model, digest)
+
+
+def cached_answer(kind, defect_key, model, prompt, compute):
+    """
+    The cached answer for `prompt` if this defect's last one was produced from the same prompt,
+    otherwise `compute()` (stored only when it returns a non-empty answer).
+    Defects without a key are cached under their prompt digest.
+    """
+    digest = input_digest(prompt)
+    defect_key = str(defect_key) if defect_key else digest
+    cache = get_analysis_cache()
+    value = cache.get(kind, defect_key, model, digest)
+    if value is not None:
+        return value
+    value = compute()
+    if value:
+        cache.put(kind, defect_key, model, digest, value)
+    return value
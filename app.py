@@ -3,11 +3,10 @@ import json
 import re
 import yaml
 import pandas as pd
-import requests
-from requests.auth import HTTPBasicAuth
 import fitz  # PyMuPDF
 from docx import Document
-from light_client import LIGHTClient
+from cortex_client import get_cortex_client
+from jira_client import get_jira_client
 
 # --- ENVIRONMENT VARIABLES ---
 YOUR_USER = os.getenv("EMAIL")
@@ -16,8 +15,6 @@ USER = os.getenv("USER", "").lower()
 if not YOUR_USER or not USER:
     raise EnvironmentError("EMAIL and USER environment variables must be set.")
 
-client = LIGHTClient()
-CORTEX_BASE = "https://api.cortex.lilly.com"
 GENERATOR_MODEL_NAME = f"{USER}-gherkin-generator-model"
 
 # --- CONSTANTS ---
@@ -54,10 +51,7 @@ def clean_model_output(raw_output: str) -> str:
     return match.group(1) if match else cleaned
 
 def call_model(model_name: str, prompt: str) -> str:
-    url = f"{CORTEX_BASE}/model/ask/{model_name}"
-    response = client.post(url, data={"q": prompt}, headers={"Content-Type": "application/x-www-form-urlencoded"})
-    response.raise_for_status()
-    return response.json().get("message", "").strip()
+    return get_cortex_client().ask(model_name, prompt)
 
 def extract_text_from_pdf(file):
     try:
@@ -76,18 +70,6 @@ def extract_text_from_docx(file):
         print(f"Failed to extract DOCX text: {e}")
         return ""
 
-def extract_text_from_adf(desc):
-    def parse(node):
-        if isinstance(node, str):
-            return node
-        elif isinstance(node, dict):
-            node_type = node.get("type", "")
-            if node_type == "paragraph":
-                return " ".join(child.get("text", "") for child in node.get("content", [])) + "\n"
-            return "".join(parse(child) for child in node.get("content", []))
-        return ""
-    return parse(desc).strip()
-
 def rubric_score(cases_list):
     score = 5
     if not cases_list or len(cases_list) < 2:
@@ -118,7 +100,7 @@ def remove_duplicates(new_cases, existing_titles_set):
 
 def fetch_jira_issues(jira_base, jql, token):
     url = f"{jira_base}/rest/api/3/search/jql"
-    response = requests.get(url, headers={"Accept": "application/json"}, params={"jql": jql}, auth=HTTPBasicAuth(YOUR_USER, token))
+    response = get_jira_client(jira_base, YOUR_USER, token).get(url, headers={"Accept": "application/json"}, params={"jql": jql})
     if response.status_code != 200:
         raise Exception(f"Jira error: {response.status_code} - {response.text}")
     return response.json().get("issues", [])
@@ -134,7 +116,7 @@ def create_jira_issue(jira_base, token, project_key, summary, description, prior
             "priority": {"name": priority}
         }
     }
-    response = requests.post(url, headers={"Content-Type": "application/json"}, json=issue_data, auth=HTTPBasicAuth(YOUR_USER, token))
+    response = get_jira_client(jira_base, YOUR_USER, token).post(url, headers={"Content-Type": "application/json"}, json=issue_data)
     if response.status_code != 201:
         print(f"Failed to create Jira issue: {response.status_code} - {response.text}")
         return None
@@ -143,7 +125,7 @@ def create_jira_issue(jira_base, token, project_key, summary, description, prior
 def add_test_step(jira_base, token, issue_key, steps):
     url = f"{jira_base}/rest/raven/1.0/api/test/{issue_key}/step"
     payload = [{"index": i, "action": s["Action"], "result": s["ExpectedResult"]} for i, s in enumerate(steps)]
-    response = requests.put(url, headers={"Content-Type": "application/json"}, json=payload, auth=HTTPBasicAuth(YOUR_USER, token))
+    response = get_jira_client(jira_base, YOUR_USER, token).put(url, headers={"Content-Type": "application/json"}, json=payload)
     if response.status_code != 200:
         print(f"Failed to add steps: {response.text}")
     return response.json()
@@ -152,7 +134,7 @@ def attach_file_to_jira_issue(jira_base, token, issue_key, file_bytes, filename)
     url = f"{jira_base}/rest/api/3/issue/{issue_key}/attachments"
     headers = {"X-Atlassian-Token": "no-check"}
     files = {"file": (filename, file_bytes)}
-    response = requests.post(url, headers=headers, files=files, auth=HTTPBasicAuth(YOUR_USER, token))
+    response = get_jira_client(jira_base, YOUR_USER, token).post(url, headers=headers, files=files)
     return response.status_code in [200, 201]
 
 # --- TEST CASE GENERATION ---
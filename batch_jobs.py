@@ -0,0 +1,185 @@
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+from generate_test_scripts import MODEL, build_generation_prompt, generate_from_prompt_async
+from generation_cache import make_cache_key
+from generation_engine import run_generation
+from sqlite_store import SQLiteStore, lazy_singleton
+
+load_dotenv()
+
+BATCH_JOBS_PATH = os.getenv("BATCH_JOBS_PATH", os.path.join(".cache", "batch_jobs.sqlite3"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+MAX_BATCH_STORIES = int(os.getenv("MAX_BATCH_STORIES", "200"))
+
+STORY_KEY = re.compile(r"^[A-Z][A-Z0-9_]+-\d+$")
+
+
+def story_keys_jql(keys):
+    """JQL selecting the given story keys; raises ValueError for anything that is not an issue key."""
+    invalid = [key for key in keys if not STORY_KEY.match(key)]
+    if invalid:
+        raise ValueError(f"Invalid story keys: {', '.join(invalid)}.")
+    return f"key in ({', '.join(keys)})"
+
+
+class BatchJobStore(SQLiteStore):
+    """SQLite record of batch jobs and their per-story results, so partial results survive restarts."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS batch_jobs ("
+        " job_id TEXT PRIMARY KEY, status TEXT NOT NULL, total INTEGER NOT NULL,"
+        " created_at REAL NOT NULL, updated_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS batch_job_items ("
+        " job_id TEXT NOT NULL, story_key TEXT NOT NULL, summary TEXT, status TEXT NOT NULL,"
+        " result TEXT, error TEXT, updated_at REAL NOT NULL,"
+        " PRIMARY KEY (job_id, story_key))",
+    )
+
+    def __init__(self, path=BATCH_JOBS_PATH):
+        super().__init__(path)
+
+    def create_job(self, stories):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO batch_jobs (job_id, status, total, created_at, updated_at) VALUES (?, 'PENDING', ?, ?, ?)",
+                (job_id, len(stories), now, now),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO batch_job_items (job_id, story_key, summary, status, updated_at) VALUES (?, ?, ?, 'PENDING', ?)",
+                [(job_id, story["key"], story.get("summary"), now) for story in stories],
+            )
+        return job_id
+
+    def set_job_status(self, job_id, status):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE batch_jobs SET status = ?, updated_at = ? WHERE job_id = ?", (status, time.time(), job_id))
+
+    def set_item(self, job_id, story_key, status, result=None, error=None):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE batch_job_items SET status = ?, result = ?, error = ?, updated_at = ? WHERE job_id = ? AND story_key = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id, story_key),
+            )
+
+    def fail_interrupted(self):
+        """Mark jobs and stories left PENDING or RUNNING by a previous server process as FAILED; returns the job count."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE batch_job_items SET status = 'FAILED', error = ?, updated_at = ? WHERE status IN ('PENDING', 'RUNNING')",
+                ("Interrupted by a server restart.", now),
+            )
+            return conn.execute(
+                "UPDATE batch_jobs SET status = 'FAILED', updated_at = ? WHERE status IN ('PENDING', 'RUNNING')",
+                (now,),
+            ).rowcount
+
+    def get_job(self, job_id):
+        with self._lock, self._connect() as conn:
+            job = conn.execute("SELECT status, total, created_at, updated_at FROM batch_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            rows = conn.execute(
+                "SELECT story_key, summary, status, result, error FROM batch_job_items WHERE job_id = ? ORDER BY rowid",
+                (job_id,),
+            ).fetchall()
+
+        status, total, created_at, updated_at = job
+        items = [
+            {
+                "key": key,
+                "summary": summary,
+                "status": item_status,
+                "result": json.loads(result) if result else None,
+                "error": error,
+            }
+            for key, summary, item_status, result, error in rows
+        ]
+        return {
+            "job_id": job_id,
+            "status": status,
+            "total": total,
+            "completed": sum(1 for item in items if item["status"] in ("DONE", "FAILED")),
+            "failed": sum(1 for item in items if item["status"] == "FAILED"),
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "stories": items,
+        }
+
+
+def _open_batch_store():
+    # Jobs run as tasks of the process that started them (the API runs as a single uvicorn
+    # process), so anything still unfinished when the store is first opened was interrupted
+    store = BatchJobStore()
+    interrupted = store.fail_interrupted()
+    if interrupted:
+        print(f" ⚠️ Marked {interrupted} interrupted batch job(s) as FAILED")
+    return store
+
+
+get_batch_store = lazy_singleton(_open_batch_store)
+# job id -> running task; keeps a strong reference until the job finishes
+_running_jobs = {}
+
+
+async def _generate_story(store, job_id, story, context_json, options, slots):
+    async with slots:
+        await asyncio.to_thread(store.set_item, job_id, story["key"], "RUNNING")
+        description = story.get("description") or ""
+        requirement_text = story.get("acceptance_criteria") or ""
+        try:
+            prompt = await asyncio.to_thread(build_generation_prompt, description, requirement_text, context_json)
+            result = await run_generation(
+                lambda: generate_from_prompt_async(prompt, endpoint=options.get("endpoint")),
+                mode=options.get("generation_mode"),
+                fanout=options.get("fanout"),
+                cache_key=make_cache_key(prompt.text, MODEL),
+                force_refresh=options.get("force_refresh", False),
+            )
+        except Exception as e:
+            print(f" ❌ Batch {job_id}: {story['key']} failed: {e}")
+            await asyncio.to_thread(store.set_item, job_id, story["key"], "FAILED", error=str(e))
+            return
+
+        if result:
+            print(f" ✅ Batch {job_id}: {story['key']} scored {result['quality_score']}/5")
+            await asyncio.to_thread(store.set_item, job_id, story["key"], "DONE", result=result)
+        else:
+            await asyncio.to_thread(
+                store.set_item, job_id, story["key"], "FAILED", error="Failed to generate test cases after multiple attempts.",
+            )
+
+
+async def run_batch_job(job_id, stories, context_json=None, options=None):
+    store = get_batch_store()
+    await asyncio.to_thread(store.set_job_status, job_id, "RUNNING")
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+    try:
+        await asyncio.gather(*(
+            _generate_story(store, job_id, story, context_json, options or {}, slots)
+            for story in stories
+        ))
+    except Exception as e:
+        print(f" ❌ Batch {job_id} failed: {e}")
+        await asyncio.to_thread(store.set_job_status, job_id, "FAILED")
+        return
+    await asyncio.to_thread(store.set_job_status, job_id, "DONE")
+    print(f" 📦 Batch {job_id} finished ({len(stories)} stories)")
+
+
+async def start_batch_job(stories, context_json=None, options=None):
+    """Persist a new job for `stories` and start generating them in the background; returns the job id."""
+    job_id = await asyncio.to_thread(lambda: get_batch_store().create_job(stories))
+    task = asyncio.create_task(run_batch_job(job_id, stories, context_json, options))
+    _running_jobs[job_id] = task
+    task.add_done_callback(lambda _: _running_jobs.pop(job_id, None))
+    return job_id
@@ -0,0 +1,84 @@
+"""
+Benchmark extract_text_from_adf on large synthetic ADF documents.
+
+    python benchmark_adf.py
+
+Covers wide documents (many paragraphs with marks), big tables, and deeply nested
+lists well past Python's default recursion limit.
+"""
+import sys
+import time
+
+from extract_text_from_adf import extract_text_from_adf
+
+
+def _text(value, *marks):
+    node = {"type": "text", "text": value}
+    if marks:
+        node["marks"] = [{"type": mark} for mark in marks]
+    return node
+
+
+def _paragraph(*content):
+    return {"type": "paragraph", "content": list(content)}
+
+
+def wide_document(paragraphs=20000):
+    content = []
+    for i in range(paragraphs):
+        content.append(_paragraph(_text(f"Paragraph {i} with "), _text("bold", "strong"), _text(" and "), _text("code", "code"), _text(" text.")))
+        if i % 50 == 0:
+            content.append({"type": "orderedList", "content": [
+                {"type": "listItem", "content": [_paragraph(_text(f"Step {n}"))]} for n in range(10)
+            ]})
+    return {"type": "doc", "version": 1, "content": content}
+
+
+def table_document(rows=5000, cols=8):
+    def cell(kind, value):
+        return {"type": kind, "content": [_paragraph(_text(value))]}
+
+    table_rows = [{"type": "tableRow", "content": [cell("tableHeader", f"Column {c}") for c in range(cols)]}]
+    table_rows += [
+        {"type": "tableRow", "content": [cell("tableCell", f"r{r}c{c}") for c in range(cols)]}
+        for r in range(rows)
+    ]
+    return {"type": "doc", "version": 1, "content": [{"type": "table", "content": table_rows}]}
+
+
+def nested_document(depth=3000):
+    doc = {"type": "doc", "version": 1, "content": []}
+    parent = doc
+    for level in range(depth):
+        item = {"type": "listItem", "content": [_paragraph(_text(f"Level {level}"))]}
+        parent["content"].append({"type": "bulletList", "content": [item]})
+        parent = item
+    return doc
+
+
+def count_nodes(doc):
+    # json.dumps would itself recurse too deep on the nested document
+    count, stack = 0, [doc]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.get("content") or [])
+    return count
+
+
+def run(name, doc, repeat=3):
+    nodes = count_nodes(doc)
+    for mode in ("plain", "markdown"):
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            output = extract_text_from_adf(doc, mode=mode)
+            best = min(best, time.perf_counter() - started)
+        print(f"{name:<8} {mode:<9} {nodes:>9} nodes -> {len(output) / 1e6:7.2f} MB text  {best * 1000:9.1f} ms  {nodes / best / 1e6:6.2f} M nodes/s")
+
+
+if __name__ == "__main__":
+    print(f"Python recursion limit: {sys.getrecursionlimit()}")
+    run("wide", wide_document())
+    run("table", table_document())
+    run("nested", nested_document())
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from dotenv import load_dotenv
+
+from prompt_budget import count_tokens
+
+load_dotenv()
+
+# on  -> large context values are chunked, BM25-ranked against the requirement and cut to a budget
+# off -> context is passed to the prompt verbatim
+CONTEXT_SELECTION = os.getenv("CONTEXT_SELECTION", "on").lower()
+CONTEXT_SELECTION_MIN_CHARS = int(os.getenv("CONTEXT_SELECTION_MIN_CHARS", "6000"))  # smaller values are kept whole
+CONTEXT_CHUNK_CHARS = int(os.getenv("CONTEXT_CHUNK_CHARS", "1200"))
+CONTEXT_CHUNK_OVERLAP = int(os.getenv("CONTEXT_CHUNK_OVERLAP", "150"))
+CONTEXT_TOP_K = int(os.getenv("CONTEXT_TOP_K", "8"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_INDEX_CACHE_SIZE = 32
+CHUNK_SEPARATOR = "\n[...]\n"
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it",
+    "of", "on", "or", "shall", "should", "so", "that", "the", "this", "to", "was", "will", "with",
+}
+
+
+def tokenize(text):
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS and len(token) > 1]
+
+
+def chunk_text(text, size=CONTEXT_CHUNK_CHARS, overlap=CONTEXT_CHUNK_OVERLAP):
+    """Pack paragraphs into chunks of about `size` characters; longer paragraphs are split with `overlap`."""
+    chunks = []
+    current = []
+    current_len = 0
+    for paragraph in re.split(r"\n\s*\n|\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) > size:
+            if current:
+                chunks.append("\n".join(current))
+                current, current_len = [], 0
+            step = max(1, size - overlap)
+            chunks.extend(paragraph[start:start + size] for start in range(0, len(paragraph), step))
+            continue
+        if current and current_len + len(paragraph) + 1 > size:
+            chunks.append("\n".join(current))
+            current, current_len = [], 0
+        current.append(paragraph)
+        current_len += len(paragraph) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of chunks, built once per distinct context, with each chunk's token count."""
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.chunk_tokens = [count_tokens(chunk) for chunk in chunks]
+        self.tokens = sum(self.chunk_tokens)  # slightly over the document's count where long paragraphs overlap
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(chunk)) for chunk in chunks]
+        self.lengths = [sum(freqs.values()) for freqs in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+        doc_freq = Counter(term for freqs in self.term_freqs for term in freqs)
+        total = len(chunks)
+        self.idf = {term: math.log(1 + (total - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def scores(self, query):
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        scores = []
+        for freqs, length in zip(self.term_freqs, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            scores.append(sum(self.idf[t] * freqs[t] * (self.k1 + 1) / (freqs[t] + norm) for t in terms if t in freqs))
+        return scores
+
+
+_indexes = OrderedDict()
+_selections = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _digest(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _remember(cache, key, value):
+    with _cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > CONTEXT_INDEX_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def get_index(text) -> BM25Index:
+    """Chunk and index `text` once; later calls with the same text reuse the index."""
+    key = _digest(text)
+    with _cache_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = BM25Index(chunk_text(text))
+    _remember(_indexes, key, index)
+    return index
+
+
+def select_text(text, query, top_k=CONTEXT_TOP_K, token_budget=CONTEXT_TOKEN_BUDGET):
+    """
+    The top-k chunks of `text` most relevant to `query`, within `token_budget`,
+    returned in document order. Returns (selected_text, chunks_used, chunks_total).
+    """
+    index = get_index(text)
+    scores = index.scores(query)
+    ranked = sorted(range(len(index.chunks)), key=lambda i: (-scores[i], i))
+    picked = []
+    used = 0
+    for i in ranked:
+        if len(picked) >= top_k:
+            break
+        cost = index.chunk_tokens[i]
+        if picked and used + cost > token_budget:
+            continue
+        picked.append(i)
+        used += cost
+    picked.sort()
+    return CHUNK_SEPARATOR.join(index.chunks[i] for i in picked), len(picked), len(index.chunks)
+
+
+def _as_text(value):
+    return value if isinstance(value, str) else json.dumps(value, indent=2)
+
+
+def select_context(context, query):
+    """
+    Replace large context values (a plain string, or the values of a context dict such as
+    file_context) with their most relevant chunks for `query`. Small values are kept as-is.
+    Results are memoized per (context, query), and each new selection logs the size saved.
+    CPU-bound (chunking, BM25, token counts): call it from a worker thread in async code.
+    """
+    if CONTEXT_SELECTION == "off" or not context or not query:
+        return context
+
+    values = context if isinstance(context, dict) else {None: context}
+    texts = {name: _as_text(value) for name, value in values.items() if value}
+    large = {name: text for name, text in texts.items() if len(text) > CONTEXT_SELECTION_MIN_CHARS}
+    if not large:
+        return context
+
+    key = _digest(query, *(f"{name}={text}" for name, text in large.items()))
+    with _cache_lock:
+        cached = _selections.get(key)
+    if cached is None:
+        cached = {}
+        for name, text in large.items():
+            selected, used, total = select_text(text, query)
+            cached[name] = selected
+            label = name or "context"
+            print(
+                f" ✂️  Context '{label}': {len(text)} chars (~{get_index(text).tokens} tokens) -> "
+                f"{len(selected)} chars (~{count_tokens(selected)} tokens), {used}/{total} chunks"
+            )
+        _remember(_selections, key, cached)
+
+    if not isinstance(context, dict):
+        return cached[None]
+    return {**context, **cached}
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+
+from sqlite_store import SQLiteStore, lazy_singleton
+
+load_dotenv()
+
+CONTEXT_STORE_PATH = os.getenv("CONTEXT_STORE_PATH", os.path.join(".cache", "context_store.sqlite3"))
+CONTEXT_STORE_MAX_ENTRIES = int(os.getenv("CONTEXT_STORE_MAX_ENTRIES", "200"))
+CONTEXT_STORE_MAX_BYTES = int(os.getenv("CONTEXT_STORE_MAX_BYTES", str(256 * 1024 * 1024)))  # extracted text kept on disk
+CONTEXT_STORE_TTL = int(os.getenv("CONTEXT_STORE_TTL", str(30 * 24 * 3600)))  # seconds
+
+
+def make_context_id(file_digest: str, options: dict) -> str:
+    """Id of an extraction: the uploaded bytes' sha256 plus every option that changes the extracted text."""
+    digest = hashlib.sha256()
+    digest.update(file_digest.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ContextStore(SQLiteStore):
+    """Disk-backed cache of extracted upload contexts with TTL, least-recently-used eviction and a size bound."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS contexts ("
+        " context_id TEXT PRIMARY KEY, filename TEXT, value TEXT NOT NULL, size INTEGER NOT NULL,"
+        " created_at REAL NOT NULL, accessed_at REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS idx_contexts_accessed ON contexts (accessed_at)",
+    )
+
+    def __init__(self, path=CONTEXT_STORE_PATH, max_entries=CONTEXT_STORE_MAX_ENTRIES, max_bytes=CONTEXT_STORE_MAX_BYTES, ttl=CONTEXT_STORE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        super().__init__(path)
+
+    def get(self, context_id):
+        """The stored extraction result (with its filename), or None if unknown or expired."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT filename, value, created_at FROM contexts WHERE context_id = ?", (context_id,)).fetchone()
+            if row is None:
+                return None
+            filename, value, created_at = row
+            if now - created_at > self.ttl:
+                conn.execute("DELETE FROM contexts WHERE context_id = ?", (context_id,))
+                return None
+            conn.execute("UPDATE contexts SET accessed_at = ? WHERE context_id = ?", (now, context_id))
+            return {"filename": filename, **json.loads(value)}
+
+    def put(self, context_id, filename, result):
+        now = time.time()
+        value = json.dumps(result)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO contexts (context_id, filename, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (context_id, filename, value, len(value), now, now),
+            )
+            conn.execute("DELETE FROM contexts WHERE created_at < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM contexts WHERE context_id IN ("
+                " SELECT context_id FROM contexts ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            # Drop least recently used entries until the total size fits (the newest entry always stays)
+            conn.execute(
+                "DELETE FROM contexts WHERE context_id IN ("
+                " SELECT context_id FROM ("
+                "  SELECT context_id, SUM(size) OVER (ORDER BY accessed_at DESC, context_id) AS running FROM contexts"
+                " ) WHERE running > ? AND context_id != ?)",
+                (self.max_bytes, context_id),
+            )
+
+
+get_context_store = lazy_singleton(ContextStore)
+
+
+def resolve_file_context(context_id):
+    """
+    Context text for a `context_id` returned by /upload_context, shaped like the UI sends it
+    as `file_context` (JSON uploads are parsed). Returns None for unknown ids.
+    """
+    entry = get_context_store().get(context_id)
+    if entry is None:
+        return None
+    if (entry.get("filename") or "").lower().endswith(".json"):
+        try:
+            return json.loads(entry["context"])
+        except ValueError:
+            pass
+    return entry["context"]
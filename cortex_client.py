@@ -0,0 +1,146 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from light_client import LIGHTClient
+
+load_dotenv()
+
+# ========================
+#  CONFIGURATION
+# ========================
+
+CORTEX_BASE = os.getenv("CORTEX_BASE", "https://api.cortex.lilly.com")
+CORTEX_MAX_CONNECTIONS = int(os.getenv("CORTEX_MAX_CONNECTIONS", "32"))
+CORTEX_MAX_CONCURRENCY = int(os.getenv("CORTEX_MAX_CONCURRENCY", "32"))
+CORTEX_CONNECT_TIMEOUT = float(os.getenv("CORTEX_CONNECT_TIMEOUT", "10"))
+CORTEX_READ_TIMEOUT = float(os.getenv("CORTEX_READ_TIMEOUT", "180"))
+CORTEX_RETRIES = 3
+CORTEX_RETRY_DELAY = 2
+
+
+class CortexClient:
+    """
+    Shared client for `{CORTEX_BASE}/model/ask/{model}`.
+
+    A single LIGHTClient session (keep-alive, pooled) is reused by every call.
+    Blocking posts run on a bounded executor so async callers never tie up the
+    event loop, and a semaphore caps the number of model calls in flight across
+    both the sync and the async entry points.
+    """
+
+    def __init__(
+        self,
+        base_url=CORTEX_BASE,
+        max_connections=CORTEX_MAX_CONNECTIONS,
+        max_concurrency=CORTEX_MAX_CONCURRENCY,
+        timeout=(CORTEX_CONNECT_TIMEOUT, CORTEX_READ_TIMEOUT),
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="cortex")
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = LIGHTClient()
+                    # LIGHTClient is requests based; widen its pool so concurrent calls reuse connections
+                    if isinstance(session, requests.Session):
+                        self._widen_pools(session)
+                    self._session = session
+        return self._session
+
+    def _widen_pools(self, session):
+        """
+        Resize the pools of the adapters LIGHTClient mounted instead of mounting new ones,
+        so their auth, SSL and retry settings are kept (a subclass's init_poolmanager runs again).
+        """
+        for adapter in {id(a): a for a in session.adapters.values()}.values():
+            if isinstance(adapter, HTTPAdapter) and adapter._pool_maxsize < self.max_connections:
+                adapter._pool_maxsize = self.max_connections
+                adapter.init_poolmanager(adapter._pool_connections, self.max_connections, block=adapter._pool_block)
+
+    def _post(self, model, prompt, timeout):
+        url = f"{self.base_url}/model/ask/{model}"
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        with self._slots:
+            return self.session.post(url, data={"q": prompt}, headers=headers, timeout=timeout or self.timeout)
+
+    @staticmethod
+    def _message(response):
+        return response.json().get("message", "").strip()
+
+    def ask(self, model, prompt, timeout=None, retries=CORTEX_RETRIES, delay=CORTEX_RETRY_DELAY) -> str:
+        """
+        Blocking call. Retries 502s and transport errors, returns the model message (may be empty).
+        Always makes at least one attempt and raises once the attempts are used up.
+        """
+        attempts = max(1, retries)
+        for attempt in range(1, attempts + 1):
+            try:
+                print(f" Sending request to Cortex (Attempt {attempt})...")
+                response = self._post(model, prompt, timeout)
+
+                if response.status_code == 502 and attempt < attempts:
+                    print(" 502 Bad Gateway — retrying...")
+                    time.sleep(delay)
+                    continue
+
+                response.raise_for_status()
+                return self._message(response)
+
+            except Exception as e:
+                print(f" Error: {e}")
+                if attempt == attempts:
+                    raise Exception("Cortex call failed after max retries") from e
+                time.sleep(delay)
+
+    async def ask_async(self, model, prompt, timeout=None, retries=CORTEX_RETRIES, delay=CORTEX_RETRY_DELAY) -> str:
+        """Non-blocking counterpart of `ask`; backoff sleeps happen on the event loop."""
+        loop = asyncio.get_running_loop()
+        post = functools.partial(self._post, model, prompt, timeout)
+        attempts = max(1, retries)
+        for attempt in range(1, attempts + 1):
+            try:
+                print(f" Sending request to Cortex (Attempt {attempt})...")
+                response = await loop.run_in_executor(self._executor, post)
+
+                if response.status_code == 502 and attempt < attempts:
+                    print(" 502 Bad Gateway — retrying...")
+                    await asyncio.sleep(delay)
+                    continue
+
+                response.raise_for_status()
+                return self._message(response)
+
+            except Exception as e:
+                print(f" Error: {e}")
+                if attempt == attempts:
+                    raise Exception("Cortex call failed after max retries") from e
+                await asyncio.sleep(delay)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_cortex_client() -> CortexClient:
+    """Process-wide CortexClient, created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = CortexClient()
+    return _client
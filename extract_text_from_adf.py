@@ -1,44 +1,239 @@
-def extract_text_from_adf(adf: dict) -> str:
+import io
+from datetime import datetime, timezone
+
+# plain    -> readable text: list markers, "a | b" table rows, no markup
+# markdown -> compact Markdown: emphasis, links, headings, fenced code, pipe tables
+ADF_MODES = ("plain", "markdown")
+
+_MARKDOWN_MARKS = {"strong": "**", "em": "*", "strike": "~~", "code": "`"}
+_LISTS = ("bulletList", "orderedList", "taskList", "decisionList")
+_ENTER, _EXIT = 0, 1
+
+
+class _LineWriter:
     """
-    Extract plain text from Jira's ADF (Atlassian Document Format).
-    Preserves bullets and indentation, but avoids numbered prefixes.
+    Single output buffer that knows about line prefixes (list indentation, quotes).
+    Block boundaries are lazy: a newline is only written before the next non-empty text,
+    so the output never contains blank lines or trailing whitespace lines.
     """
 
-    if not adf or not isinstance(adf, dict):
+    def __init__(self):
+        self.buf = io.StringIO()
+        self.prefixes = []
+        self.marker = None  # (depth, marker) printed on the first line of a list item
+        self.at_line_start = True
+        self.started = False
+        self.cell_depth = 0  # inside a table cell block boundaries collapse to spaces
+        self.cell_empty = False
+        self.pending_space = False
+
+    def newline(self):
+        if self.cell_depth:
+            self.pending_space = not self.cell_empty
+        else:
+            self.at_line_start = True
+
+    def write(self, text, separator=False):
+        for i, line in enumerate(text.split("\n")):
+            if i:
+                self.newline()
+            if not line:
+                continue
+            if self.at_line_start:
+                if self.started:
+                    self.buf.write("\n")
+                self.buf.write(self._line_prefix())
+                self.at_line_start = False
+                self.started = True
+            elif self.pending_space and not separator:
+                self.buf.write(" ")
+            self.pending_space = False
+            self.cell_empty = separator
+            self.buf.write(line)
+
+    def _line_prefix(self):
+        if self.marker is None:
+            return "".join(self.prefixes)
+        depth, marker = self.marker
+        self.marker = None
+        return "".join(self.prefixes[:depth]) + marker + "".join(self.prefixes[depth + 1:])
+
+    def getvalue(self):
+        return self.buf.getvalue().strip()
+
+
+def _format_date(attrs):
+    try:
+        return datetime.fromtimestamp(int(attrs.get("timestamp")) / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
         return ""
 
-    lines = []
 
-    def walk(nodes, indent=""):
-        if not nodes:
-            return
+def _inline_text(node, markdown, in_code):
+    """Text for an inline node (text, mention, emoji, ...); None if the node is not inline."""
+    node_type = node.get("type")
+    attrs = node.get("attrs") or {}
 
-        for node in nodes:
-            node_type = node.get("type")
-            content = node.get("content", [])
+    if node_type == "text":
+        text = node.get("text", "")
+        if not markdown or in_code or not text:
+            return text
+        href = None
+        for mark in node.get("marks") or []:
+            mark_type = mark.get("type")
+            if mark_type == "link":
+                href = (mark.get("attrs") or {}).get("href")
+            elif mark_type in _MARKDOWN_MARKS:
+                wrap = _MARKDOWN_MARKS[mark_type]
+                text = f"{wrap}{text}{wrap}"
+        return f"[{text}]({href})" if href else text
+    if node_type == "mention":
+        text = attrs.get("text") or attrs.get("id", "")
+        return text if text.startswith("@") else f"@{text}"
+    if node_type == "emoji":
+        return attrs.get("text") or attrs.get("shortName", "")
+    if node_type == "date":
+        return _format_date(attrs)
+    if node_type == "status":
+        return attrs.get("text", "")
+    if node_type == "inlineCard":
+        return attrs.get("url", "")
+    if node_type == "placeholder":
+        return attrs.get("text", "")
+    return None
 
-            if node_type == "text":
-                lines.append(indent + node.get("text", ""))
 
-            elif node_type == "paragraph":
-                walk(content, indent)
-                lines.append("")  # newline between paragraphs
+def extract_text_from_adf(adf: dict, mode: str = "plain") -> str:
+    """
+    Convert Jira's ADF (Atlassian Document Format) to plain text or compact Markdown.
+    Walks the document with an explicit stack, so deeply nested lists and tables
+    cannot hit the recursion limit, and writes everything into one buffer.
+    """
+    if isinstance(adf, str):
+        return adf.strip()
+    if not adf or not isinstance(adf, dict):
+        return ""
+    if mode not in ADF_MODES:
+        raise ValueError(f"mode must be one of {', '.join(ADF_MODES)}.")
 
-            elif node_type in ("bulletList", "orderedList"):
-                for item in content:
-                    # For both bulletList and orderedList, just use dash (-)
-                    walk(item.get("content", []), indent + "- ")
+    markdown = mode == "markdown"
+    out = _LineWriter()
+    code_depth = 0
+    # (action, node, info): info carries the list marker for list items and the index for table rows/cells
+    stack = [(_ENTER, child, None) for child in reversed(adf.get("content") or [])]
 
-            elif node_type == "listItem":
-                walk(content, indent)
+    while stack:
+        action, node, info = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        node_type = node.get("type")
+        attrs = node.get("attrs") or {}
+        content = node.get("content") or []
 
+        if action == _EXIT:
+            if node_type in ("listItem", "taskItem", "decisionItem"):
+                out.prefixes.pop()
+                out.marker = None
+                out.newline()
+            elif node_type == "blockquote":
+                out.prefixes.pop()
+                out.newline()
+            elif node_type == "codeBlock":
+                code_depth -= 1
+                if markdown:
+                    out.newline()
+                    out.write("```")
+                out.newline()
+            elif node_type in ("tableCell", "tableHeader"):
+                out.cell_depth -= 1
+            elif node_type == "tableRow":
+                if markdown:
+                    out.write(" |", separator=True)
+                    header_row = content and all(cell.get("type") == "tableHeader" for cell in content if isinstance(cell, dict))
+                    if info == 0 and header_row:
+                        out.newline()
+                        out.write("| " + " | ".join("---" for _ in content) + " |")
+                out.newline()
             else:
-                walk(content, indent)
+                out.newline()
+            continue
+
+        text = _inline_text(node, markdown, code_depth > 0)
+        if text is not None:
+            if out.cell_depth and markdown:
+                text = text.replace("|", "\\|")
+            out.write(text)
+            continue
+
+        if node_type == "hardBreak":
+            out.newline()
+            continue
+        if node_type == "rule":
+            out.newline()
+            if markdown:
+                out.write("---")
+                out.newline()
+            continue
+        if node_type in ("blockCard", "embedCard"):
+            out.newline()
+            out.write(attrs.get("url", ""))
+            out.newline()
+            continue
+        if node_type == "media":
+            continue
+
+        if node_type not in ("tableCell", "tableHeader"):
+            out.newline()
+
+        if node_type == "heading" and markdown:
+            out.write("#" * int(attrs.get("level") or 1) + " ")
+        elif node_type in ("expand", "nestedExpand") and attrs.get("title"):
+            out.write(f"**{attrs['title']}**" if markdown else attrs["title"])
+            out.newline()
+        elif node_type == "codeBlock":
+            code_depth += 1
+            if markdown:
+                out.write("```" + (attrs.get("language") or ""))
+                out.newline()
+        elif node_type == "blockquote":
+            out.prefixes.append("> ")
+        elif node_type in _LISTS:
+            start = int(attrs.get("order") or 1)
+            items = [child for child in content if isinstance(child, dict)]
+            stack.append((_EXIT, node, None))
+            for index in range(len(items) - 1, -1, -1):
+                stack.append((_ENTER, items[index], f"{start + index}. " if node_type == "orderedList" else "- "))
+            continue
+        elif node_type in ("listItem", "taskItem", "decisionItem"):
+            marker = info or "- "
+            if node_type == "taskItem":
+                marker += "[x] " if attrs.get("state") == "DONE" else "[ ] "
+            out.marker = (len(out.prefixes), marker)
+            out.prefixes.append(" " * len(marker))
+        elif node_type == "table":
+            rows = [child for child in content if isinstance(child, dict)]
+            stack.append((_EXIT, node, None))
+            for index in range(len(rows) - 1, -1, -1):
+                stack.append((_ENTER, rows[index], index))
+            continue
+        elif node_type == "tableRow":
+            cells = [child for child in content if isinstance(child, dict)]
+            stack.append((_EXIT, node, info))
+            for index in range(len(cells) - 1, -1, -1):
+                stack.append((_ENTER, cells[index], index))
+            continue
+        elif node_type in ("tableCell", "tableHeader"):
+            if markdown:
+                out.write("| " if info == 0 else " | ", separator=True)
+            elif info:
+                out.write(" | ", separator=True)
+            out.cell_depth += 1
 
-    walk(adf.get("content", []))
+        stack.append((_EXIT, node, None))
+        for child in reversed(content):
+            stack.append((_ENTER, child, None))
 
-    # Clean up trailing empty lines
-    return "\n".join([line for line in lines if line.strip()]).strip()
+    return out.getvalue()
 
 
 # print(extract_text_from_adf({
@@ -80,4 +275,4 @@ def extract_text_from_adf(adf: dict) -> str:
 #     }
 #   ]
 # }
-# ))
\ No newline at end of file
+# ))
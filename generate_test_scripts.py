@@ -41,57 +41,31 @@
 #     return msg
 
 from dotenv import load_dotenv
-from light_client import LIGHTClient
+import asyncio
+import json
 import os
-import time
 
+from context_selection import select_context
+from cortex_client import get_cortex_client
+from prompt_budget import PromptBuild, build_prompt, measured_prompt
 from utilities.prompts import BASE_PROMPT_2, BASE_PROMPT_3
 
 load_dotenv()
 
 USER = os.getenv("USER")
 MODEL = os.getenv("MODEL_NAME")
-client = LIGHTClient()
-
-CORTEX_BASE = "https://api.cortex.lilly.com"
 
 
 def call_cortex_with_retry(prompt, retries=3, delay=2):
-    url = f"{CORTEX_BASE}/model/ask/{MODEL}"
-
-    for attempt in range(1, retries + 1):
-        try:
-            print(f" Sending request to Cortex (Attempt {attempt})...")
-            response = client.post(url, data={"q": prompt})
-
-            # If 502, retry
-            if response.status_code == 502:
-                print(" 502 Bad Gateway — retrying...")
-                time.sleep(delay)
-                continue
-
-            # Other errors -> raise
-            response.raise_for_status()
+    """Send the prompt to the generator model via the shared Cortex client and return its message."""
+    return get_cortex_client().ask(MODEL, prompt, retries=retries, delay=delay)
 
-            return response
 
-        except Exception as e:
-            print(f" Error: {e}")
+async def call_cortex_with_retry_async(prompt, retries=3, delay=2):
+    return await get_cortex_client().ask_async(MODEL, prompt, retries=retries, delay=delay)
 
-            if attempt == retries:
-                raise Exception(" Failed after max retries") from e
-
-            time.sleep(delay)
-
-
-def validate_testcases(requirement, context, draft):
-    """
-    Build a structured validation prompt, send it to the model and print a readable breakdown
-    of each criterion so the operator can see why a particular score was assigned.
-    """
 
-    print("  Sending validation request to Cortex...")
-    validation_prompt = f"""
+VALIDATION_PROMPT = """
 You are a strict Test Case Validation Agent.
 
 You will check EACH of these criteria and provide details:
@@ -139,15 +113,22 @@ Respond ONLY in JSON with this EXACT structure:
 }}
 """
 
-    response = call_cortex_with_retry(validation_prompt)
-    validation_raw = response.json().get("message", "").strip()
 
+def _validation_prompt(requirement, context, draft):
+    context = select_context(context, requirement)
+    return build_prompt(VALIDATION_PROMPT, [("requirement", requirement), ("context", context), ("draft", draft)])
+
+
+def parse_validation_response(validation_raw):
+    """
+    Parse the validator output and print a readable breakdown of each criterion so the
+    operator can see why a particular score was assigned.
+    """
     if not validation_raw:
         print("  Validator returned empty response")
         return {"score": 0, "reasons": ["Empty response"], "missing_points": [], "is_requirement_aligned": False}
 
     try:
-        import json
         validation = json.loads(validation_raw)
         score = validation.get("score", 0)
 
@@ -211,14 +192,24 @@ Respond ONLY in JSON with this EXACT structure:
         return {"score": 0, "reasons": ["Invalid JSON response"], "missing_points": [], "is_requirement_aligned": False}
 
 
-def generate_test_scripts(description, requirements, context=None):
-    print("\n 👉 Calling the function to generate test scripts")
-    prompt = BASE_PROMPT_2.format(description, requirements, context)
-    print("\nprompt:", prompt)
+def validate_testcases(requirement, context, draft):
+    """Build a structured validation prompt, send it to the validator model and parse the verdict."""
+    print("  Sending validation request to Cortex...")
+    with measured_prompt("validation", _validation_prompt(requirement, context, draft)) as prompt:
+        validation_raw = call_cortex_with_retry(prompt)
+    return parse_validation_response(validation_raw)
 
-    response = call_cortex_with_retry(prompt)
-    msg = response.json().get("message", "").strip()
 
+async def validate_testcases_async(requirement, context, draft, endpoint=None):
+    print("  Sending validation request to Cortex...")
+    # context selection and token counting are CPU-bound, keep them off the event loop
+    build = await asyncio.to_thread(_validation_prompt, requirement, context, draft)
+    with measured_prompt("validation", build, endpoint) as prompt:
+        validation_raw = await call_cortex_with_retry_async(prompt)
+    return parse_validation_response(validation_raw)
+
+
+def _checked_output(msg):
     if not msg:
         raise ValueError("Model returned empty output.")
 
@@ -226,16 +217,38 @@ def generate_test_scripts(description, requirements, context=None):
     return msg
 
 
-def generate_test_scripts_from_manual_input(manual_input, context=None):
+def build_generation_prompt(description, requirements, context=None) -> PromptBuild:
+    """Only the parts of a large context relevant to the story make it into the prompt, each section within its token budget."""
+    context = select_context(context, f"{description}\n{requirements}")
+    return build_prompt(BASE_PROMPT_2, [("description", description), ("requirement", requirements), ("context", context)])
+
+
+def build_manual_input_prompt(manual_input, context=None) -> PromptBuild:
+    context = select_context(context, manual_input)
+    return build_prompt(BASE_PROMPT_3, [("manual_input", manual_input), ("context", context)])
+
+
+def generate_test_scripts(description, requirements, context=None):
     print("\n 👉 Calling the function to generate test scripts")
-    prompt = BASE_PROMPT_3.format(manual_input, context)
-    print("\nprompt:", prompt)
+    with measured_prompt("generation", build_generation_prompt(description, requirements, context)) as prompt:
+        msg = call_cortex_with_retry(prompt)
+    return _checked_output(msg)
 
-    response = call_cortex_with_retry(prompt)
-    msg = response.json().get("message", "").strip()
 
-    if not msg:
-        raise ValueError("Model returned empty output.")
+def generate_test_scripts_from_manual_input(manual_input, context=None):
+    print("\n 👉 Calling the function to generate test scripts")
+    with measured_prompt("manual_input", build_manual_input_prompt(manual_input, context)) as prompt:
+        msg = call_cortex_with_retry(prompt)
+    return _checked_output(msg)
 
-    print(msg)
-    return msg
+
+async def generate_from_prompt_async(build: PromptBuild, kind="generation", endpoint=None):
+    """
+    Send a prompt built once per request to the generator model. Build it with
+    asyncio.to_thread(build_generation_prompt, ...) so context selection stays off the event loop;
+    the same build then serves the cache key and every attempt. `endpoint` keys the prompt metrics.
+    """
+    print("\n 👉 Calling the function to generate test scripts")
+    with measured_prompt(kind, build, endpoint) as prompt:
+        msg = await call_cortex_with_retry_async(prompt)
+    return _checked_output(msg)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from sqlite_store import SQLiteStore, lazy_singleton
+
+load_dotenv()
+
+# memory -> in-process LRU (lost on restart)
+# sqlite -> local SQLite file shared by every worker on the host
+# off    -> never cache
+GENERATION_CACHE_BACKENDS = ("memory", "sqlite", "off")
+GENERATION_CACHE_BACKEND = os.getenv("GENERATION_CACHE_BACKEND", "memory").lower()
+GENERATION_CACHE_PATH = os.getenv("GENERATION_CACHE_PATH", os.path.join(".cache", "generation_cache.sqlite3"))
+GENERATION_CACHE_TTL = int(os.getenv("GENERATION_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+GENERATION_CACHE_MAX_BYTES = int(os.getenv("GENERATION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # serialized results kept
+
+
+def make_cache_key(prompt: str, model: str) -> str:
+    """Content address of a generation: the fully formatted prompt plus the model that answers it."""
+    digest = hashlib.sha256()
+    digest.update((model or "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class MemoryCache:
+    """In-process LRU with TTL, bounded by the total size of the serialized results."""
+
+    def __init__(self, max_bytes=GENERATION_CACHE_MAX_BYTES, ttl=GENERATION_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                self._bytes -= len(value)
+                return None
+            self._entries.move_to_end(key)
+            return json.loads(value)
+
+    def set(self, key, value):
+        value = json.dumps(value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+            self._entries[key] = (time.time(), value)
+            self._bytes += len(value)
+            # the newest entry always stays, even when it alone is over the budget
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+class SQLiteCache(SQLiteStore):
+    """Disk-backed cache with TTL and least-recently-used eviction once the stored results exceed `max_bytes`."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS generation_cache ("
+        " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+        " created_at REAL NOT NULL, accessed_at REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS idx_generation_cache_accessed ON generation_cache (accessed_at)",
+    )
+
+    def __init__(self, path=GENERATION_CACHE_PATH, max_bytes=GENERATION_CACHE_MAX_BYTES, ttl=GENERATION_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        super().__init__(path)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT value, created_at FROM generation_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl:
+                conn.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE generation_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return json.loads(value)
+
+    def set(self, key, value):
+        now = time.time()
+        value = json.dumps(value)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO generation_cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            conn.execute("DELETE FROM generation_cache WHERE created_at < ?", (now - self.ttl,))
+            # Drop least recently used entries until the total size fits (the newest entry always stays)
+            conn.execute(
+                "DELETE FROM generation_cache WHERE key IN ("
+                " SELECT key FROM ("
+                "  SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS running FROM generation_cache"
+                " ) WHERE running > ? AND key != ?)",
+                (self.max_bytes, key),
+            )
+
+
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+
+def _make_generation_cache():
+    if GENERATION_CACHE_BACKEND == "sqlite":
+        return SQLiteCache()
+    if GENERATION_CACHE_BACKEND == "off":
+        return NullCache()
+    if GENERATION_CACHE_BACKEND == "memory":
+        return MemoryCache()
+    raise EnvironmentError(f"GENERATION_CACHE_BACKEND must be one of {', '.join(GENERATION_CACHE_BACKENDS)}.")
+
+
+# Process-wide cache for GENERATION_CACHE_BACKEND, created on first use
+get_generation_cache = lazy_singleton(_make_generation_cache)
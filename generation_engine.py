@@ -0,0 +1,220 @@
+import asyncio
+import json
+import os
+
+from dotenv import load_dotenv
+
+from generation_cache import get_generation_cache
+from transform_test_cases import transform_test_cases
+
+load_dotenv()
+
+# sequential -> one attempt at a time, stop at the first one that meets the threshold
+# hedged     -> start `fanout` attempts concurrently, return the first that meets the threshold.
+#               Trades cost for latency: a Cortex POST cannot be aborted once sent, so the other
+#               attempts still run to completion in the client's executor (and hold a concurrency
+#               slot) after we stop waiting for them. Every hedged request costs `fanout` model calls.
+GENERATION_MODES = ("sequential", "hedged")
+GENERATION_MODE = os.getenv("GENERATION_MODE", "sequential").lower()
+MAX_GENERATION_ATTEMPTS = int(os.getenv("MAX_GENERATION_ATTEMPTS", "3"))
+HEDGED_FANOUT = int(os.getenv("HEDGED_FANOUT", "2"))
+MAX_GENERATION_FANOUT = int(os.getenv("MAX_GENERATION_FANOUT", "3"))
+QUALITY_THRESHOLD = 4
+
+
+# --- QUALITY SCORE FUNCTION ---
+def rubric_score(cases_list):
+    """
+    Calculate quality score for generated test cases (1-5 scale).
+    Score deductions:
+    - Less than 2 test cases: -1
+    - Duplicate titles: -1
+    - Empty or insufficient test steps: -1
+    """
+    score = 5
+
+    # Check minimum number of test cases
+    if not cases_list or len(cases_list) < 2:
+        score -= 1
+
+    # Check for duplicate titles
+    titles = [c.get("Title", "").strip().lower() for c in cases_list]
+    if len(set(titles)) != len(titles):
+        score -= 1
+
+    # Check for empty or insufficient test steps
+    for case in cases_list:
+        title = case.get("Title", "").strip()
+        steps_data = case.get("Steps", [])
+
+        # Penalize empty title
+        if not title:
+            score -= 1
+            break
+
+        # Penalize insufficient or empty steps
+        if not steps_data:
+            score -= 1
+            break
+
+        # Check if steps have sufficient content
+        for step in steps_data:
+            action = step.get("Action", "").strip()
+            expected = step.get("Expected Result", "").strip()
+            if not action or len(expected) < 10:
+                score -= 1
+                break
+
+    return max(score, 1)
+
+
+def build_result(cleaned_cases, score, attempt, attempts, mode):
+    """`attempt` is the attempt that produced the result, `attempts` how many were started in total."""
+    return {
+        "test_steps": cleaned_cases,
+        "quality_score": score,
+        "generation_attempts": attempts,
+        "best_attempt": attempt,
+        "generation_mode": mode,
+        "cached": False,
+        "quality_status": "PASS" if score >= QUALITY_THRESHOLD else "BELOW_THRESHOLD"
+    }
+
+
+def resolve_fanout(requested=None):
+    """Clamp a per-request fan-out to the server-wide budget."""
+    fanout = requested if requested else HEDGED_FANOUT
+    return max(1, min(fanout, MAX_GENERATION_FANOUT))
+
+
+async def _emit(on_event, event, payload):
+    if on_event is not None:
+        await on_event(event, payload)
+
+
+async def _emit_cases(on_event, result):
+    # Cortex returns the whole output at once, so cases are only sent for the chosen result,
+    # after it was parsed and scored: no events from attempts that later fail or lose the race
+    if on_event is None or not result:
+        return
+    for case in result["test_steps"]:
+        await on_event("test_case", {"attempt": result.get("best_attempt"), "test_case": case})
+
+
+async def _attempt(generate, attempt, total, on_event=None):
+    print(f"\n 🔄 Generation Attempt {attempt}/{total}")
+    await _emit(on_event, "attempt_started", {"attempt": attempt, "total": total})
+    test_steps = await generate()
+    cleaned_cases = transform_test_cases(test_steps)
+
+    # Calculate quality score (local rubric)
+    score = rubric_score(cleaned_cases)
+    print(f" 📊 Quality Score: {score}/5 (attempt {attempt})")
+    print("\n 👉 Test Cases:", json.dumps(cleaned_cases, indent=2), "\n")
+    await _emit(on_event, "rubric_score", {"attempt": attempt, "quality_score": score})
+    return cleaned_cases, score
+
+
+async def _run_sequential(generate, max_attempts, on_event=None):
+    best_result = None
+    best_score = 0
+
+    for attempt in range(1, max_attempts + 1):
+        try:
+            cleaned_cases, score = await _attempt(generate, attempt, max_attempts, on_event)
+        except Exception as e:
+            print(f" ❌ Error on attempt {attempt}: {str(e)}")
+            await _emit(on_event, "attempt_failed", {"attempt": attempt, "detail": str(e)})
+            continue
+
+        if score > best_score:
+            best_score = score
+            best_result = build_result(cleaned_cases, score, attempt, attempt, "sequential")
+
+        if score >= QUALITY_THRESHOLD:
+            print(f" ✅ Quality threshold ({QUALITY_THRESHOLD}) met on attempt {attempt}")
+            return best_result
+
+        if attempt < max_attempts:
+            print(f" ⚠️  Score below threshold ({QUALITY_THRESHOLD}). Retrying...")
+
+    if best_result:
+        print(f" ⚠️  Max retries reached. Returning best attempt with score {best_score}")
+        best_result["generation_attempts"] = max_attempts
+    return best_result
+
+
+async def _run_hedged(generate, fanout, on_event=None):
+    best_result = None
+    best_score = 0
+
+    async def numbered(attempt):
+        try:
+            return attempt, await _attempt(generate, attempt, fanout, on_event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await _emit(on_event, "attempt_failed", {"attempt": attempt, "detail": str(e)})
+            raise
+
+    tasks = [asyncio.create_task(numbered(attempt)) for attempt in range(1, fanout + 1)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            try:
+                attempt, (cleaned_cases, score) = await finished
+            except Exception as e:
+                print(f" ❌ Error on hedged attempt: {str(e)}")
+                continue
+
+            if score > best_score:
+                best_score = score
+                best_result = build_result(cleaned_cases, score, attempt, fanout, "hedged")
+
+            if score >= QUALITY_THRESHOLD:
+                print(f" ✅ Quality threshold ({QUALITY_THRESHOLD}) met by attempt {attempt}; no longer waiting for the rest")
+                return best_result
+    finally:
+        # Only stops waiting: Cortex calls already sent finish in the client's executor
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+    if best_result:
+        print(f" ⚠️  No hedged attempt met the threshold. Returning best attempt with score {best_score}")
+    return best_result
+
+
+async def run_generation(generate, mode=None, fanout=None, max_attempts=MAX_GENERATION_ATTEMPTS, cache_key=None, force_refresh=False, on_event=None):
+    """
+    Run the generate -> transform -> rubric loop shared by both generation endpoints.
+
+    `generate` is a zero-argument coroutine function returning the raw model output.
+    When `cache_key` is given, a cached passing result is returned unless `force_refresh`,
+    and a fresh result is cached only if it passed the rubric.
+    `on_event(event, payload)` is an optional coroutine called with progress events
+    (attempt_started, rubric_score, attempt_failed) and, once a result is chosen, one
+    test_case event per case of that result.
+    Returns the best result dict, or None if every attempt failed.
+    """
+    mode = (mode or GENERATION_MODE).lower()
+    if mode not in GENERATION_MODES:
+        raise ValueError(f"generation_mode must be one of {', '.join(GENERATION_MODES)}.")
+
+    cache = get_generation_cache()
+    if cache_key and not force_refresh:
+        cached = await asyncio.to_thread(cache.get, cache_key)
+        if cached:
+            print(" ♻️  Returning cached test cases")
+            result = {**cached, "cached": True}
+            await _emit_cases(on_event, result)
+            return result
+
+    if mode == "hedged":
+        best_result = await _run_hedged(generate, resolve_fanout(fanout), on_event)
+    else:
+        best_result = await _run_sequential(generate, max_attempts, on_event)
+
+    if cache_key and best_result and best_result["quality_status"] == "PASS":
+        await asyncio.to_thread(cache.set, cache_key, best_result)
+    await _emit_cases(on_event, best_result)
+    return best_result
@@ -4,48 +4,6 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
-def extract_text_from_adf(adf: dict) -> str:
-    """
-    Extract plain text from Jira's ADF (Atlassian Document Format) rich text content.
-    Handles paragraphs, lists, and nested structures.
-    """
-    if not adf or not isinstance(adf, dict):
-        return ""
-
-    lines = []
-
-    def walk(content, indent=""):
-        if not content:
-            return
-
-        for node in content:
-            node_type = node.get("type")
-            node_content = node.get("content", [])
-
-            # Handle text node
-            if node_type == "text":
-                lines.append(indent + node.get("text", ""))
-
-            # Handle paragraphs
-            elif node_type == "paragraph":
-                walk(node_content, indent)
-
-            # Handle bullet or ordered lists
-            elif node_type in ("bulletList", "orderedList"):
-                for index, item in enumerate(node_content, start=1):
-                    prefix = "-" if node_type == "bulletList" else f"{index}."
-                    walk(item.get("content", []), indent + prefix + " ")
-
-            # Handle list item
-            elif node_type == "listItem":
-                walk(node_content, indent)
-
-            # Other nodes (tables, etc.) can be added here as needed
-            else:
-                walk(node_content, indent)
-
-    walk(adf.get("content", []))
-    return "\n".join(lines).strip()
 
 
 # JIRA_URL = "https://lilly-jira.atlassian.net"
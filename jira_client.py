@@ -0,0 +1,142 @@
+import email.utils
+import os
+import threading
+import time
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+load_dotenv()
+
+JIRA_BASE_URL = os.getenv("JIRA_BASE_URL", "https://lilly-jira.atlassian.net")
+EMAIL = os.getenv("EMAIL")  # the Jira account the API tokens belong to
+JIRA_CONNECT_TIMEOUT = float(os.getenv("JIRA_CONNECT_TIMEOUT", "10"))  # seconds
+JIRA_READ_TIMEOUT = float(os.getenv("JIRA_READ_TIMEOUT", "30"))  # seconds
+JIRA_POOL_SIZE = int(os.getenv("JIRA_POOL_SIZE", "16"))  # keep-alive connections per base URL + credential
+JIRA_REQUESTS_PER_SECOND = float(os.getenv("JIRA_REQUESTS_PER_SECOND", "10"))
+JIRA_BURST = int(os.getenv("JIRA_BURST", "10"))
+JIRA_MAX_RETRIES = int(os.getenv("JIRA_MAX_RETRIES", "3"))  # retries after a 429 / 503
+JIRA_MAX_RETRY_AFTER = 60  # never sleep longer than this on a single Retry-After
+# A 429 is Jira's rate limiter refusing the request, so any method can be resent. A 503 may come
+# after the request was processed, so it is only retried for methods that are safe to repeat.
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        """Hold every caller for `seconds` (the server asked us to back off) and drop the saved-up burst."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._updated = self._paused_until
+
+
+def retry_after_seconds(response, attempt):
+    """Seconds to wait before retrying: Retry-After (delta-seconds or HTTP date), else exponential."""
+    header = response.headers.get("Retry-After")
+    if header:
+        try:
+            seconds = float(header)
+        except ValueError:
+            try:
+                seconds = email.utils.parsedate_to_datetime(header).timestamp() - time.time()
+            except (TypeError, ValueError):
+                seconds = 2 ** attempt
+    else:
+        seconds = 2 ** attempt
+    return min(max(seconds, 0), JIRA_MAX_RETRY_AFTER)
+
+
+class JiraClient:
+    """
+    Keep-alive session for one Jira base URL and credential.
+    Every request waits on the client's token bucket, gets a default (connect, read) timeout,
+    and is retried after the advertised Retry-After when Jira answers 429, or 503 for idempotent requests.
+    """
+
+    def __init__(self, base_url, user=None, token=None):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=JIRA_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if user is not None and token is not None:
+            self.session.auth = HTTPBasicAuth(user, token)
+        self.session.headers.update({"Accept": "application/json"})
+        self.bucket = TokenBucket(JIRA_REQUESTS_PER_SECOND, JIRA_BURST)
+
+    def request(self, method, url, idempotent=None, **kwargs):
+        """
+        `url` may be absolute or a path relative to the base URL; returns the final response.
+        `idempotent` overrides the method's default, e.g. for read-only POST searches.
+        """
+        if not url.startswith(("http://", "https://")):
+            url = f"{self.base_url}/{url.lstrip('/')}"
+        kwargs.setdefault("timeout", (JIRA_CONNECT_TIMEOUT, JIRA_READ_TIMEOUT))
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_statuses = (429, 503) if idempotent else (429,)
+
+        for attempt in range(JIRA_MAX_RETRIES + 1):
+            self.bucket.acquire()
+            response = self.session.request(method, url, **kwargs)
+            if response.status_code not in retry_statuses or attempt == JIRA_MAX_RETRIES:
+                return response
+            wait = retry_after_seconds(response, attempt)
+            print(f" ⏳ Jira returned {response.status_code} for {method} {url}; retrying in {wait:.1f}s")
+            self.bucket.pause(wait)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_jira_client(base_url=JIRA_BASE_URL, user=None, token=None) -> JiraClient:
+    """Shared client per (base URL, user, token); created on first use."""
+    key = (base_url.rstrip("/"), user, token)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = JiraClient(base_url, user, token)
+    return client
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import os
+
+import requests
+from dotenv import load_dotenv
+
+from extract_text_from_adf import extract_text_from_adf
+from jira_client import EMAIL, JIRA_BASE_URL, get_jira_client
+
+load_dotenv()
+
+ACCEPTANCE_CRITERIA_FIELD_ID = os.getenv("ACCEPTANCE_CRITERIA_FIELD_ID", "customfield_10121")
+JIRA_STORIES_PAGE_SIZE = int(os.getenv("JIRA_STORIES_PAGE_SIZE", "100"))  # /search/jql returns at most 100 issues with fields
+
+
+def story_from_issue(issue):
+    """Flatten a Jira issue into the story shape the UI expects (ADF fields converted to text)."""
+    fields = issue.get("fields") or {}
+    return {
+        "key": issue["key"],
+        "summary": fields.get("summary", ""),
+        "description": extract_text_from_adf(fields.get("description", "")),
+        "acceptance_criteria": extract_text_from_adf(fields.get(ACCEPTANCE_CRITERIA_FIELD_ID, "")),
+    }
+
+
+def fetch_issue_page(jql, jira_api_key, page_token=None, page_size=JIRA_STORIES_PAGE_SIZE):
+    """
+    Fetch one page of up to `page_size` raw `jql` results, projected to the fields a story needs.
+    Returns (issues, next_page_token); the token is None on the last page.
+    Raises requests.HTTPError if Jira rejects the query.
+    """
+    url = f"{JIRA_BASE_URL}/rest/api/3/search/jql"
+    params = {
+        "jql": jql,
+        "fields": ",".join(["summary", "description", "updated", ACCEPTANCE_CRITERIA_FIELD_ID]),
+        "maxResults": page_size,
+    }
+    if page_token:
+        params["nextPageToken"] = page_token
+
+    response = get_jira_client(JIRA_BASE_URL, EMAIL, jira_api_key).get(url, params=params)
+    if response.status_code != 200:
+        print("Failed to fetch issues:", response.status_code, response.text)
+        raise requests.HTTPError(f"Jira search failed with status {response.status_code}", response=response)
+
+    data = response.json()
+    next_token = None if data.get("isLast", True) else data.get("nextPageToken")
+    return data.get("issues", []), next_token
+
+
+def fetch_story_page(jql, jira_api_key, page_token=None, page_size=JIRA_STORIES_PAGE_SIZE):
+    """Like fetch_issue_page, but returns flattened stories."""
+    issues, next_token = fetch_issue_page(jql, jira_api_key, page_token, page_size)
+    return [story_from_issue(issue) for issue in issues], next_token
+
+
+def fetch_stories(jql, jira_api_key, limit):
+    """
+    Every story matching `jql`, straight from Jira and without recording the query in the story store.
+    Never asks for more than `limit` + 1 issues: raises ValueError as soon as more than `limit` match.
+    """
+    stories = []
+    page_token = None
+    while True:
+        page_size = min(JIRA_STORIES_PAGE_SIZE, limit + 1 - len(stories))
+        page, page_token = fetch_story_page(jql, jira_api_key, page_token, page_size)
+        stories.extend(page)
+        if len(stories) > limit:
+            raise ValueError(f"More than {limit} stories match the query.")
+        if not page_token:
+            return stories
+
+
+async def iter_story_pages(jql, jira_api_key):
+    """
+    Yield `jql` results one page at a time, following nextPageToken to the end.
+    Pages are token-chained, so they cannot be fetched in parallel; instead the next
+    page is requested as soon as its token is known, while the caller consumes the current one.
+    """
+    pending = asyncio.create_task(asyncio.to_thread(fetch_story_page, jql, jira_api_key))
+    try:
+        while pending is not None:
+            stories, next_token = await pending
+            pending = asyncio.create_task(asyncio.to_thread(fetch_story_page, jql, jira_api_key, next_token)) if next_token else None
+            if stories:
+                yield stories
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+async def stream_stories_ndjson(jql, jira_api_key):
+    """
+    Encode the stories as newline-delimited JSON, one story per line.
+    The first page is fetched before the stream is returned, so a query Jira rejects raises
+    requests.RequestException here; a later failing page ends the stream with that error.
+    """
+    pages = iter_story_pages(jql, jira_api_key)
+    try:
+        first = await pages.__anext__()
+    except StopAsyncIteration:
+        first = []
+
+    async def lines():
+        try:
+            yield "".join(json.dumps(story) + "\n" for story in first)
+            async for page in pages:
+                yield "".join(json.dumps(story) + "\n" for story in page)
+        finally:
+            await pages.aclose()
+
+    return lines()
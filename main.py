@@ -4,42 +4,50 @@ import json
 import yaml
 import fitz  # PyMuPDF
 from docx import Document
-from fastapi import FastAPI, Form, HTTPException, UploadFile, File
+from fastapi import FastAPI, Form, HTTPException, Query, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field
-from requests.auth import HTTPBasicAuth
 import requests
 import uvicorn
-import pandas as pd
-import io
+import asyncio
+import hashlib
+import tempfile
 from typing import Optional, List, Any
 from dotenv import load_dotenv
 # from get_all_story_details import extract_text_from_adf
-from extract_text_from_adf import extract_text_from_adf
-from generate_test_scripts import generate_test_scripts, generate_test_scripts_from_manual_input, validate_testcases
-from upload_to_jira_via_Xray import add_jira_test_steps, create_issue, get_internal_issue_id, get_oauth_token, get_test_run_id, link_test_to_execution, update_test_result
-from utilities.text_extract import extract_text_from_csv, extract_text_from_docx, extract_text_from_excel, extract_text_from_json, extract_text_from_pdf, extract_text_from_plain_text, extract_text_from_yaml
-from helper.transform_test_cases import transform_test_cases
+from generate_test_scripts import MODEL, build_generation_prompt, build_manual_input_prompt, generate_from_prompt_async
+from generation_cache import make_cache_key
+from context_store import get_context_store, make_context_id, resolve_file_context
+from validation_jobs import VALIDATION_MODE, apply_validation, validation_store, wait_for_validation
+from generation_engine import run_generation
+from prompt_budget import prompt_metrics
+from batch_jobs import MAX_BATCH_STORIES, get_batch_store, start_batch_job, story_keys_jql
+from starlette.concurrency import run_in_threadpool
+from cortex_client import get_cortex_client
+from upload_to_jira_via_Xray import upload_test_cases, xray_tokens
+from jira_client import EMAIL, JIRA_BASE_URL, get_jira_client
+from jira_stories import ACCEPTANCE_CRITERIA_FIELD_ID, fetch_stories, stream_stories_ndjson
+from story_store import stream_stored_stories, sync_stories
+from utilities.text_extract import extract_text_from_csv, extract_text_from_docx, extract_text_from_excel, extract_text_from_json, extract_text_from_pdf_file, extract_text_from_plain_text, extract_text_from_yaml
+from testcase_export import EXPORT_FORMATS, export_test_cases, iter_file_chunks
 import functools
 print = functools.partial(print, flush=True)  # Always flush print output
 
 # sys.stdout.reconfigure(encoding='utf-8')  # Fix UnicodeEncode Error on Windows Console
 load_dotenv()
 
-# Environment variables (set EMAIL and USER)
-EMAIL = os.getenv("EMAIL")
+# Environment variables (set EMAIL and USER); EMAIL, JIRA_BASE_URL and ACCEPTANCE_CRITERIA_FIELD_ID
+# are read once in jira_client / jira_stories so the story endpoints and this module agree
 USER = os.getenv("USER", "")
 
 if not EMAIL or not USER:
     raise EnvironmentError("Environment variables EMAIL and USER must be set.")
 
-CORTEX_BASE = "https://api.cortex.lilly.com"
 GENERATOR_MODEL_NAME = f"{USER}-gherkin-generator-model"
-JIRA_BASE_URL = os.getenv("JIRA_BASE_URL", "https://lilly-jira.atlassian.net")
 JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN", "")
 PROJECT_KEY = os.getenv("JIRA_PROJECT_KEY", "SAS2R")
-ACCEPTANCE_CRITERIA_FIELD_ID = os.getenv("ACCEPTANCE_CRITERIA_FIELD_ID","customfield_10121")
 
 app = FastAPI(title="AI-Powered Test Case Generator API")
 
@@ -63,6 +71,7 @@ class JiraFetchRequest(BaseModel):
 class GetUserStories(BaseModel):
     jira_api_key: str
     jql: str
+    refresh: bool = False  # force a full sync instead of an incremental one
 
 class JiraStory(BaseModel):
     key: str
@@ -94,6 +103,21 @@ class GenerateTestScriptsRequest(BaseModel):
     description: str
     requirement_text: str
     context_json: Optional[dict]
+    context_id: Optional[str] = None  # id from /upload_context; merged into context_json as file_context
+    generation_mode: Optional[str] = None  # "sequential" | "hedged"; defaults to GENERATION_MODE
+    fanout: Optional[int] = None  # hedged attempts to start, capped at MAX_GENERATION_FANOUT
+    force_refresh: bool = False  # bypass the generation cache
+
+
+class BatchGenerateRequest(BaseModel):
+    jira_api_key: str
+    story_keys: Optional[List[str]] = None  # either explicit story keys ...
+    jql: Optional[str] = None  # ... or a JQL query selecting the stories
+    context_json: Optional[dict] = None
+    context_id: Optional[str] = None
+    generation_mode: Optional[str] = None
+    fanout: Optional[int] = None
+    force_refresh: bool = False
 
 
 class CreateJiraIssueRequest(BaseModel):
@@ -128,6 +152,10 @@ class ScrapeURLRequest(BaseModel):
 class ManualInputRequest(BaseModel):
     manual_input: str
     context: Optional[Any] = None
+    context_id: Optional[str] = None  # id from /upload_context, used when `context` is not sent
+    generation_mode: Optional[str] = None
+    fanout: Optional[int] = None
+    force_refresh: bool = False
 
 ENGLISH_WORDS = {
     "this", "is", "a", "valid", "project", "requirement", "complete", "finish", "task",
@@ -201,11 +229,7 @@ def clean_model_output(raw_output: str) -> str:
 
 
 def call_cortex_model(prompt: str) -> str:
-    url = f"{CORTEX_BASE}/model/ask/{GENERATOR_MODEL_NAME}"
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    response = requests.post(url, data={"q": prompt}, headers=headers)
-    response.raise_for_status()
-    msg = response.json().get("message", "").strip()
+    msg = get_cortex_client().ask(GENERATOR_MODEL_NAME, prompt)
     if not msg:
         raise ValueError("Model returned empty output.")
     return msg
@@ -213,25 +237,23 @@ def call_cortex_model(prompt: str) -> str:
 
 def fetch_jira_issues(jira_jql, jira_token, jira_user):
     url = f"{JIRA_BASE_URL}/rest/api/3/search/jql"
-    auth = HTTPBasicAuth(jira_user, jira_token)
     jql = f'project={PROJECT_KEY} AND issuetype=Story AND status = Approved ORDER BY created DESC'
     headers = {
         "Accept": "application/json"
     }
     params = {
         "jql": jira_jql,
-        "fields": "summary,description,project,customfield_10121",  # or "fields": "*all"
+        "fields": f"summary,description,project,{ACCEPTANCE_CRITERIA_FIELD_ID}",  # or "fields": "*all"
         "maxResults": 100,
         "startAt": 0
     }
-    response = requests.get(url, headers=headers, params=params, auth=auth)
+    response = get_jira_client(JIRA_BASE_URL, jira_user, jira_token).get(url, headers=headers, params=params)
     # print(response)
     issues = response.json().get('issues', [])
 
 
 def create_jira_issue(jira_base, jira_token, project_key, summary, description, priority, issue_type="Test", parent_issue_key=None):
     url = f"{jira_base.rstrip('/')}/rest/api/3/issue"
-    auth = HTTPBasicAuth(USER, jira_token)
     headers = {"Content-Type": "application/json"}
 
     fields = {
@@ -246,7 +268,7 @@ def create_jira_issue(jira_base, jira_token, project_key, summary, description,
         fields["parent"] = {"key": parent_issue_key}
 
     issue_data = {"fields": fields}
-    response = requests.post(url, json=issue_data, headers=headers, auth=auth)
+    response = get_jira_client(jira_base, USER, jira_token).post(url, json=issue_data, headers=headers)
     if response.status_code != 201:
         raise HTTPException(status_code=response.status_code,
                             detail=f"Jira issue creation failed: {response.text}")
@@ -255,7 +277,6 @@ def create_jira_issue(jira_base, jira_token, project_key, summary, description,
 
 def add_test_steps(jira_base, jira_token, issue_key, steps):
     url = f"{jira_base.rstrip('/')}/rest/raven/1.0/api/test/{issue_key}/step"
-    auth = HTTPBasicAuth(USER, jira_token)
     headers = {"Content-Type": "application/json"}
 
     payload = []
@@ -266,51 +287,12 @@ def add_test_steps(jira_base, jira_token, issue_key, steps):
             "result": step.get("expected_result", "")
         })
 
-    response = requests.put(url, json=payload, headers=headers, auth=auth)
+    response = get_jira_client(jira_base, USER, jira_token).put(url, json=payload, headers=headers)
     if response.status_code != 200:
         raise HTTPException(status_code=response.status_code,
                             detail=f"Failed to upload steps: {response.text}")
     return response.json()
 
-def generate_excel_data(test_cases: List['TestCase']) -> io.BytesIO:
-    """
-    Processes Pydantic TestCase models and generates an Excel file in memory.
-    """
-    rows = []
-    
-    # 'test_cases' is now a list of Pydantic TestCase objects
-    for tc in test_cases: 
-        # Access attributes using dot notation (e.g., tc.test_case_id, NOT tc.get("Test Case ID"))
-        
-        # 'tc.steps' is a list of Pydantic TestCaseStep objects
-        for idx, step in enumerate(tc.steps, 1): 
-            # Access step attributes using dot notation (e.g., step.action)
-            row = {
-                # Only include Test Case ID, Summary, and Description on the first step row
-                "Test Case ID": tc.test_case_id if idx == 1 else "",
-                "Summary": tc.title if idx == 1 else "",
-                "Description": tc.description if idx == 1 else "",
-                "Step Number": step.step_number, # Or use idx if you prefer
-                "Action": step.action,
-                "Data": step.data,
-                "Expected Result": step.expected_result
-            }
-            rows.append(row)
-            
-    if not rows:
-        # Create an empty DataFrame with the required columns
-        df_display = pd.DataFrame(columns=["Test Case ID", "Summary", "Description", "Step Number", "Action", "Data", "Expected Result"])
-    else:
-        df_display = pd.DataFrame(rows)
-
-    # Use BytesIO to write the Excel file to memory
-    excel_file = io.BytesIO()
-    with pd.ExcelWriter(excel_file, engine='openpyxl') as writer:
-        df_display.to_excel(writer, index=False, sheet_name='Test Cases')
-
-    excel_file.seek(0)
-    return excel_file
-
 # API Endpoints
 
 @app.get("/list-all-projects")
@@ -318,7 +300,7 @@ def list_jira_projects():
     url = f"{JIRA_BASE_URL}/rest/api/3/project"
     headers = {"Accept": "application/json"}
 
-    resp = requests.get(url, headers=headers, auth=HTTPBasicAuth(EMAIL, JIRA_API_TOKEN))
+    resp = get_jira_client(JIRA_BASE_URL, EMAIL, JIRA_API_TOKEN).get(url, headers=headers)
     print("Status Code:", resp.status_code)
     print("Raw response:", resp.text)
 
@@ -328,38 +310,33 @@ def list_jira_projects():
     return resp.json()
 
 
-@app.post("/jira/stories", response_model=List[JiraStory])
-def get_jira_stories(data: GetUserStories):
+# Streamed, so FastAPI does not validate the body; the model only documents it
+@app.post("/jira/stories", responses={200: {"model": List[JiraStory]}})
+async def get_jira_stories(data: GetUserStories):
+    """
+    Every story matching the JQL, served from the local story store.
+    The store is brought up to date first with an incremental sync (issues updated since
+    the last sync); `refresh` forces a full re-download.
+    """
     # jql = "project=SAS2R AND issuetype=Story AND status = Approved ORDER BY created DESC"
-    url = f"{JIRA_BASE_URL}/rest/api/3/search/jql"
-    # Fields to fetch: key, summary, description, acceptance criteria
-    fields = ["key", "summary", "description", "customfield_10121"]  # Replace with your actual custom field ID for Acceptance Criteria
+    try:
+        qid = await run_in_threadpool(sync_stories, data.jql, data.jira_api_key, data.refresh)
+    except requests.RequestException as e:
+        raise HTTPException(status_code=502, detail=f"Failed to fetch stories from Jira: {e}")
+    return StreamingResponse(stream_stored_stories(qid), media_type="application/json")
 
-    params = {
-        "jql": data.jql,
-        "fields": ",".join(fields),
-        "maxResults": 100  # Adjust as needed (max 1000 per request)
-    }
 
-    response = requests.get(
-        url,
-        params=params,
-        auth=HTTPBasicAuth(EMAIL, data.jira_api_key),
-        headers={"Accept": "application/json"}
-    )
-    # print(response.json())
-    stories = []
-    if response.status_code == 200:
-        issues = response.json()['issues']
-        for issue in issues:
-            issue_key = issue["key"]
-            summary = issue["fields"]["summary"]
-            description = extract_text_from_adf(issue["fields"].get("description", ""))
-            acceptance_criteria = extract_text_from_adf(issue["fields"].get("customfield_10121", ""))
-            stories.append({"key":issue_key,"summary":summary,"description":description,"acceptance_criteria":acceptance_criteria})
-    else:
-        print("Failed to fetch issues:", response.status_code, response.text)       
-    return stories
+@app.post("/jira/stories/stream")
+async def stream_jira_stories(data: GetUserStories):
+    """
+    Stories straight from Jira (bypassing the store), as NDJSON (one story per line) for incremental rendering.
+    A query Jira rejects is a 502; a page failing later ends the stream early.
+    """
+    try:
+        lines = await stream_stories_ndjson(data.jql, data.jira_api_key)
+    except requests.RequestException as e:
+        raise HTTPException(status_code=502, detail=f"Failed to fetch stories from Jira: {e}")
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
 
 @app.post("/jira/create_issue")
@@ -383,124 +360,114 @@ def api_add_test_steps(data: AddTestStepsRequest):
     return {"response": response}
 
 
-# --- QUALITY SCORE FUNCTION ---
-def rubric_score(cases_list):
+@app.post("/generate_test_scripts")
+async def api_generate_test_scripts(data: GenerateTestScriptsRequest):
     """
-    Calculate quality score for generated test cases (1-5 scale).
-    Score deductions:
-    - Less than 2 test cases: -1
-    - Duplicate titles: -1
-    - Empty or insufficient test steps: -1
+    Generate test scripts with quality checking.
+    Sequential mode retries up to 3 times if score < 4; hedged mode races `fanout` attempts, each a full model call.
+    Returns quality score and generation status.
     """
-    score = 5
-    
-    # Check minimum number of test cases
-    if not cases_list or len(cases_list) < 2:
-        score -= 1
-    
-    # Check for duplicate titles
-    titles = [c.get("Title", "").strip().lower() for c in cases_list]
-    if len(set(titles)) != len(titles):
-        score -= 1
-    
-    # Check for empty or insufficient test steps
-    for case in cases_list:
-        title = case.get("Title", "").strip()
-        steps_data = case.get("Steps", [])
-        
-        # Penalize empty title
-        if not title:
-            score -= 1
-            break
-        
-        # Penalize insufficient or empty steps
-        if not steps_data:
-            score -= 1
-            break
-        
-        # Check if steps have sufficient content
-        for step in steps_data:
-            action = step.get("Action", "").strip()
-            expected = step.get("Expected Result", "").strip()
-            if not action or len(expected) < 10:
-                score -= 1
-                break
-    
-    return max(score, 1)
+    data.context_json = with_uploaded_context(data.context_json, data.context_id)
+    prompt = await asyncio.to_thread(build_generation_prompt, data.description, data.requirement_text, data.context_json)
+    cache_key = make_cache_key(prompt.text, MODEL)
+    try:
+        best_result = await run_generation(
+            lambda: generate_from_prompt_async(prompt, endpoint="/generate_test_scripts"),
+            mode=data.generation_mode,
+            fanout=data.fanout,
+            cache_key=cache_key,
+            force_refresh=data.force_refresh,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    if best_result:
+        return await apply_validation(
+            best_result, data.requirement_text, data.context_json or "No context provided",
+            json.dumps(best_result["test_steps"], indent=2), cache_key=cache_key, endpoint="/generate_test_scripts",
+        )
 
-@app.post("/generate_test_scripts")
-def api_generate_test_scripts(data: GenerateTestScriptsRequest):
+    # Fallback error response
+    raise HTTPException(status_code=500, detail="Failed to generate test cases after multiple attempts.")
+
+def sse_event(event: str, payload) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.post("/generate_test_scripts/stream")
+async def api_generate_test_scripts_stream(data: GenerateTestScriptsRequest):
     """
-    Generate test scripts with quality checking and retry logic.
-    Retries up to 3 times if score < 4.
-    Returns quality score and generation status.
+    Same generation as /generate_test_scripts, streamed as Server-Sent Events:
+    attempt_started, rubric_score, attempt_failed, test_case, final, validation and error.
+    test_case events carry the chosen result's cases once generation is done, followed by
+    `final`; the validator verdict follows that.
     """
-    max_retries = 3
-    best_result = None
-    best_score = 0
-    
-    for attempt in range(1, max_retries + 1):
+    data.context_json = with_uploaded_context(data.context_json, data.context_id)
+    queue = asyncio.Queue()
+    context = data.context_json or "No context provided"
+    prompt = await asyncio.to_thread(build_generation_prompt, data.description, data.requirement_text, data.context_json)
+    cache_key = make_cache_key(prompt.text, MODEL)
+
+    async def emit(event, payload):
+        await queue.put((event, payload))
+
+    async def produce():
         try:
-            print(f"\n 🔄 Generation Attempt {attempt}/{max_retries}")
-            
-            # Generate test steps
-            test_steps = generate_test_scripts(data.description, data.requirement_text, data.context_json)
-            cleaned_cases = transform_test_cases(test_steps)
-            
-            # Run validator agent (prints detailed breakdown to backend console)
-            try:
-                validation = validate_testcases(data.requirement_text, data.context_json or "No context provided", json.dumps(cleaned_cases, indent=2))
-                v_score = validation.get("score") if isinstance(validation, dict) else None
-                print(f" 📊 Validator Score: {v_score}/5")
-            except Exception as e:
-                print(f" ⚠️ Validator failed: {e}")
-
-            # Calculate quality score (local rubric)
-            score = rubric_score(cleaned_cases)
-            print(f" 📊 Quality Score: {score}/5")
-            print("\n 👉 Test Cases:",json.dumps(cleaned_cases,indent=2),"\n")
-            
-            # Store best result
-            if score > best_score:
-                best_score = score
-                best_result = {
-                    "test_steps": cleaned_cases,
-                    "quality_score": score,
-                    "generation_attempts": attempt,
-                    "quality_status": "PASS" if score >= 4 else "BELOW_THRESHOLD"
-                }
-            
-            # If score meets threshold, return immediately
-            if score >= 4:
-                print(f" ✅ Quality threshold (4) met on attempt {attempt}")
-                return best_result
-            
-            # If not the last attempt, log retry
-            if attempt < max_retries:
-                print(f" ⚠️  Score below threshold (4). Retrying...")
-        
+            best_result = await run_generation(
+                lambda: generate_from_prompt_async(prompt, endpoint="/generate_test_scripts/stream"),
+                mode=data.generation_mode,
+                fanout=data.fanout,
+                cache_key=cache_key,
+                force_refresh=data.force_refresh,
+                on_event=emit,
+            )
+            if not best_result:
+                await emit("error", {"detail": "Failed to generate test cases after multiple attempts."})
+                return
+
+            # Never hold the final cases back for the validator; its verdict is streamed afterwards
+            mode = "off" if VALIDATION_MODE == "off" else "background"
+            best_result = await apply_validation(
+                best_result, data.requirement_text, context, json.dumps(best_result["test_steps"], indent=2),
+                mode=mode, cache_key=cache_key, endpoint="/generate_test_scripts/stream",
+            )
+            await emit("final", best_result)
+            if best_result["validation_status"] in ("PENDING", "DONE"):
+                await emit("validation", await wait_for_validation(best_result["generation_id"]))
         except Exception as e:
-            print(f" ❌ Error on attempt {attempt}: {str(e)}")
-            continue
-    
-    # Return best attempt if all retries exhausted
-    if best_result:
-        print(f" ⚠️  Max retries reached. Returning best attempt with score {best_score}")
-        return best_result
-    
-    # Fallback error response
-    raise HTTPException(status_code=500, detail="Failed to generate test cases after multiple attempts.")
+            await emit("error", {"detail": str(e)})
+        finally:
+            await queue.put(None)
+
+    async def event_stream():
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield sse_event(*item)
+        finally:
+            if not producer.done():
+                producer.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/generate-test-script-from-manual-input")
 async def generate_test_script_manual_input(request: ManualInputRequest):
     """
-    Generate test scripts from manual input with quality checking and retry logic.
-    Retries up to 3 times if score < 4.
+    Generate test scripts from manual input with quality checking.
+    Sequential mode retries up to 3 times if score < 4; hedged mode races `fanout` attempts, each a full model call.
     Returns quality score and generation status.
     """
     try:
-        context = request.context or "No context provided."  
+        context = request.context
+        if not context and request.context_id:
+            context = with_uploaded_context(None, request.context_id)["file_context"]
+        context = context or "No context provided."
         
         # Validate the manual input
         if not is_valid_requirement(request.manual_input):
@@ -508,59 +475,25 @@ async def generate_test_script_manual_input(request: ManualInputRequest):
                 status_code=400,
                 detail="The provided manual input does not appear to be a valid requirement.",
             )
-        
-        max_retries = 3
-        best_result = None
-        best_score = 0
-        
-        for attempt in range(1, max_retries + 1):
-            try:
-                print(f"\n 🔄 Generation Attempt {attempt}/{max_retries}")
-                
-                # Generate test scripts using the provided input and context
-                test_steps = generate_test_scripts_from_manual_input(request.manual_input, context)
-                cleaned_cases = transform_test_cases(test_steps)
-                
-                # Run validator agent (prints detailed breakdown to backend console)
-                try:
-                    validation = validate_testcases(request.manual_input, context, json.dumps(cleaned_cases, indent=2))
-                    v_score = validation.get("score") if isinstance(validation, dict) else None
-                    print(f" 📊 Validator Score: {v_score}/5")
-                except Exception as e:
-                    print(f" ⚠️ Validator failed: {e}")
-
-                # Calculate quality score
-                score = rubric_score(cleaned_cases)
-                print(f" 📊 Quality Score: {score}/5")
-                print("\n 👉 Test Cases:",json.dumps(cleaned_cases,indent=2),"\n")
-                
-                # Store best result
-                if score > best_score:
-                    best_score = score
-                    best_result = {
-                        "test_steps": cleaned_cases,
-                        "quality_score": score,
-                        "generation_attempts": attempt,
-                        "quality_status": "PASS" if score >= 4 else "BELOW_THRESHOLD"
-                    }
-                
-                # If score meets threshold, return immediately
-                if score >= 4:
-                    print(f" ✅ Quality threshold (4) met on attempt {attempt}")
-                    return best_result
-                
-                # If not the last attempt, log retry
-                if attempt < max_retries:
-                    print(f" ⚠️  Score below threshold (4). Retrying...")
-            
-            except Exception as e:
-                print(f" ❌ Error on attempt {attempt}: {str(e)}")
-                continue
-        
-        # Return best attempt if all retries exhausted
+
+        prompt = await asyncio.to_thread(build_manual_input_prompt, request.manual_input, context)
+        cache_key = make_cache_key(prompt.text, MODEL)
+        try:
+            best_result = await run_generation(
+                lambda: generate_from_prompt_async(prompt, "manual_input", "/generate-test-script-from-manual-input"),
+                mode=request.generation_mode,
+                fanout=request.fanout,
+                cache_key=cache_key,
+                force_refresh=request.force_refresh,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
         if best_result:
-            print(f" ⚠️  Max retries reached. Returning best attempt with score {best_score}")
-            return best_result
+            return await apply_validation(
+                best_result, request.manual_input, context, json.dumps(best_result["test_steps"], indent=2),
+                cache_key=cache_key, endpoint="/generate-test-script-from-manual-input",
+            )
         
         # Fallback error response
         raise HTTPException(status_code=500, detail="Failed to generate test scripts after multiple attempts.")
@@ -571,35 +504,86 @@ async def generate_test_script_manual_input(request: ManualInputRequest):
         raise HTTPException(status_code=500, detail=f"Failed to generate test script from manual input: {str(e)}")
 
 
+@app.post("/generate_test_scripts/batch")
+async def api_generate_test_scripts_batch(data: BatchGenerateRequest):
+    """
+    Start a batch job generating test scripts for every selected story.
+    Poll GET /generate_test_scripts/batch/{job_id} for status and per-story results.
+    """
+    if data.story_keys:
+        keys = list(dict.fromkeys(k.strip().upper() for k in data.story_keys if k.strip()))
+        if len(keys) > MAX_BATCH_STORIES:
+            raise HTTPException(status_code=400, detail=f"Batch is limited to {MAX_BATCH_STORIES} stories; got {len(keys)}.")
+        try:
+            jql = story_keys_jql(keys)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif data.jql:
+        jql = data.jql
+    else:
+        raise HTTPException(status_code=400, detail="Provide either story_keys or jql.")
+    context_json = with_uploaded_context(data.context_json, data.context_id)
+
+    # a one-off fetch: batch queries are not synced into the story store
+    try:
+        stories = await run_in_threadpool(fetch_stories, jql, data.jira_api_key, MAX_BATCH_STORIES)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Batch is limited to {MAX_BATCH_STORIES} stories. {e}")
+    except requests.RequestException as e:
+        raise HTTPException(status_code=502, detail=f"Failed to fetch stories from Jira: {e}")
+    if not stories:
+        raise HTTPException(status_code=404, detail="No stories matched the request.")
+
+    job_id = await start_batch_job(
+        stories,
+        context_json=context_json,
+        options={
+            "generation_mode": data.generation_mode, "fanout": data.fanout, "force_refresh": data.force_refresh,
+            "endpoint": "/generate_test_scripts/batch",
+        },
+    )
+    return {"job_id": job_id, "status": "PENDING", "total": len(stories)}
+
+
+@app.get("/generate_test_scripts/batch/{job_id}")
+def get_batch_job(job_id: str):
+    """Job status with the results generated so far."""
+    job = get_batch_store().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No batch job {job_id}.")
+    return job
+
+
+@app.get("/validation/{generation_id}")
+def get_validation_result(generation_id: str):
+    """Fetch the validator verdict for a generation (stored by background or blocking validation)."""
+    record = validation_store.get(generation_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"No validation found for generation {generation_id}.")
+    return record
+
+
+@app.get("/metrics/prompts")
+def get_prompt_metrics():
+    """Prompt token counts (total and per section), truncations and Cortex latency per endpoint and prompt kind since startup."""
+    return prompt_metrics.snapshot()
+
+
 @app.post("/upload-test-scripts-to-jira")
 def upload_test_scripts_to_jira(req: UploadTestScriptsRequest):
-    xray_token = get_oauth_token()
-    print(" Xray token obtained.\n")
     # print(" Received Test Case:", req)
     # for each test case in req: create a test issue in Jira and add steps to it and I need to create a test execution issue and link all the test issues to it and update the test results to ToDo
-    test_keys = []
-    for test_case in req.testScripts:
-        # Create Test Issue
-        test_issue = create_issue(test_case.title, "Test")
-        test_key = test_issue["key"]
-        test_keys.append(test_key)
-        test_id = get_internal_issue_id(test_key)
-        print(f" 🧪 Created Test issue: {test_key} (id={test_id})")
-        add_jira_test_steps(xray_token, test_id, test_case.steps)
-    # Create Execution Issue
-    print("\n ==> Test Cases created. Now creating Test Execution and linking tests...\n")
-    exec_issue = create_issue(f"Execution - {req.summary}", "Test Execution")
-    exec_key = exec_issue["key"]
-    exec_id = get_internal_issue_id(exec_key)
-    print(f"🧪 Created Test Execution: {exec_key} (id={exec_id})")
-    # Link all tests to execution and update results
-    for test_key in test_keys:
-        test_id = get_internal_issue_id(test_key)
-        link_test_to_execution(xray_token, exec_id, test_id)
-        run_id = get_test_run_id(xray_token, exec_id, test_id)
-        if run_id:
-            update_test_result(xray_token, run_id, "TODO")
-    return {"message": "Test scripts uploaded to Jira successfully.","test_execution_url": f"{JIRA_BASE_URL}/browse/{exec_key}"}
+    upload = upload_test_cases(xray_tokens, req.summary, req.testScripts)
+    response = {
+        "message": "Test scripts uploaded to Jira successfully.",
+        "test_execution_url": f"{JIRA_BASE_URL}/browse/{upload['exec_key']}" if upload["exec_key"] else None,
+        "test_keys": upload["test_keys"],
+        "errors": upload["errors"],
+    }
+    if upload["errors"]:
+        # Some issues were created; report them with what failed rather than an error status
+        response["message"] = f"Uploaded {len(upload['test_keys'])} of {len(req.testScripts)} test scripts; see errors."
+    return response
     
     # Create Test
     # test_issue = create_issue(req.summary, "Test")
@@ -624,62 +608,196 @@ def upload_test_scripts_to_jira(req: UploadTestScriptsRequest):
     # return {"message": "Test scripts uploaded to Jira successfully.", "test_execution_url": f"{JIRA_BASE_URL}/browse/{exec_key}"}
 
 @app.post("/download")
-def download_test_scripts_excel(test_cases: List[TestCase]):
+def download_test_scripts_excel(test_cases: List[TestCase], file_format: str = Query("xlsx", alias="format")):
     """
-    Endpoint to receive test case data and return it as an Excel file.
+    Endpoint to receive test case data and return it as an Excel file (or CSV with ?format=csv).
+    The file is written row by row into a spooled temp file and streamed back in chunks.
     """
+    if file_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}.")
+    media_type, filename = EXPORT_FORMATS[file_format]
     try:
-        excel_io = generate_excel_data(test_cases)
-        
-        # Return a StreamingResponse with the Excel file data
-        return StreamingResponse(
-            # The 'content' must be an iterable of bytes, BytesIO is good here
-            content=excel_io, 
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={
-                # Tells the browser to download the file and suggests a filename
-                'Content-Disposition': 'attachment; filename="test_scripts.xlsx"'
-            }
-        )
+        export_file = export_test_cases(test_cases, file_format)
     except Exception as e:
         # Handle potential errors during Excel generation
-        print(f"Error during Excel generation: {e}")
-        raise HTTPException(status_code=500, detail="Failed to generate Excel file.")
+        print(f"Error during {file_format} generation: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to generate {file_format} file.")
+
+    return StreamingResponse(
+        content=iter_file_chunks(export_file),
+        media_type=media_type,
+        headers={
+            # Tells the browser to download the file and suggests a filename
+            'Content-Disposition': f'attachment; filename="{filename}"'
+        }
+    )
+
+
+CONTEXT_EXTRACTORS = [
+    ((".txt", ".text"), extract_text_from_plain_text),
+    ((".docx",), extract_text_from_docx),
+    ((".json",), extract_text_from_json),
+    ((".yaml", ".yml"), extract_text_from_yaml),
+    ((".csv",), extract_text_from_csv),
+    ((".xls", ".xlsx"), extract_text_from_excel),
+]
+
+
+def save_upload_to_temp(file: UploadFile, suffix: str):
+    """
+    Copy an upload to a temporary file in chunks (without reading it all into memory),
+    hashing it on the way; returns (path, sha256 hex digest).
+    """
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        while True:
+            chunk = file.file.read(1024 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+            tmp.write(chunk)
+        return tmp.name, digest.hexdigest()
+
+
+def remove_temp_file(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def with_uploaded_context(context_json, context_id):
+    """Merge the upload referenced by `context_id` into `context_json` as `file_context` (as the UI would send it)."""
+    if not context_id:
+        return context_json
+    file_context = resolve_file_context(context_id)
+    if file_context is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired context_id {context_id}; upload the file again.")
+    return {**(context_json or {}), "file_context": file_context}
+
+
+def context_response(filename, context_id, text, cached=False):
+    return {"filename": filename, **text, "context_id": context_id, "cached": cached}
+
+
 @app.post("/upload_context")
-async def api_extract_text(file: UploadFile = File(...)):
+async def api_extract_text(
+    file: UploadFile = File(...),
+    max_pages: Optional[int] = Form(None),
+    max_chars: Optional[int] = Form(None),
+    max_rows: Optional[int] = Form(None),
+    sheet_names: Optional[str] = Form(None),
+    stream: bool = Form(False),
+):
     """
     Upload and extract content from documents.
     Supported document formats: PDF, TXT, JSON, YAML, CSV, Excel (XLS, XLSX), DOCX
     Image/OCR support has been removed.
+    Extractions are cached by file digest; the returned `context_id` can be sent to the
+    generation endpoints instead of the extracted text.
+    PDFs are parsed in parallel page ranges in a process pool; `max_pages` / `max_chars` cap the work.
+    CSV/Excel rows are streamed up to `max_rows` / `max_chars`; `sheet_names` (comma separated) picks Excel sheets.
+    With `stream`, progress is sent as Server-Sent Events (progress, result, error).
     """
-    file_bytes = await file.read()
     filename = file.filename.lower()
+    store = get_context_store()
+
+    if filename.endswith(".pdf"):
+        path, digest = await run_in_threadpool(save_upload_to_temp, file, ".pdf")
+        streaming = False  # once the stream owns the temp file, it is removed after the response
+        try:
+            context_id = make_context_id(digest, {"type": "pdf", "max_pages": max_pages, "max_chars": max_chars})
+            cached = await run_in_threadpool(store.get, context_id)
+            if cached:
+                cached.pop("filename", None)
+                result = context_response(file.filename, context_id, cached, cached=True)
+                if stream:
+                    return StreamingResponse(iter([sse_event("result", result)]), media_type="text/event-stream")
+                return result
+            if stream:
+                streaming = True
+                return StreamingResponse(
+                    stream_pdf_extraction(file.filename, context_id, path, max_pages, max_chars),
+                    media_type="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                    # runs even if the client disconnects before the stream starts
+                    background=BackgroundTask(remove_temp_file, path),
+                )
+            try:
+                text = await extract_text_from_pdf_file(path, max_pages, max_chars)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            if not streaming:
+                remove_temp_file(path)
+        await run_in_threadpool(store.put, context_id, file.filename, text)
+        return context_response(file.filename, context_id, text)
+
+    extractor = next((extract for suffixes, extract in CONTEXT_EXTRACTORS if filename.endswith(suffixes)), None)
+    if extractor is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Unsupported file type. Supported: PDF, TXT, DOCX, JSON, YAML, CSV, Excel",
+        )
+
+    options = {}
+    if extractor in (extract_text_from_csv, extract_text_from_excel):
+        options = {"max_rows": max_rows, "max_chars": max_chars}
+    if extractor is extract_text_from_excel and sheet_names:
+        options["sheet_names"] = [name.strip() for name in sheet_names.split(",") if name.strip()]
+
+    file_bytes = await file.read()
+    context_id = make_context_id(hashlib.sha256(file_bytes).hexdigest(), {"type": os.path.splitext(filename)[1], **options})
+    cached = await run_in_threadpool(store.get, context_id)
+    if cached:
+        cached.pop("filename", None)
+        result = context_response(file.filename, context_id, cached, cached=True)
+    else:
+        try:
+            text = await run_in_threadpool(extractor, file_bytes, **options)
+        except ValueError as e:
+            if stream:
+                return StreamingResponse(iter([sse_event("error", {"detail": str(e)})]), media_type="text/event-stream")
+            raise HTTPException(status_code=400, detail=str(e))
+        await run_in_threadpool(store.put, context_id, file.filename, text)
+        result = context_response(file.filename, context_id, text)
+
+    if stream:
+        return StreamingResponse(iter([sse_event("result", result)]), media_type="text/event-stream")
+    return result
 
-    try:
-        # Document formats
-        if filename.endswith(".pdf"):
-            text = extract_text_from_pdf(file_bytes)
-        elif filename.endswith((".txt", ".text")):
-            text = extract_text_from_plain_text(file_bytes)
-        elif filename.endswith(".docx"):
-            text = extract_text_from_docx(file_bytes)
-        elif filename.endswith(".json"):
-            text = extract_text_from_json(file_bytes)
-        elif filename.endswith((".yaml", ".yml")):
-            text = extract_text_from_yaml(file_bytes)
-        elif filename.endswith(".csv"):
-            text = extract_text_from_csv(file_bytes)
-        elif filename.endswith((".xls", ".xlsx")):
-            text = extract_text_from_excel(file_bytes)
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail="Unsupported file type. Supported: PDF, TXT, DOCX, JSON, YAML, CSV, Excel",
-            )
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
 
-    return {"filename": file.filename, **text}
+async def stream_pdf_extraction(display_name, context_id, path, max_pages, max_chars):
+    """SSE stream of a PDF extraction: `progress` per finished page range, then `result` or `error`. The response removes `path` afterwards."""
+    queue = asyncio.Queue()
+
+    async def on_progress(pages_done, total_pages):
+        await queue.put(("progress", {"pages_done": pages_done, "total_pages": total_pages}))
+
+    async def produce():
+        try:
+            text = await extract_text_from_pdf_file(path, max_pages, max_chars, on_progress)
+            await run_in_threadpool(get_context_store().put, context_id, display_name, text)
+            await queue.put(("result", context_response(display_name, context_id, text)))
+        except Exception as e:
+            await queue.put(("error", {"detail": str(e)}))
+        finally:
+            await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            yield sse_event(*item)
+    finally:
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
 
 @app.post("/scrape_url")
 def api_scrape_url(request: ScrapeURLRequest):
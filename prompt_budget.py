@@ -0,0 +1,160 @@
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+try:
+    import tiktoken
+except ImportError:  # token counts fall back to a character estimate
+    tiktoken = None
+
+load_dotenv()
+
+PROMPT_TOKEN_ENCODING = os.getenv("PROMPT_TOKEN_ENCODING", "cl100k_base")
+# Per-section token budgets; a section over its budget is cut to its first N tokens
+PROMPT_BUDGETS = {
+    "description": int(os.getenv("PROMPT_DESCRIPTION_TOKENS", "2000")),
+    "requirement": int(os.getenv("PROMPT_REQUIREMENT_TOKENS", "2000")),
+    "manual_input": int(os.getenv("PROMPT_MANUAL_INPUT_TOKENS", "4000")),
+    "context": int(os.getenv("PROMPT_CONTEXT_TOKENS", "4000")),
+    "draft": int(os.getenv("PROMPT_DRAFT_TOKENS", "8000")),
+}
+LOG_PROMPTS = os.getenv("LOG_PROMPTS", "off").lower() == "on"  # print full prompts, not just their size
+TRUNCATION_MARKER = "\n[... truncated {} tokens]"
+
+PromptBuild = namedtuple("PromptBuild", "text tokens sections truncated")
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    """The tiktoken encoding, loaded once; None when tiktoken (or its encoding file) is unavailable."""
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    _encoding = tiktoken.get_encoding(PROMPT_TOKEN_ENCODING)
+                except Exception as e:
+                    print(f" ⚠️  Tokenizer {PROMPT_TOKEN_ENCODING} unavailable, estimating tokens: {e}")
+                    _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    encoding = get_encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, budget: int):
+    """Keep the first `budget` tokens of `text`. Returns (text, tokens_kept, tokens_dropped)."""
+    encoding = get_encoding()
+    if encoding is None:
+        total = math.ceil(len(text) / 4)
+        if total <= budget:
+            return text, total, 0
+        return text[:budget * 4] + TRUNCATION_MARKER.format(total - budget), budget, total - budget
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= budget:
+        return text, len(tokens), 0
+    dropped = len(tokens) - budget
+    return encoding.decode(tokens[:budget]) + TRUNCATION_MARKER.format(dropped), budget, dropped
+
+
+def build_prompt(template: str, sections) -> PromptBuild:
+    """
+    Fill `template` with `sections`, a list of (name, value) pairs in placeholder order
+    (positional `{}` or named `{name}`). Each value is rendered as str.format would and
+    cut to its PROMPT_BUDGETS entry; unknown section names are not budgeted.
+    """
+    values = []
+    section_tokens = {}
+    truncated = {}
+    for name, value in sections:
+        text = str(value)
+        budget = PROMPT_BUDGETS.get(name)
+        if budget is not None:
+            text, kept, dropped = truncate_to_tokens(text, budget)
+            if dropped:
+                truncated[name] = dropped
+                print(f" ✂️  Prompt section '{name}' cut to {budget} tokens ({dropped} dropped)")
+        else:
+            kept = count_tokens(text)
+        section_tokens[name] = kept
+        values.append((name, text))
+
+    prompt = template.format(*(text for _, text in values), **dict(values))
+    return PromptBuild(prompt, count_tokens(prompt), section_tokens, truncated)
+
+
+class PromptMetrics:
+    """In-process prompt size and Cortex latency counters, per endpoint and prompt kind."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, kind, build: PromptBuild, seconds=None, endpoint=None):
+        """`endpoint` names the API route that built the prompt; calls made outside one count as "other"."""
+        with self._lock:
+            stats = self._stats.setdefault((endpoint or "other", kind), {
+                "calls": 0, "prompt_tokens_total": 0, "prompt_tokens_max": 0,
+                "section_tokens_total": {}, "truncations": {}, "latency_seconds_total": 0.0, "timed_calls": 0,
+            })
+            stats["calls"] += 1
+            stats["prompt_tokens_total"] += build.tokens
+            stats["prompt_tokens_max"] = max(stats["prompt_tokens_max"], build.tokens)
+            for name, tokens in build.sections.items():
+                stats["section_tokens_total"][name] = stats["section_tokens_total"].get(name, 0) + tokens
+            for name in build.truncated:
+                stats["truncations"][name] = stats["truncations"].get(name, 0) + 1
+            if seconds is not None:
+                stats["latency_seconds_total"] += seconds
+                stats["timed_calls"] += 1
+
+    def snapshot(self):
+        """{endpoint: {kind: stats}}."""
+        with self._lock:
+            result = {}
+            for (endpoint, kind), stats in self._stats.items():
+                calls = stats["calls"]
+                timed = stats["timed_calls"]
+                result.setdefault(endpoint, {})[kind] = {
+                    "calls": calls,
+                    "prompt_tokens_avg": round(stats["prompt_tokens_total"] / calls, 1),
+                    "prompt_tokens_max": stats["prompt_tokens_max"],
+                    "section_tokens_avg": {name: round(total / calls, 1) for name, total in stats["section_tokens_total"].items()},
+                    "truncations": dict(stats["truncations"]),
+                    "latency_seconds_avg": round(stats["latency_seconds_total"] / timed, 3) if timed else None,
+                }
+            return result
+
+
+prompt_metrics = PromptMetrics()
+
+
+def log_prompt(kind, build: PromptBuild):
+    if LOG_PROMPTS:
+        print("\nprompt:", build.text)
+    sections = ", ".join(f"{name}={tokens}" for name, tokens in build.sections.items())
+    print(f" 📏 {kind} prompt: {build.tokens} tokens ({sections})")
+
+
+@contextmanager
+def measured_prompt(kind, build: PromptBuild, endpoint=None):
+    """Log the prompt size, then record it under `endpoint` and `kind` with the Cortex latency of the wrapped call."""
+    log_prompt(kind, build)
+    started = time.perf_counter()
+    try:
+        yield build.text
+    except BaseException:
+        prompt_metrics.record(kind, build, endpoint=endpoint)
+        raise
+    prompt_metrics.record(kind, build, time.perf_counter() - started, endpoint)
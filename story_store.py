@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from jira_stories import fetch_issue_page, story_from_issue
+from sqlite_store import SQLiteStore, lazy_singleton
+
+load_dotenv()
+
+STORY_STORE_PATH = os.getenv("STORY_STORE_PATH", os.path.join(".cache", "story_store.sqlite3"))
+# Incremental syncs only see issues that were updated and still match; a periodic full
+# sync also drops stories that stopped matching (moved status, deleted, ...)
+STORY_FULL_SYNC_INTERVAL = int(os.getenv("STORY_FULL_SYNC_INTERVAL", "3600"))  # seconds
+# Skip Jira entirely when the last sync of the query is this recent
+STORY_SYNC_MIN_INTERVAL = int(os.getenv("STORY_SYNC_MIN_INTERVAL", "30"))  # seconds
+SQLITE_MAX_PARAMS = 500  # keys per IN (...) lookup, well under SQLite's bound-parameter limit
+
+_ORDER_BY = re.compile(r"\s+ORDER\s+BY\s+.*$", re.IGNORECASE | re.DOTALL)
+
+
+def query_id(jql, jira_api_key):
+    """Sync state is kept per (credentials, JQL) so one user's results are never served to another key."""
+    digest = hashlib.sha256()
+    digest.update((jira_api_key or "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(jql.strip().encode("utf-8"))
+    return digest.hexdigest()
+
+
+def parse_jira_datetime(stamp):
+    """A Jira datetime field such as 2024-05-01T10:22:33.123+0200."""
+    return datetime.strptime(stamp, "%Y-%m-%dT%H:%M:%S.%f%z")
+
+
+def latest_update(issues, current=None):
+    """The most recent `updated` stamp among `issues` and `current`, or None if there is none."""
+    stamps = [stamp for stamp in ((issue.get("fields") or {}).get("updated") for issue in issues) if stamp]
+    if current:
+        stamps.append(current)
+    return max(stamps, key=parse_jira_datetime, default=None)
+
+
+def delta_jql(jql, last_updated):
+    """
+    Restrict `jql` to issues updated at or after `last_updated`, the newest `updated` stamp of the
+    previous sync. Jira reports that stamp in the API user's time zone, which is also the zone it
+    reads JQL dates in, so the stamp's own wall-clock time is used. JQL dates have minute resolution;
+    the minute of the last seen update is fetched again rather than skipped.
+    """
+    match = _ORDER_BY.search(jql)
+    base = jql[:match.start()] if match else jql
+    order = match.group(0) if match else ""
+    since = parse_jira_datetime(last_updated).strftime("%Y/%m/%d %H:%M")
+    return f'({base.strip()}) AND updated >= "{since}"{order}'
+
+
+class StoryStore(SQLiteStore):
+    """
+    SQLite copy of Jira stories with the ADF already flattened to text.
+    `stories` holds one row per issue version; `query_members` records which stories
+    each synced query returned, in Jira's order.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS stories ("
+        " key TEXT PRIMARY KEY, summary TEXT, description TEXT, acceptance_criteria TEXT,"
+        " updated TEXT, synced_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS query_members ("
+        " query_id TEXT NOT NULL, story_key TEXT NOT NULL, position REAL NOT NULL,"
+        " PRIMARY KEY (query_id, story_key))",
+        "CREATE TABLE IF NOT EXISTS query_syncs ("
+        " query_id TEXT PRIMARY KEY, last_sync REAL NOT NULL, last_full_sync REAL NOT NULL, last_updated TEXT)",
+    )
+
+    def __init__(self, path=STORY_STORE_PATH):
+        super().__init__(path)
+
+    def get_sync(self, qid):
+        with self._lock, self._connect() as conn:
+            return conn.execute("SELECT last_sync, last_full_sync, last_updated FROM query_syncs WHERE query_id = ?", (qid,)).fetchone()
+
+    def save_issues(self, issues):
+        """Upsert issues, flattening ADF only for issues whose `updated` stamp changed."""
+        if not issues:
+            return
+        now = time.time()
+        keys = [issue["key"] for issue in issues]
+        with self._lock, self._connect() as conn:
+            known = {}
+            for offset in range(0, len(keys), SQLITE_MAX_PARAMS):
+                chunk = keys[offset:offset + SQLITE_MAX_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                known.update(conn.execute(f"SELECT key, updated FROM stories WHERE key IN ({placeholders})", chunk).fetchall())
+            rows = []
+            for issue in issues:
+                updated = (issue.get("fields") or {}).get("updated")
+                if updated and known.get(issue["key"]) == updated:
+                    continue
+                story = story_from_issue(issue)
+                rows.append((story["key"], story["summary"], story["description"], story["acceptance_criteria"], updated, now))
+            conn.executemany(
+                "INSERT OR REPLACE INTO stories (key, summary, description, acceptance_criteria, updated, synced_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def replace_members(self, qid, keys, synced_at, last_updated):
+        """Full sync: the query's membership becomes exactly `keys`, in order."""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM query_members WHERE query_id = ?", (qid,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO query_members (query_id, story_key, position) VALUES (?, ?, ?)",
+                [(qid, key, position) for position, key in enumerate(keys)],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO query_syncs (query_id, last_sync, last_full_sync, last_updated) VALUES (?, ?, ?, ?)",
+                (qid, synced_at, synced_at, last_updated),
+            )
+
+    def add_members(self, qid, keys, synced_at, last_updated):
+        """Incremental sync: stories new to the query go first (most recently updated), existing ones keep their place."""
+        with self._lock, self._connect() as conn:
+            first = conn.execute("SELECT MIN(position) FROM query_members WHERE query_id = ?", (qid,)).fetchone()[0] or 0
+            existing = {row[0] for row in conn.execute("SELECT story_key FROM query_members WHERE query_id = ?", (qid,))}
+            new_keys = [key for key in keys if key not in existing]
+            conn.executemany(
+                "INSERT INTO query_members (query_id, story_key, position) VALUES (?, ?, ?)",
+                [(qid, key, first - len(new_keys) + i) for i, key in enumerate(new_keys)],
+            )
+            conn.execute("UPDATE query_syncs SET last_sync = ?, last_updated = ? WHERE query_id = ?", (synced_at, last_updated, qid))
+
+    def iter_stories(self, qid):
+        """Yield the stored stories of a query in order, straight from the cursor."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "SELECT s.key, s.summary, s.description, s.acceptance_criteria FROM query_members m"
+                " JOIN stories s ON s.key = m.story_key WHERE m.query_id = ? ORDER BY m.position",
+                (qid,),
+            )
+            for key, summary, description, acceptance_criteria in cursor:
+                yield {"key": key, "summary": summary, "description": description, "acceptance_criteria": acceptance_criteria}
+
+
+get_story_store = lazy_singleton(StoryStore)
+
+
+def _fetch_all_issues(jql, jira_api_key):
+    issues, page_token = fetch_issue_page(jql, jira_api_key)
+    while page_token:
+        page, page_token = fetch_issue_page(jql, jira_api_key, page_token)
+        issues.extend(page)
+    return issues
+
+
+def sync_stories(jql, jira_api_key, full=False):
+    """
+    Bring the local copy of `jql` up to date and return its query id.
+    Runs a full sync the first time, when `full` is set, or every STORY_FULL_SYNC_INTERVAL;
+    otherwise only fetches issues updated since the newest update the last sync saw.
+    If Jira is unreachable but the query was synced before, the stored copy is served as-is.
+    """
+    store = get_story_store()
+    qid = query_id(jql, jira_api_key)
+    state = store.get_sync(qid)
+    started_at = time.time()
+
+    if state and not full:
+        last_sync, last_full_sync, last_updated = state
+        if started_at - last_sync < STORY_SYNC_MIN_INTERVAL:
+            return qid
+        # without a stamp (the query matched nothing) there is nothing to count from; sync in full
+        if last_updated and started_at - last_full_sync < STORY_FULL_SYNC_INTERVAL:
+            try:
+                issues = _fetch_all_issues(delta_jql(jql, last_updated), jira_api_key)
+            except Exception as e:
+                print(f" ⚠️ Incremental story sync failed, serving stored stories: {e}")
+                return qid
+            store.save_issues(issues)
+            store.add_members(qid, [issue["key"] for issue in issues], started_at, latest_update(issues, last_updated))
+            print(f" 🔄 Incremental story sync: {len(issues)} updated")
+            return qid
+
+    try:
+        issues = _fetch_all_issues(jql, jira_api_key)
+    except Exception as e:
+        if state is None:
+            raise
+        print(f" ⚠️ Full story sync failed, serving stored stories: {e}")
+        return qid
+    store.save_issues(issues)
+    store.replace_members(qid, [issue["key"] for issue in issues], started_at, latest_update(issues))
+    print(f" 🔄 Full story sync: {len(issues)} stories")
+    return qid
+
+
+def stream_stored_stories(qid):
+    """Encode a synced query's stories as one JSON array, row by row."""
+    yield "["
+    for idx, story in enumerate(get_story_store().iter_stories(qid)):
+        yield ("," if idx else "") + json.dumps(story)
+    yield "]"
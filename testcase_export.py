@@ -0,0 +1,118 @@
+import csv
+import io
+import json
+import tempfile
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font
+from openpyxl.utils import get_column_letter
+
+EXPORT_COLUMNS = ["Test Case ID", "Summary", "Description", "Step Number", "Action", "Data", "Expected Result"]
+COLUMN_WIDTHS = [16, 40, 50, 12, 50, 30, 50]
+GROUPED_COLUMNS = 3  # Test Case ID, Summary and Description are merged over a test case's steps
+EXPORT_FORMATS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "test_scripts.xlsx"),
+    "csv": ("text/csv", "test_scripts.csv"),
+}
+SPOOL_MAX_MEMORY = 4 * 1024 * 1024  # exports larger than this spill to a temp file
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _cell_value(value):
+    # step data is free-form in the schema; nested values are written as JSON
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return json.dumps(value)
+
+
+def iter_export_rows(test_cases):
+    """One row per step; the test case columns are only filled on its first step (as in the UI table)."""
+    for tc in test_cases:
+        for idx, step in enumerate(tc.steps, 1):
+            first = idx == 1
+            yield [
+                tc.test_case_id if first else "",
+                tc.title if first else "",
+                tc.description if first else "",
+                step.step_number,
+                step.action,
+                _cell_value(step.data),
+                step.expected_result,
+            ]
+
+
+def write_csv(test_cases, fileobj):
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="", write_through=True)
+    writer = csv.writer(text)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in iter_export_rows(test_cases):
+        writer.writerow(["" if value is None else value for value in row])
+    text.detach()
+
+
+def write_xlsx(test_cases, fileobj):
+    """
+    Write rows straight to the sheet with openpyxl's write-only mode (no row list, no DataFrame),
+    with column widths, a frozen header and each test case's columns merged over its steps.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Test Cases")
+    for index, width in enumerate(COLUMN_WIDTHS, 1):
+        sheet.column_dimensions[get_column_letter(index)].width = width
+    sheet.freeze_panes = "A2"
+
+    header_font = Font(bold=True)
+    top = Alignment(vertical="top", wrap_text=True)
+
+    def cell(value, **style):
+        result = WriteOnlyCell(sheet, value=value)
+        for name, style_value in style.items():
+            setattr(result, name, style_value)
+        return result
+
+    sheet.append([cell(name, font=header_font) for name in EXPORT_COLUMNS])
+    row_number = 1
+    for tc in test_cases:
+        steps = len(tc.steps)
+        if not steps:
+            continue
+        first_row = row_number + 1
+        for idx, row in enumerate(iter_export_rows([tc]), 1):
+            if idx == 1:
+                row[:GROUPED_COLUMNS] = [cell(value, alignment=top) for value in row[:GROUPED_COLUMNS]]
+            else:
+                row[:GROUPED_COLUMNS] = [None] * GROUPED_COLUMNS
+            sheet.append(row)
+            row_number += 1
+        if steps > 1:
+            for column in range(1, GROUPED_COLUMNS + 1):
+                letter = get_column_letter(column)
+                sheet.merged_cells.add(f"{letter}{first_row}:{letter}{row_number}")
+    workbook.save(fileobj)
+
+
+def export_test_cases(test_cases, file_format="xlsx"):
+    """Write the export to a spooled temp file (memory first, disk once large) and return it rewound."""
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}.")
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    try:
+        (write_csv if file_format == "csv" else write_xlsx)(test_cases, spooled)
+    except Exception:
+        spooled.close()
+        raise
+    spooled.seek(0)
+    return spooled
+
+
+def iter_file_chunks(fileobj, chunk_size=STREAM_CHUNK_SIZE):
+    """Stream a file in chunks and close it afterwards."""
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
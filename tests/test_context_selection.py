@@ -0,0 +1,85 @@
+import pytest
+
+import context_selection
+import prompt_budget
+from context_selection import BM25Index, chunk_text, select_context, select_text
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    """Estimate tokens from characters (4 each) whether or not tiktoken is installed, and start with empty caches."""
+    monkeypatch.setattr(prompt_budget, "_encoding", False)
+    monkeypatch.setattr(context_selection, "_indexes", context_selection.OrderedDict())
+    monkeypatch.setattr(context_selection, "_selections", context_selection.OrderedDict())
+
+
+def paragraph(sentence, chars=700):
+    """`sentence` repeated up to `chars` characters, so one or two paragraphs fill a chunk."""
+    return " ".join([sentence] * (chars // (len(sentence) + 1)))
+
+
+def document(*paragraphs):
+    return "\n\n".join(paragraphs)
+
+
+FILLER = [paragraph(f"Section {i} describes the reporting dashboard layout.") for i in range(12)]
+RELEVANT = paragraph("The password reset email must expire after thirty minutes.")
+
+
+def test_paragraphs_are_packed_and_long_ones_split_with_overlap():
+    assert chunk_text("aaaa\n\nbbbb\ncccc", size=10, overlap=0) == ["aaaa\nbbbb", "cccc"]
+
+    chunks = chunk_text("x" * 25, size=10, overlap=5)
+    assert chunks == ["x" * 10] * 4 + ["x" * 5]
+
+
+def test_bm25_ranks_the_chunk_sharing_the_rare_terms_first():
+    index = BM25Index([*FILLER[:5], RELEVANT])
+
+    scores = index.scores("password reset expiry")
+
+    assert max(range(len(scores)), key=scores.__getitem__) == 5
+    assert scores[:5] == [0] * 5
+
+
+def test_selected_chunks_keep_document_order_within_top_k():
+    text = document(RELEVANT, *FILLER, paragraph("A reset link is sent to the password owner."))
+
+    selected, used, total = select_text(text, "password reset", top_k=2, token_budget=1000)
+
+    assert (used, total) == (2, len(chunk_text(text)))
+    assert selected.index("thirty minutes") < selected.index("password owner")
+    assert "dashboard" not in selected
+
+
+def test_token_budget_skips_chunks_that_do_not_fit():
+    best = paragraph("Password reset.", 1190)  # a whole chunk each, ~300 estimated tokens
+    second = paragraph("Password reset or password change.", 1190)
+    small = "Reset the form before you leave the page."
+    text = document(best, small, second)
+
+    selected, used, total = select_text(text, "password reset", top_k=3, token_budget=320)
+
+    assert (used, total) == (2, 3)  # the second-ranked chunk would go over the budget
+    assert selected == best + context_selection.CHUNK_SEPARATOR + small
+
+
+def test_small_values_are_kept_and_large_ones_replaced(monkeypatch):
+    monkeypatch.setattr(context_selection, "CONTEXT_SELECTION_MIN_CHARS", 500)
+    large = document(*FILLER, RELEVANT)
+    context = {"spec": large, "notes": "short note"}
+
+    selected = select_context(context, "password reset")
+
+    assert selected["notes"] == "short note"
+    assert RELEVANT in selected["spec"] and len(selected["spec"]) < len(large)
+    assert select_context(context, "password reset") is not selected  # memoized values, fresh dict
+    assert select_context(context, "password reset") == selected
+
+
+def test_selection_can_be_switched_off(monkeypatch):
+    monkeypatch.setattr(context_selection, "CONTEXT_SELECTION", "off")
+    monkeypatch.setattr(context_selection, "CONTEXT_SELECTION_MIN_CHARS", 10)
+    large = document(*FILLER, RELEVANT)
+
+    assert select_context(large, "password reset") is large
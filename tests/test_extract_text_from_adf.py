@@ -0,0 +1,76 @@
+import sys
+
+import pytest
+
+from extract_text_from_adf import extract_text_from_adf
+
+
+def text(value, *marks):
+    node = {"type": "text", "text": value}
+    if marks:
+        node["marks"] = [{"type": mark} for mark in marks]
+    return node
+
+
+def paragraph(*content):
+    return {"type": "paragraph", "content": list(content)}
+
+
+def doc(*content):
+    return {"type": "doc", "version": 1, "content": list(content)}
+
+
+def nested_lists(depth):
+    root = doc()
+    parent = root
+    for level in range(depth):
+        item = {"type": "listItem", "content": [paragraph(text(f"Level {level}"))]}
+        parent["content"].append({"type": "bulletList", "content": [item]})
+        parent = item
+    return root
+
+
+@pytest.mark.parametrize("mode", ["plain", "markdown"])
+def test_nesting_deeper_than_the_recursion_limit(mode):
+    depth = sys.getrecursionlimit() * 3
+
+    lines = extract_text_from_adf(nested_lists(depth), mode=mode).split("\n")
+
+    assert len(lines) == depth
+    assert lines[0] == "- Level 0"
+    assert lines[-1] == "  " * (depth - 1) + f"- Level {depth - 1}"
+
+
+def test_nested_list_items_keep_their_markers():
+    item = lambda value, *inner: {"type": "listItem", "content": [paragraph(text(value)), *inner]}
+    ordered = {"type": "orderedList", "content": [item("b"), item("c")]}
+
+    assert extract_text_from_adf(doc({"type": "bulletList", "content": [item("a", ordered)]})) == "- a\n  1. b\n  2. c"
+
+
+def test_tables():
+    cell = lambda kind, value: {"type": kind, "content": [paragraph(text(value))]}
+    table = {"type": "table", "content": [
+        {"type": "tableRow", "content": [cell("tableHeader", "H1"), cell("tableHeader", "H2")]},
+        {"type": "tableRow", "content": [cell("tableCell", "x"), cell("tableCell", "y")]},
+    ]}
+
+    assert extract_text_from_adf(doc(table)) == "H1 | H2\nx | y"
+    assert extract_text_from_adf(doc(table), mode="markdown") == "| H1 | H2 |\n| --- | --- |\n| x | y |"
+
+
+def test_marks_only_in_markdown():
+    document = doc(paragraph(text("Use "), text("bold", "strong"), text(" here")))
+
+    assert extract_text_from_adf(document) == "Use bold here"
+    assert extract_text_from_adf(document, mode="markdown") == "Use **bold** here"
+
+
+@pytest.mark.parametrize("value, expected", [(None, ""), ({}, ""), ("  already text ", "already text")])
+def test_non_documents(value, expected):
+    assert extract_text_from_adf(value) == expected
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        extract_text_from_adf(doc(paragraph(text("x"))), mode="html")
@@ -0,0 +1,81 @@
+import types
+
+import pytest
+
+import generation_cache
+from generation_cache import MemoryCache, SQLiteCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the cache module's clock with one the test advances by hand."""
+    now = [1000.0]
+    monkeypatch.setattr(generation_cache, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "memory":
+            return MemoryCache(**kwargs)
+        return SQLiteCache(path=str(tmp_path / "generation_cache.sqlite3"), **kwargs)
+    return make
+
+
+def value(size):
+    """A cached value whose JSON form is exactly `size` bytes."""
+    return "x" * (size - 2)
+
+
+def test_round_trip(make_cache):
+    cache = make_cache()
+    cache.set("key", {"test_steps": [{"Title": "Login"}], "quality_score": 5})
+
+    assert cache.get("key") == {"test_steps": [{"Title": "Login"}], "quality_score": 5}
+    assert cache.get("missing") is None
+
+
+def test_entries_expire_after_the_ttl(make_cache, clock):
+    cache = make_cache(ttl=60)
+    cache.set("key", "value")
+
+    clock[0] += 60
+    assert cache.get("key") == "value"
+    clock[0] += 1
+    assert cache.get("key") is None
+
+
+def test_least_recently_used_entries_go_first_once_over_the_byte_budget(make_cache, clock):
+    cache = make_cache(max_bytes=30)
+    for key in ("a", "b", "c"):
+        cache.set(key, value(10))
+        clock[0] += 1
+    assert cache.get("a") is not None  # 30 bytes: exactly at the budget, nothing evicted
+    clock[0] += 1  # "b" is now the least recently used
+    cache.set("d", value(10))
+
+    assert cache.get("b") is None
+    assert [cache.get(key) is not None for key in ("a", "c", "d")] == [True, True, True]
+
+
+def test_replacing_an_entry_counts_only_its_new_size(make_cache, clock):
+    cache = make_cache(max_bytes=30)
+    cache.set("a", value(10))
+    clock[0] += 1
+    cache.set("b", value(10))
+    clock[0] += 1
+    cache.set("b", value(20))
+
+    assert cache.get("a") is not None
+    assert cache.get("b") == value(20)
+
+
+def test_an_entry_over_the_budget_alone_is_still_kept(make_cache, clock):
+    cache = make_cache(max_bytes=10)
+    cache.set("a", value(5))
+    clock[0] += 1
+    cache.set("big", value(50))
+
+    assert cache.get("a") is None
+    assert cache.get("big") == value(50)
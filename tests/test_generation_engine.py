@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import generation_engine
+from generation_cache import MemoryCache
+from generation_engine import run_generation
+
+GOOD = json.dumps([
+    {"title": "Login", "steps": [{"action": "Open page", "expected_result": "The login page is shown"}]},
+    {"title": "Logout", "steps": [{"action": "Click logout", "expected_result": "The user is logged out"}]},
+])
+POOR = json.dumps([{"title": "Login", "steps": []}])  # one case without steps: score 3
+
+
+def outputs(*values, delays=None):
+    """A `generate` coroutine function returning `values` in turn (raising the exceptions among them)."""
+    remaining = list(values)
+    delays = list(delays or [0] * len(values))
+
+    async def generate():
+        value, delay = remaining.pop(0), delays.pop(0)
+        await asyncio.sleep(delay)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    return generate
+
+
+def run(generate, **kwargs):
+    events = []
+
+    async def on_event(event, payload):
+        events.append((event, payload))
+
+    result = asyncio.run(run_generation(generate, on_event=on_event, **kwargs))
+    return result, events
+
+
+def test_sequential_events_end_with_the_chosen_cases():
+    result, events = run(outputs(POOR, GOOD), mode="sequential", max_attempts=3)
+
+    assert [event for event, _ in events] == [
+        "attempt_started", "rubric_score", "attempt_started", "rubric_score", "test_case", "test_case",
+    ]
+    assert [payload["quality_score"] for event, payload in events if event == "rubric_score"] == [3, 5]
+    assert [payload for event, payload in events if event == "test_case"] == [
+        {"attempt": 2, "test_case": case} for case in result["test_steps"]
+    ]
+    assert result["best_attempt"] == 2
+    assert result["generation_attempts"] == 2
+
+
+def test_failed_attempt_is_reported_and_sends_no_cases():
+    result, events = run(outputs(ValueError("bad output"), GOOD), mode="sequential", max_attempts=2)
+
+    assert events[:2] == [
+        ("attempt_started", {"attempt": 1, "total": 2}),
+        ("attempt_failed", {"attempt": 1, "detail": "bad output"}),
+    ]
+    assert all(payload["attempt"] == 2 for event, payload in events if event == "test_case")
+    assert result["quality_score"] == 5
+
+
+def test_hedged_sends_only_the_winning_attempts_cases():
+    # attempt 1 answers first but scores below the threshold; attempt 2 wins
+    result, events = run(outputs(POOR, GOOD, delays=[0, 0.05]), mode="hedged", fanout=2)
+
+    names = [event for event, _ in events]
+    assert names.index("test_case") > max(i for i, name in enumerate(names) if name == "rubric_score")
+    assert {payload["attempt"] for event, payload in events if event == "test_case"} == {2}
+    assert result["best_attempt"] == 2
+    assert result["generation_attempts"] == 2
+
+
+def test_cached_result_sends_its_cases_without_attempts(monkeypatch):
+    cache = MemoryCache()
+    monkeypatch.setattr(generation_engine, "get_generation_cache", lambda: cache)
+    first, _ = run(outputs(GOOD), mode="sequential", cache_key="key")
+
+    result, events = run(outputs(), mode="sequential", cache_key="key")
+
+    assert result["cached"] is True
+    assert [event for event, _ in events] == ["test_case", "test_case"]
+    assert [payload["test_case"] for _, payload in events] == first["test_steps"]
@@ -0,0 +1,132 @@
+import email.utils
+import types
+
+import pytest
+
+import jira_client
+from jira_client import JiraClient, TokenBucket, retry_after_seconds
+
+
+class FakeClock:
+    """Stands in for the `time` module: sleeping advances the clock and is recorded."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(jira_client, "time", fake)
+    return fake
+
+
+def response(status_code, retry_after=None):
+    headers = {"Retry-After": retry_after} if retry_after is not None else {}
+    return types.SimpleNamespace(status_code=status_code, headers=headers)
+
+
+def test_bucket_allows_a_burst_then_spaces_calls(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 10  # would be 10 tokens without the cap
+
+    for _ in range(2):
+        bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(1)]
+
+
+def test_pause_holds_callers_and_drops_the_burst(clock):
+    bucket = TokenBucket(rate=1, capacity=5)
+    bucket.pause(4)
+
+    bucket.acquire()
+    assert sum(clock.sleeps) == pytest.approx(5)  # the 4 s pause, then one token's refill
+
+
+def test_zero_rate_never_waits(clock):
+    bucket = TokenBucket(rate=0, capacity=1)
+    for _ in range(10):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+
+@pytest.mark.parametrize("header, attempt, expected", [
+    ("7", 0, 7),
+    ("1.5", 0, 1.5),
+    ("-3", 0, 0),
+    ("3600", 0, jira_client.JIRA_MAX_RETRY_AFTER),
+    (None, 0, 1),
+    (None, 3, 8),
+    ("soon", 2, 4),
+])
+def test_retry_after_seconds(clock, header, attempt, expected):
+    assert retry_after_seconds(response(429, header), attempt) == pytest.approx(expected)
+
+
+def test_retry_after_http_date(clock):
+    header = email.utils.formatdate(clock.now + 12, usegmt=True)
+    assert retry_after_seconds(response(503, header), 0) == pytest.approx(12)
+
+
+def client_returning(statuses, clock):
+    client = JiraClient("https://jira.example.com")
+    calls = []
+
+    def request(method, url, **kwargs):
+        calls.append(method)
+        return response(statuses[min(len(calls), len(statuses)) - 1], "0")
+
+    client.session.request = request
+    return client, calls
+
+
+def test_get_is_retried_on_503(clock):
+    client, calls = client_returning([503, 200], clock)
+    assert client.get("rest/api/3/myself").status_code == 200
+    assert calls == ["GET", "GET"]
+
+
+def test_post_is_not_retried_on_503(clock):
+    client, calls = client_returning([503, 201], clock)
+    assert client.post("rest/api/3/issue", json={}).status_code == 503
+    assert calls == ["POST"]
+
+
+def test_post_is_retried_on_429_and_when_marked_idempotent(clock):
+    client, calls = client_returning([429, 201], clock)
+    assert client.post("rest/api/3/issue", json={}).status_code == 201
+
+    client, calls = client_returning([503, 200], clock)
+    assert client.post("rest/api/3/search/jql", json={}, idempotent=True).status_code == 200
+    assert calls == ["POST", "POST"]
+
+
+def test_retries_stop_after_the_limit(clock):
+    client, calls = client_returning([429], clock)
+    assert client.get("rest/api/3/myself").status_code == 429
+    assert len(calls) == jira_client.JIRA_MAX_RETRIES + 1
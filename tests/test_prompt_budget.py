@@ -0,0 +1,105 @@
+import types
+
+import pytest
+
+import prompt_budget
+from prompt_budget import PromptMetrics, build_prompt, count_tokens, measured_prompt, truncate_to_tokens
+
+
+class WordEncoding:
+    """A tokenizer with one token per space-separated word."""
+
+    def encode(self, text, disallowed_special=()):
+        return text.split(" ")
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+@pytest.fixture
+def estimated(monkeypatch):
+    monkeypatch.setattr(prompt_budget, "_encoding", False)
+
+
+@pytest.fixture
+def words(monkeypatch):
+    monkeypatch.setattr(prompt_budget, "_encoding", WordEncoding())
+
+
+def test_missing_tokenizer_falls_back_to_the_estimate_and_warns_once(monkeypatch, capsys):
+    def get_encoding(name):
+        raise OSError("no network")
+
+    monkeypatch.setattr(prompt_budget, "tiktoken", types.SimpleNamespace(get_encoding=get_encoding))
+    monkeypatch.setattr(prompt_budget, "_encoding", None)
+
+    assert count_tokens("x" * 9) == 3
+    assert count_tokens("") == 0
+    assert capsys.readouterr().out.count("unavailable") == 1
+
+
+def test_estimated_truncation_keeps_four_chars_per_token(estimated):
+    assert truncate_to_tokens("x" * 40, 10) == ("x" * 40, 10, 0)
+
+    text, kept, dropped = truncate_to_tokens("x" * 41, 10)
+    assert (kept, dropped) == (10, 1)
+    assert text == "x" * 40 + prompt_budget.TRUNCATION_MARKER.format(1)
+
+
+def test_truncation_cuts_on_token_boundaries(words):
+    assert truncate_to_tokens("one two three", 3) == ("one two three", 3, 0)
+    assert truncate_to_tokens("one two three four", 2) == (
+        "one two" + prompt_budget.TRUNCATION_MARKER.format(2), 2, 2,
+    )
+
+
+def test_build_prompt_budgets_known_sections(words, monkeypatch, capsys):
+    monkeypatch.setitem(prompt_budget.PROMPT_BUDGETS, "description", 2)
+
+    build = build_prompt("D: {description}\nN: {notes}", [("description", "a b c d"), ("notes", "e f g")])
+
+    assert build.text == "D: a b" + prompt_budget.TRUNCATION_MARKER.format(2) + "\nN: e f g"
+    assert build.sections == {"description": 2, "notes": 3}
+    assert build.truncated == {"description": 2}
+    assert build.tokens == count_tokens(build.text)
+    assert "'description' cut to 2 tokens" in capsys.readouterr().out
+
+
+def test_build_prompt_fills_positional_placeholders(words):
+    build = build_prompt("{} / {}", [("requirement", ["a"]), ("context", {"k": 1})])
+
+    assert build.text == "['a'] / {'k': 1}"
+    assert build.truncated == {}
+
+
+def test_metrics_average_per_endpoint_and_kind(words):
+    metrics = PromptMetrics()
+    metrics.record("generation", build_prompt("{}", [("requirement", "a b")]), seconds=1.0, endpoint="/generate")
+    metrics.record("generation", build_prompt("{}", [("requirement", "a b c d")]), seconds=2.0, endpoint="/generate")
+    metrics.record("generation", build_prompt("{}", [("requirement", "a")]), seconds=5.0, endpoint="/batch")
+    metrics.record("validation", build_prompt("{}", [("draft", "a")]), endpoint="/generate")
+    metrics.record("generation", build_prompt("{}", [("requirement", "a")]))
+
+    snapshot = metrics.snapshot()
+
+    assert snapshot["/generate"]["generation"] == {
+        "calls": 2, "prompt_tokens_avg": 3.0, "prompt_tokens_max": 4,
+        "section_tokens_avg": {"requirement": 3.0}, "truncations": {}, "latency_seconds_avg": 1.5,
+    }
+    assert snapshot["/generate"]["validation"]["latency_seconds_avg"] is None
+    assert snapshot["/batch"]["generation"]["latency_seconds_avg"] == 5.0
+    assert snapshot["other"]["generation"]["calls"] == 1
+
+
+def test_failed_calls_are_recorded_without_latency(words, monkeypatch):
+    metrics = PromptMetrics()
+    monkeypatch.setattr(prompt_budget, "prompt_metrics", metrics)
+    build = build_prompt("{}", [("requirement", "a b")])
+
+    with pytest.raises(RuntimeError):
+        with measured_prompt("generation", build, "/generate") as prompt:
+            assert prompt == "a b"
+            raise RuntimeError("cortex down")
+
+    assert metrics.snapshot()["/generate"]["generation"]["calls"] == 1
+    assert metrics.snapshot()["/generate"]["generation"]["latency_seconds_avg"] is None
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from transform_test_cases import transform_test_cases
+
+
+def test_cases_are_numbered_and_steps_renamed():
+    raw = json.dumps([
+        {"title": "Login", "description": "Valid user", "steps": [
+            {"action": "Open page", "data": "url", "expected_result": "Page shown"},
+            {"action": "Submit", "expected_result": "Logged in"},
+        ]},
+        {"title": "Logout"},
+    ])
+
+    cases = transform_test_cases(raw)
+
+    assert [case["Test Case ID"] for case in cases] == ["TC_001", "TC_002"]
+    assert cases[0]["Steps"] == [
+        {"Step Number": 1, "Action": "Open page", "Data": "url", "Expected Result": "Page shown"},
+        {"Step Number": 2, "Action": "Submit", "Data": "", "Expected Result": "Logged in"},
+    ]
+    assert cases[1] == {"Test Case ID": "TC_002", "Title": "Logout", "Description": "", "Steps": []}
+
+
+def test_braces_and_quotes_inside_strings_are_kept():
+    raw = json.dumps([{"title": 'Check "{" and "}"', "steps": [{"action": "Type {x: [1]}", "expected_result": "Shows } ]"}]}])
+
+    case = transform_test_cases(raw)[0]
+
+    assert case["Title"] == 'Check "{" and "}"'
+    assert case["Steps"][0]["Action"] == "Type {x: [1]}"
+    assert case["Steps"][0]["Expected Result"] == "Shows } ]"
+
+
+def test_incomplete_output_raises():
+    raw = json.dumps([{"title": "A", "steps": []}, {"title": "B", "steps": []}])
+
+    with pytest.raises(json.JSONDecodeError):
+        transform_test_cases(raw[:-5])
@@ -0,0 +1,75 @@
+import types
+
+import pytest
+
+import upload_to_jira_via_Xray as xray
+
+
+class Step:
+    def __init__(self, action):
+        self.action = action
+
+    def dict(self):
+        return {"action": self.action, "data": "", "expected_result": "ok"}
+
+
+def case(title):
+    return types.SimpleNamespace(title=title, steps=[Step(f"{title} step")])
+
+
+@pytest.fixture
+def xray_api(monkeypatch):
+    """Fake Jira issue creation and Xray GraphQL; `fail` names the mutations that return errors."""
+    api = types.SimpleNamespace(fail=set(), calls=[])
+    monkeypatch.setattr(xray, "create_issues_bulk", lambda titles, _: (
+        [{"id": str(100 + i), "key": f"T-{i}"} for i in range(len(titles))], [],
+    ))
+    monkeypatch.setattr(xray, "create_issue", lambda summary, _: {"id": "900", "key": "EX-1"})
+    monkeypatch.setattr(xray.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(xray.xray_limiter, "wait", lambda: None)
+
+    def graphql(token, query, variables):
+        name = next(op for op in ("addTestStep", "addTestsToTestExecution", "getTestRuns", "updateTestRunStatus") if op in query)
+        api.calls.append(name)
+        if name in api.fail:
+            return None, {"errors": [{"message": f"{name} rejected"}]}
+        if name == "addTestsToTestExecution":
+            return None, {"data": {name: {"addedTests": variables["testIssueIds"], "warning": None}}}
+        if name == "getTestRuns":
+            runs = [{"id": f"run-{i}", "test": {"issueId": i}} for i in ("100", "101")]
+            return None, {"data": {name: {"total": 2, "results": runs}}}
+        return None, {"data": {}}
+
+    monkeypatch.setattr(xray, "_graphql", graphql)
+    return api
+
+
+def test_a_clean_upload_reports_no_errors(xray_api):
+    result = xray.upload_test_cases("token", "Story", [case("A"), case("B")])
+
+    assert result == {"exec_key": "EX-1", "exec_id": "900", "test_keys": ["T-0", "T-1"], "errors": []}
+    assert xray_api.calls[-2:] == ["getTestRuns", "updateTestRunStatus"]
+
+
+def test_step_failures_are_recorded_per_test(xray_api):
+    xray_api.fail = {"addTestStep"}
+
+    result = xray.upload_test_cases("token", "Story", [case("A"), case("B")])
+
+    assert [(error["key"], error["error"]) for error in result["errors"]] == [
+        ("T-0", "Failed to add steps: addTestStep rejected"),
+        ("T-1", "Failed to add steps: addTestStep rejected"),
+    ]
+
+
+def test_unlinked_tests_are_recorded_and_not_polled(xray_api):
+    xray_api.fail = {"addTestsToTestExecution"}
+
+    result = xray.upload_test_cases("token", "Story", [case("A"), case("B")])
+
+    assert [(error["key"], error["error"]) for error in result["errors"]] == [
+        ("T-0", "Failed to link to EX-1: addTestsToTestExecution rejected"),
+        ("T-1", "Failed to link to EX-1: addTestsToTestExecution rejected"),
+    ]
+    assert "getTestRuns" not in xray_api.calls
+    assert "updateTestRunStatus" not in xray_api.calls
@@ -1,21 +1,131 @@
+import asyncio
 import csv
 import fitz  # PyMuPDF
 import json
+import os
+import threading
 import yaml
-from io import BytesIO, StringIO
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO, TextIOWrapper
 import pandas as pd
- 
-def extract_text_from_pdf(file_bytes: bytes) -> str:
+
+PDF_MAX_WORKERS = int(os.getenv("PDF_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_CHUNK = int(os.getenv("PDF_PAGES_PER_CHUNK", "20"))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "0"))  # 0 -> no limit
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "0"))  # 0 -> no limit
+TABULAR_MAX_ROWS = int(os.getenv("TABULAR_MAX_ROWS", "0"))  # 0 -> no limit
+TABULAR_MAX_CHARS = int(os.getenv("TABULAR_MAX_CHARS", "0"))  # 0 -> no limit
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """Process pool shared by all PDF extractions; page parsing is CPU bound and holds the GIL."""
+    global _pdf_pool
+    if _pdf_pool is None:
+        with _pdf_pool_lock:
+            if _pdf_pool is None:
+                _pdf_pool = ProcessPoolExecutor(max_workers=PDF_MAX_WORKERS)
+    return _pdf_pool
+
+
+def _pdf_limits(max_pages, max_chars):
+    return max_pages if max_pages is not None else PDF_MAX_PAGES, max_chars if max_chars is not None else PDF_MAX_CHARS
+
+
+def _pdf_result(pages, page_count, pages_read, max_chars):
+    text = "".join(pages).strip()
+    truncated = pages_read < page_count
+    if max_chars and len(text) > max_chars:
+        text = text[:max_chars]
+        truncated = True
+    message = "PDF content extracted successfully"
+    if truncated:
+        message += f" (truncated: {pages_read} of {page_count} pages, {len(text)} characters)"
+    return {"context": text, "message": message, "page_count": page_count, "truncated": truncated}
+
+
+def extract_pdf_pages(path: str, start: int, stop: int) -> list:
+    """Text of pages [start, stop) of the PDF at `path`. Runs inside the process pool."""
+    with fitz.open(path) as doc:
+        return [doc[number].get_text() for number in range(start, stop)]
+
+
+def extract_text_from_pdf(file_bytes: bytes, max_pages: int = None, max_chars: int = None) -> dict:
+    """Extract text page by page in this process, stopping at `max_pages` / `max_chars`."""
+    max_pages, max_chars = _pdf_limits(max_pages, max_chars)
     try:
-        text = ""
+        pages = []
+        chars = 0
         with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+            page_count = doc.page_count
             for page in doc:
-                text += page.get_text()
-        return {"context":text.strip(),"message":"PDF content extracted successfully"}
+                if (max_pages and len(pages) >= max_pages) or (max_chars and chars >= max_chars):
+                    break
+                page_text = page.get_text()
+                pages.append(page_text)
+                chars += len(page_text)
+        return _pdf_result(pages, page_count, len(pages), max_chars)
     except Exception as e:
         raise ValueError(f"Failed to extract text from PDF: {e}")
 
 
+async def extract_text_from_pdf_file(path: str, max_pages: int = None, max_chars: int = None, on_progress=None) -> dict:
+    """
+    Extract text from the PDF at `path`, parsing PDF_PAGES_PER_CHUNK-page ranges in parallel
+    in the process pool and joining the pages once at the end.
+    Once the pages finished so far (in order) reach `max_chars`, the remaining ranges are cancelled.
+    Ranges already running are waited for before returning (or raising), so no worker still
+    has the file open when the caller deletes it.
+    `on_progress(pages_done, total_pages)` is an optional coroutine called as ranges complete.
+    """
+    max_pages, max_chars = _pdf_limits(max_pages, max_chars)
+    try:
+        with fitz.open(path) as doc:
+            page_count = doc.page_count
+    except Exception as e:
+        raise ValueError(f"Failed to extract text from PDF: {e}")
+
+    total = min(page_count, max_pages) if max_pages else page_count
+    ranges = [(start, min(start + PDF_PAGES_PER_CHUNK, total)) for start in range(0, total, PDF_PAGES_PER_CHUNK)]
+    pool = get_pdf_pool()
+    futures = [pool.submit(extract_pdf_pages, path, start, stop) for start, stop in ranges]
+
+    async def parse_range(idx, future):
+        return idx, await asyncio.wrap_future(future)
+
+    tasks = [asyncio.create_task(parse_range(idx, future)) for idx, future in enumerate(futures)]
+    chunks = [None] * len(ranges)
+    next_chunk = 0  # first range not yet received, i.e. end of the in-order prefix
+    prefix_chars = 0
+    pages_done = 0
+    try:
+        for finished in asyncio.as_completed(tasks):
+            idx, pages = await finished
+            chunks[idx] = pages
+            pages_done += len(pages)
+            if on_progress is not None:
+                await on_progress(pages_done, total)
+            while next_chunk < len(chunks) and chunks[next_chunk] is not None:
+                prefix_chars += sum(len(page) for page in chunks[next_chunk])
+                next_chunk += 1
+            if max_chars and prefix_chars >= max_chars:
+                break
+    except Exception as e:
+        raise ValueError(f"Failed to extract text from PDF: {e}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        # cancel() only stops ranges that have not started; wait for the running ones
+        running = [future for future in futures if not future.cancel() and not future.done()]
+        if running:
+            await asyncio.shield(asyncio.wait([asyncio.wrap_future(future) for future in running]))
+
+    pages = [page for chunk in chunks[:next_chunk] for page in chunk]
+    return _pdf_result(pages, page_count, len(pages), max_chars)
+
+
 def extract_text_from_docx(file_bytes: bytes) -> str:
     try:
         from docx import Document
@@ -41,44 +151,155 @@ def extract_text_from_yaml(file_bytes: bytes) -> str:
     except Exception as e:
         raise ValueError(f"Failed to extract text from YAML: {e}")
 
-def extract_text_from_csv(file_bytes: bytes) -> dict:
+class _TextBudget:
+    """Collects lines until a row or character budget (0 -> unlimited) is used up."""
+
+    def __init__(self, max_rows=0, max_chars=0):
+        self.max_rows = max_rows
+        self.max_chars = max_chars
+        self.lines = []
+        self.rows = 0
+        self.chars = 0
+        self.truncated = False
+
+    def add(self, line, is_row=True):
+        """Append `line`; returns False once the budget is exhausted (the caller should stop reading)."""
+        if (self.max_rows and is_row and self.rows >= self.max_rows) or (self.max_chars and self.chars >= self.max_chars):
+            self.truncated = True
+            return False
+        if self.max_chars and self.chars + len(line) > self.max_chars:
+            line = line[:self.max_chars - self.chars]
+            self.truncated = True
+        self.lines.append(line)
+        self.rows += is_row
+        self.chars += len(line) + 1
+        return not self.truncated
+
+    def exhausted(self):
+        """True (and the text marked truncated) once either budget is used up."""
+        if (self.max_rows and self.rows >= self.max_rows) or (self.max_chars and self.chars >= self.max_chars):
+            self.truncated = True
+        return self.truncated
+
+    def text(self):
+        return "\n".join(self.lines).strip()
+
+
+def _tabular_limits(max_rows, max_chars):
+    return max_rows if max_rows is not None else TABULAR_MAX_ROWS, max_chars if max_chars is not None else TABULAR_MAX_CHARS
+
+
+def _row_text(values):
+    """Non-empty cells of a row joined with " | "."""
+    return " | ".join(text for text in (str(value).strip() for value in values if value is not None) if text)
+
+
+def _tabular_message(message, budget):
+    if budget.truncated:
+        message += f" (truncated after {budget.rows} rows, {len(budget.text())} characters)"
+    return message
+
+
+def extract_text_from_csv(file_bytes: bytes, max_rows: int = None, max_chars: int = None) -> dict:
+    """
+    Stream CSV rows through an incremental UTF-8 decoder, stopping at the row/char budget.
+    Every cell is kept (empty ones too) so the columns of a row stay aligned.
+    """
+    max_rows, max_chars = _tabular_limits(max_rows, max_chars)
+    budget = _TextBudget(max_rows, max_chars)
     try:
-        csv_text = file_bytes.decode("utf-8")
-        reader = csv.reader(StringIO(csv_text))
-        rows = [" | ".join(row) for row in reader]
+        with TextIOWrapper(BytesIO(file_bytes), encoding="utf-8-sig", newline="") as stream:
+            for row in csv.reader(stream):
+                if not budget.add(" | ".join(row)):
+                    break
         return {
-            "context": "\n".join(rows),
-            "message": "CSV data extracted successfully"
+            "context": budget.text(),
+            "message": _tabular_message("CSV data extracted successfully", budget),
+            "truncated": budget.truncated,
         }
     except Exception as e:
         raise ValueError(f"Failed to extract text from CSV: {e}")
 
-def extract_text_from_excel(file_bytes: bytes) -> dict:
+
+def _select_sheets(available, sheet_names):
+    if not sheet_names:
+        return list(available)
+    missing = [name for name in sheet_names if name not in available]
+    if missing:
+        raise ValueError(f"Sheet(s) not found: {', '.join(missing)}. Available: {', '.join(available)}")
+    return list(sheet_names)
+
+
+def _excel_sheets_openpyxl(file_bytes, sheet_names, budget):
     """
-    Reads all sheets from an Excel file and extracts text in a human-readable format.
-    Useful for sending to LLMs.
+    Stream .xlsx rows with openpyxl's read-only mode; only the selected sheets are read.
+    Like pandas.read_excel, the first non-empty row of a sheet is its header and is not emitted.
     """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(BytesIO(file_bytes), read_only=True, data_only=True)
     try:
-        # Read all sheets into a dict of DataFrames
-        sheets = pd.read_excel(BytesIO(file_bytes), sheet_name=None)
+        selected = _select_sheets(workbook.sheetnames, sheet_names)
+        for name in selected:
+            if budget.exhausted() or not budget.add(f"### Sheet: {name}", is_row=False):
+                break
+            header_seen = False
+            for values in workbook[name].iter_rows(values_only=True):
+                row_text = _row_text(values)
+                if not row_text:
+                    continue
+                if not header_seen:
+                    header_seen = True
+                    continue
+                if not budget.add(row_text):
+                    return selected
+            budget.add("", is_row=False)
+        return selected
+    finally:
+        workbook.close()
 
-        all_text = []
-        for sheet_name, df in sheets.items():
-            df = df.fillna("")  # Replace NaN with empty strings
-            sheet_text = f"### Sheet: {sheet_name}\n"
 
-            for _, row in df.iterrows():
-                row_text = " | ".join(str(cell).strip() for cell in row if str(cell).strip())
-                if row_text:
-                    sheet_text += row_text + "\n"
+def _excel_sheets_pandas(file_bytes, sheet_names, budget):
+    """Legacy .xls: read the selected sheets with pandas and build row text with vectorised string ops."""
+    excel = pd.ExcelFile(BytesIO(file_bytes))
+    selected = _select_sheets(excel.sheet_names, sheet_names)
+    for name in selected:
+        if budget.exhausted():
+            break
+        # one row past the budget, so a sheet that does not fit marks the text truncated
+        remaining_rows = budget.max_rows - budget.rows + 1 if budget.max_rows else None
+        df = excel.parse(name, nrows=remaining_rows, dtype=str)
+        # strip every cell, drop the empty ones, join what is left per row
+        cells = df.stack(future_stack=True).dropna().str.strip()
+        cells = cells[cells != ""]
+        rows = cells.groupby(level=0, sort=True).agg(" | ".join) if not cells.empty else pd.Series(dtype=str)
+        if not budget.add(f"### Sheet: {name}", is_row=False):
+            break
+        for row_text in rows:
+            if not budget.add(row_text):
+                return selected
+        budget.add("", is_row=False)
+    return selected
 
-            all_text.append(sheet_text.strip())
 
-        full_text = "\n\n".join(all_text).strip()
+def extract_text_from_excel(file_bytes: bytes, sheet_names: list = None, max_rows: int = None, max_chars: int = None) -> dict:
+    """
+    Reads the selected sheets (all by default) from an Excel file and extracts text in a human-readable format.
+    Useful for sending to LLMs. Stops at the row/char budget instead of loading whole workbooks.
+    """
+    max_rows, max_chars = _tabular_limits(max_rows, max_chars)
+    budget = _TextBudget(max_rows, max_chars)
+    try:
+        if file_bytes[:4] == b"PK\x03\x04":  # .xlsx / .xlsm are zip containers
+            sheets = _excel_sheets_openpyxl(file_bytes, sheet_names, budget)
+        else:
+            sheets = _excel_sheets_pandas(file_bytes, sheet_names, budget)
 
         return {
-            "context": full_text,
-            "message": "Excel content extracted successfully",
+            "context": budget.text(),
+            "message": _tabular_message("Excel content extracted successfully", budget),
+            "sheets": sheets,
+            "truncated": budget.truncated,
         }
 
     except Exception as e:
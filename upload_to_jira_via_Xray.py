@@ -1,9 +1,14 @@
 import requests
 import base64
+import binascii
 import json
 from dotenv import load_dotenv
 import os
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from jira_client import get_jira_client
 load_dotenv()
  
 # ========================
@@ -19,50 +24,238 @@ CLIENT_ID = os.getenv("CLIENT_ID", "xray-cloud-client-id")
 CLIENT_SECRET = os.getenv("ClIENT_SECRET", "xray-cloud-client-secret")
 XRAY_URL = os.getenv("XRAY_BASE_URL", "https://xray.cloud.getxray.app/api/v2")
  
-AUTH = base64.b64encode(f"{JIRA_USERNAME}:{API_TOKEN}".encode()).decode()
+jira = get_jira_client(JIRA_URL, JIRA_USERNAME, API_TOKEN)
+
+XRAY_MAX_WORKERS = int(os.getenv("XRAY_MAX_WORKERS", "4"))
+XRAY_REQUESTS_PER_SECOND = float(os.getenv("XRAY_REQUESTS_PER_SECOND", "5"))
+XRAY_CONNECT_TIMEOUT = float(os.getenv("XRAY_CONNECT_TIMEOUT", "10"))  # seconds
+XRAY_READ_TIMEOUT = float(os.getenv("XRAY_READ_TIMEOUT", "60"))  # seconds
+JIRA_BULK_CREATE_LIMIT = 50  # Jira caps /issue/bulk at 50 issues per call
+ISSUE_ID_CACHE_TTL = int(os.getenv("ISSUE_ID_CACHE_TTL", "3600"))  # seconds
+XRAY_TOKEN_REFRESH_MARGIN = int(os.getenv("XRAY_TOKEN_REFRESH_MARGIN", "300"))  # refresh this many seconds before expiry
+XRAY_TOKEN_FALLBACK_TTL = 3600  # used when the token's expiry cannot be decoded
+XRAY_POLL_DEADLINE = float(os.getenv("XRAY_POLL_DEADLINE", "30"))  # seconds to wait for test runs to appear
+XRAY_POLL_BASE_DELAY = 0.5
+XRAY_POLL_MAX_DELAY = 8.0
+XRAY_TEST_RUNS_PAGE_SIZE = 100  # Xray caps getTestRuns at 100 results per page
+XRAY_STATUS_BATCH_SIZE = 50  # test runs updated per aliased mutation
+ 
+ 
+class RateLimiter:
+    """Thread-safe limiter spacing calls at least 1/rate seconds apart."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+xray_limiter = RateLimiter(XRAY_REQUESTS_PER_SECOND)
+
+
+class IssueIdCache:
+    """Memoizes Jira issue key -> internal id. Issue ids never change, the TTL only bounds staleness after deletes."""
+
+    def __init__(self, ttl=ISSUE_ID_CACHE_TTL):
+        self.ttl = ttl
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def remember(self, issue_key, issue_id):
+        if issue_key and issue_id:
+            with self._lock:
+                self._ids[issue_key] = (str(issue_id), time.monotonic() + self.ttl)
+
+    def get(self, issue_key):
+        with self._lock:
+            entry = self._ids.get(issue_key)
+            if entry and entry[1] > time.monotonic():
+                return entry[0]
+            self._ids.pop(issue_key, None)
+            return None
+
+
+issue_ids = IssueIdCache()
  
  
 # =====================================
 #  Get Xray OAuth Token
 # =====================================
  
-def get_oauth_token():
+def _authenticate():
     url = f"{XRAY_URL}/authenticate"
     payload = {"client_id": CLIENT_ID, "client_secret": CLIENT_SECRET}
-    r = requests.post(url, json=payload)
+    r = requests.post(url, json=payload, timeout=(XRAY_CONNECT_TIMEOUT, XRAY_READ_TIMEOUT))
     r.raise_for_status()
     return r.text.strip('"')
+
+
+def _jwt_expiry(token):
+    """Read the `exp` claim of a JWT without verifying it; None if it cannot be decoded."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, ValueError, TypeError, binascii.Error):
+        return None
+
+
+class XrayTokenProvider:
+    """
+    Caches the Xray bearer token until shortly before its JWT expiry.
+    Concurrent callers that find it stale wait on a single in-flight refresh.
+    """
+
+    def __init__(self, refresh_margin=XRAY_TOKEN_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _fresh(self):
+        return self._token is not None and time.time() < self._expires_at - self.refresh_margin
+
+    def get_token(self):
+        if self._fresh():
+            return self._token
+        with self._lock:
+            if not self._fresh():
+                token = _authenticate()
+                self._expires_at = _jwt_expiry(token) or time.time() + XRAY_TOKEN_FALLBACK_TTL
+                self._token = token
+                print(" Xray token obtained.")
+            return self._token
+
+    def invalidate(self, token=None):
+        """Drop the cached token; given the rejected `token`, only if no caller has refreshed it since."""
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires_at = 0.0
+
+
+xray_tokens = XrayTokenProvider()
+
+
+def get_oauth_token():
+    return xray_tokens.get_token()
+
+
+def _bearer(token):
+    """Xray helpers accept a raw token or a XrayTokenProvider; None means the shared provider."""
+    if token is None:
+        token = xray_tokens
+    return token.get_token() if isinstance(token, XrayTokenProvider) else token
+
+
+def _graphql(token, query, variables):
+    """
+    POST one rate-limited Xray GraphQL request with the (connect, read) timeout.
+    On a 401 a token provider is invalidated and the request sent once more with a new token.
+    Returns (response, data); a non-JSON reply becomes data with an "errors" entry.
+    """
+    provider = xray_tokens if token is None else token
+    for attempt in range(2):
+        xray_limiter.wait()
+        bearer = _bearer(provider)
+        headers = {"Authorization": f"Bearer {bearer}", "Content-Type": "application/json"}
+        r = requests.post(
+            f"{XRAY_URL}/graphql",
+            headers=headers,
+            json={"query": query, "variables": variables},
+            timeout=(XRAY_CONNECT_TIMEOUT, XRAY_READ_TIMEOUT),
+        )
+        if r.status_code != 401 or attempt or not isinstance(provider, XrayTokenProvider):
+            break
+        print(" Xray token rejected, re-authenticating...")
+        provider.invalidate(bearer)
+    try:
+        data = r.json()
+    except ValueError:
+        data = {"errors": [{"message": f"Invalid JSON response (status {r.status_code})"}]}
+    if not r.ok and "errors" not in data:
+        data = {"errors": [{"message": f"{r.status_code} {r.text}"}]}
+    return r, data
  
  
 # =====================================
 #  Create Jira Issue (Test or Execution)
 # =====================================
  
+def _issue_fields(summary, issue_type):
+    return {
+        "project": {"key": PROJECT_KEY},
+        "summary": summary,
+        "issuetype": {"name": issue_type},
+        "description": {
+            "type": "doc",
+            "version": 1,
+            "content": [
+                {"type": "paragraph", "content": [{"type": "text", "text": summary}]}
+            ]
+        }
+    }
+
+
 def create_issue(summary, issue_type):
     url = f"{JIRA_URL}/rest/api/3/issue"
     headers = {
-        "Authorization": f"Basic {AUTH}",
         "Accept": "application/json",
         "Content-Type": "application/json"
     }
-    payload = {
-        "fields": {
-            "project": {"key": PROJECT_KEY},
-            "summary": summary,
-            "issuetype": {"name": issue_type},
-            "description": {
-                "type": "doc",
-                "version": 1,
-                "content": [
-                    {"type": "paragraph", "content": [{"type": "text", "text": summary}]}
-                ]
-            }
-        }
-    }
-    r = requests.post(url, headers=headers, json=payload)
+    payload = {"fields": _issue_fields(summary, issue_type)}
+    r = jira.post(url, headers=headers, json=payload)
     r.raise_for_status()
     # print("Create Issue Response:", r.json(),end="\n\n")
-    return r.json()
+    issue = r.json()
+    issue_ids.remember(issue.get("key"), issue.get("id"))
+    return issue
+
+
+def create_issues_bulk(summaries, issue_type):
+    """
+    Create one issue per summary via /issue/bulk. Jira creates what it can and reports the rest,
+    so this returns (issues, errors): `issues` holds {"id", "key", "self"} in input order, with None
+    where creation failed, and `errors` holds {"summary", "error"} for each of those.
+    """
+    url = f"{JIRA_URL}/rest/api/3/issue/bulk"
+    headers = {
+        "Accept": "application/json",
+        "Content-Type": "application/json"
+    }
+    issues = [None] * len(summaries)
+    errors = []
+    for start in range(0, len(summaries), JIRA_BULK_CREATE_LIMIT):
+        chunk = summaries[start:start + JIRA_BULK_CREATE_LIMIT]
+        payload = {"issueUpdates": [{"fields": _issue_fields(summary, issue_type)} for summary in chunk]}
+        try:
+            r = jira.post(url, headers=headers, json=payload)
+            data = r.json()
+        except (requests.RequestException, ValueError) as e:
+            errors.extend({"summary": summary, "error": str(e)} for summary in chunk)
+            continue
+        if not r.ok and not data.get("errors"):
+            errors.extend({"summary": summary, "error": f"{r.status_code} {r.text}"} for summary in chunk)
+            continue
+        # created issues come back in request order, skipping the failed elements
+        failed = {error.get("failedElementNumber"): error.get("elementErrors") for error in data.get("errors", [])}
+        created = iter(data.get("issues", []))
+        for offset, summary in enumerate(chunk):
+            issue = None if offset in failed else next(created, None)
+            if issue is None:
+                errors.append({"summary": summary, "error": str(failed.get(offset) or "Not created")})
+                continue
+            issue_ids.remember(issue.get("key"), issue.get("id"))
+            issues[start + offset] = issue
+    return issues, errors
  
  
 # =====================================
@@ -70,12 +263,23 @@ def create_issue(summary, issue_type):
 # =====================================
  
 def get_internal_issue_id(issue_key):
+    cached = issue_ids.get(issue_key)
+    if cached:
+        return cached
     url = f"{JIRA_URL}/rest/api/3/issue/{issue_key}?fields=id"
-    headers = {"Authorization": f"Basic {AUTH}", "Accept": "application/json"}
-    r = requests.get(url, headers=headers)
+    headers = {"Accept": "application/json"}
+    r = jira.get(url, headers=headers)
     # print("get_internal_issue_id response", r.json(),end="\n\n")
     r.raise_for_status()
-    return r.json()["id"]
+    issue_id = r.json()["id"]
+    issue_ids.remember(issue_key, issue_id)
+    return issue_id
+
+
+def resolve_issue_id(key_or_id):
+    """Xray GraphQL wants internal ids; accept either an id or a key (resolved through the cache)."""
+    key_or_id = str(key_or_id)
+    return key_or_id if key_or_id.isdigit() else get_internal_issue_id(key_or_id)
  
  
 # =====================================
@@ -83,8 +287,7 @@ def get_internal_issue_id(issue_key):
 # =====================================
  
 def add_jira_test_steps(token, issue_id, steps):
-    url = f"{XRAY_URL}/graphql"
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    issue_id = resolve_issue_id(issue_id)
     query = """
         mutation($issueId: String!, $step: CreateStepInput!) {
           addTestStep(issueId: $issueId, step: $step) {
@@ -108,11 +311,7 @@ def add_jira_test_steps(token, issue_id, steps):
         # Retry logic to handle eventual consistency / indexing delays in Xray/Jira
         max_retries = 5
         for attempt in range(1, max_retries + 1):
-            r = requests.post(url, headers=headers, json={"query": query, "variables": variables})
-            try:
-                data = r.json()
-            except Exception:
-                data = {"errors": [{"message": f"Invalid JSON response (status {r.status_code})"}]}
+            _, data = _graphql(token, query, variables)
 
             if "errors" in data:
                 # If the error indicates the test was not found, wait and retry
@@ -130,11 +329,57 @@ def add_jira_test_steps(token, issue_id, steps):
                 break
  
  
+def add_jira_test_steps_bulk(token, issue_id, steps):
+    """
+    Add all steps of a test in one aliased GraphQL mutation instead of one request per step.
+    Raises ValueError with the GraphQL errors once the retries are used up.
+    """
+    if not steps:
+        return
+    issue_id = resolve_issue_id(issue_id)
+    params = ", ".join(f"$s{i}: CreateStepInput!" for i in range(len(steps)))
+    fields = "\n".join(f"s{i}: addTestStep(issueId: $issueId, step: $s{i}) {{ id }}" for i in range(len(steps)))
+    query = f"mutation($issueId: String!, {params}) {{\n{fields}\n}}"
+    variables = {"issueId": issue_id}
+    for i, step in enumerate(steps):
+        step_dict = step.dict()
+        variables[f"s{i}"] = {
+            "action": step_dict['action'],
+            "data": step_dict['data'],
+            "result": step_dict['expected_result'],
+        }
+
+    # Retry logic to handle eventual consistency / indexing delays in Xray/Jira
+    max_retries = 5
+    for attempt in range(1, max_retries + 1):
+        _, data = _graphql(token, query, variables)
+
+        if "errors" in data:
+            msgs = " ".join(err.get('message', '') for err in data['errors'])
+            if "not found" in msgs.lower() and attempt < max_retries:
+                wait = 1 * attempt
+                print(f" GraphQL error adding steps to {issue_id} (attempt {attempt}/{max_retries}): {msgs}. Retrying in {wait}s...")
+                time.sleep(wait)
+                continue
+            print(f" GraphQL error adding steps to {issue_id}: {data['errors']}")
+            raise ValueError(msgs or str(data["errors"]))
+        print(f" Added {len(steps)} steps to test {issue_id}")
+        return
+ 
+ 
 # =====================================
 #  Link Test to Execution
 # =====================================
  
 def link_test_to_execution(token, exec_id, test_id):
+    link_tests_to_execution(token, exec_id, [test_id])
+
+
+def link_tests_to_execution(token, exec_id, test_ids):
+    """
+    Add the tests to the execution in one call. Returns the ids Xray reports as added;
+    raises ValueError with the GraphQL errors once the retries are used up.
+    """
     query = """
         mutation($issueId: String!, $testIssueIds: [String!]!) {
           addTestsToTestExecution(issueId: $issueId, testIssueIds: $testIssueIds) {
@@ -143,16 +388,12 @@ def link_test_to_execution(token, exec_id, test_id):
           }
         }
     """
-    url = f"{XRAY_URL}/graphql"
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-    variables = {"issueId": exec_id, "testIssueIds": [test_id]}
+    exec_id = resolve_issue_id(exec_id)
+    test_ids = [resolve_issue_id(test_id) for test_id in test_ids]
+    variables = {"issueId": exec_id, "testIssueIds": test_ids}
     max_retries = 5
     for attempt in range(1, max_retries + 1):
-        r = requests.post(url, headers=headers, json={"query": query, "variables": variables})
-        try:
-            data = r.json()
-        except Exception:
-            data = {"errors": [{"message": f"Invalid JSON response (status {r.status_code})"}]}
+        _, data = _graphql(token, query, variables)
 
         print("link_test_to_execution data response:", data, end="\n\n")
         if "errors" in data:
@@ -162,70 +403,176 @@ def link_test_to_execution(token, exec_id, test_id):
                 print(f" Error linking test (attempt {attempt}/{max_retries}): {msgs}. Retrying in {wait}s...")
                 time.sleep(wait)
                 continue
-            else:
-                print(f" Error linking test: {data['errors']}")
-                break
-        else:
-            print(f" Linked test {test_id} to execution {exec_id}")
-            break
+            print(f" Error linking test: {data['errors']}")
+            raise ValueError(msgs or str(data["errors"]))
+        added = ((data.get("data") or {}).get("addTestsToTestExecution") or {}).get("addedTests")
+        added = test_ids if added is None else [str(test_id) for test_id in added]
+        print(f" Linked tests {', '.join(added)} to execution {exec_id}")
+        return added
  
  
 # =====================================
 #  Get Test Run ID
 # =====================================
  
-def get_test_run_id(token, exec_id, test_id):
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff: a random delay in [0, min(max, base * 2^attempt)]."""
+    return random.uniform(0, min(XRAY_POLL_MAX_DELAY, XRAY_POLL_BASE_DELAY * 2 ** attempt))
+
+
+def _fetch_test_runs_page(token, exec_id, start):
     query = """
-        query($testExecIssueId: String!, $testIssueId: String!) {
-          getTestRun(testExecIssueId: $testExecIssueId, testIssueId: $testIssueId) {
-            id
+        query($testExecIssueIds: [String], $limit: Int!, $start: Int) {
+          getTestRuns(testExecIssueIds: $testExecIssueIds, limit: $limit, start: $start) {
+            total
+            results {
+              id
+              test { issueId }
+            }
           }
         }
     """
-    url = f"{XRAY_URL}/graphql"
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-    variables = {"testExecIssueId": exec_id, "testIssueId": test_id}
-    max_retries = 6
-    for attempt in range(1, max_retries + 1):
-        r = requests.post(url, headers=headers, json={"query": query, "variables": variables})
+    variables = {"testExecIssueIds": [exec_id], "limit": XRAY_TEST_RUNS_PAGE_SIZE, "start": start}
+    r, data = _graphql(token, query, variables)
+    if "errors" in data or not (data.get("data") or {}).get("getTestRuns"):
+        msgs = " ".join(err.get('message', '') for err in data.get("errors", []))
+        raise ValueError(msgs or f"Unexpected getTestRuns response (status {r.status_code})")
+    return data["data"]["getTestRuns"]
+
+
+def get_test_run_ids(token, exec_id, test_ids, deadline=XRAY_POLL_DEADLINE):
+    """
+    Map each test issue id to its test run id in `exec_id`, paging through getTestRuns.
+    Runs appear asynchronously after linking, so poll with jittered exponential backoff
+    until every test has a run or `deadline` seconds have passed. Missing tests are left out.
+    """
+    exec_id = resolve_issue_id(exec_id)
+    wanted = {resolve_issue_id(test_id) for test_id in test_ids}
+    run_ids = {}
+    give_up_at = time.monotonic() + deadline
+    attempt = 0
+    while True:
         try:
-            data = r.json()
-        except Exception:
-            data = {"errors": [{"message": f"Invalid JSON response (status {r.status_code})"}]}
+            start = 0
+            while True:
+                page = _fetch_test_runs_page(token, exec_id, start)
+                results = page.get("results") or []
+                for run in results:
+                    issue_id = (run.get("test") or {}).get("issueId")
+                    if issue_id in wanted:
+                        run_ids[issue_id] = run["id"]
+                start += len(results)
+                if not results or start >= (page.get("total") or 0):
+                    break
+            error = None
+        except Exception as e:
+            error = str(e)
 
-        print("get_test_run_id data response:", data, end="\n\n")
-        if "errors" in data or not data.get("data", {}).get("getTestRun"):
-            msgs = ''
-            if "errors" in data:
-                msgs = " ".join(err.get('message', '') for err in data['errors'])
-            if attempt < max_retries:
-                wait = 1 * attempt
-                print(f" Could not fetch test run (attempt {attempt}/{max_retries}): {msgs or data}. Retrying in {wait}s...")
-                time.sleep(wait)
-                continue
-            print(f" Could not fetch test run: {data}")
-            return None
-        return data["data"]["getTestRun"]["id"]
+        missing = len(wanted) - len(run_ids)
+        if not missing:
+            break
+        delay = backoff_delay(attempt)
+        if time.monotonic() + delay > give_up_at:
+            print(f" Could not fetch test runs for {missing}/{len(wanted)} tests in execution {exec_id}: {error or 'not found'}")
+            break
+        attempt += 1
+        print(f" Waiting for {missing} test run(s) in execution {exec_id} (attempt {attempt}): {error or 'not found yet'}. Retrying in {delay:.1f}s...")
+        time.sleep(delay)
+
+    print(f" Fetched {len(run_ids)}/{len(wanted)} test runs for execution {exec_id}")
+    return run_ids
+
+
+def get_test_run_id(token, exec_id, test_id):
+    test_id = resolve_issue_id(test_id)
+    return get_test_run_ids(token, exec_id, [test_id]).get(test_id)
  
  
 # =====================================
 #  Update Test Result
 # =====================================
  
+def update_test_results(token, run_ids, status="PASSED"):
+    """Set `status` on every test run, batching the updates into aliased mutations."""
+    run_ids = list(run_ids)
+    for offset in range(0, len(run_ids), XRAY_STATUS_BATCH_SIZE):
+        batch = run_ids[offset:offset + XRAY_STATUS_BATCH_SIZE]
+        params = ", ".join(f"$r{i}: String!" for i in range(len(batch)))
+        fields = "\n".join(f"r{i}: updateTestRunStatus(id: $r{i}, status: $status)" for i in range(len(batch)))
+        query = f"mutation($status: String!, {params}) {{\n{fields}\n}}"
+        variables = {"status": status, **{f"r{i}": run_id for i, run_id in enumerate(batch)}}
+        _, data = _graphql(token, query, variables)
+        if "errors" in data:
+            print(f" Error updating test results: {data['errors']}")
+        else:
+            print(f" Updated {len(batch)} test runs - {status}")
+
+
 def update_test_result(token, run_id, status="PASSED"):
-    query = """
-        mutation($testRunId: String!, $status: String!) {
-          updateTestRunStatus(id: $testRunId, status: $status)
-        }
+    update_test_results(token, [run_id], status)
+ 
+ 
+# =====================================
+#  Upload Pipeline
+# =====================================
+ 
+def upload_test_cases(token, summary, test_cases):
     """
-    url = f"{XRAY_URL}/graphql"
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-    variables = {"testRunId": run_id, "status": status}
-    r = requests.post(url, headers=headers, json={"query": query, "variables": variables})
-    if not r.ok:
-        print(f" Error updating test result: {r.status_code} - {r.text}")
-    else:
-        print(f" Updated test run {run_id} - {status}")
+    Create every Test in bulk, add each test's steps concurrently (rate limited),
+    then create the Test Execution, link all tests in one call, fetch their runs in one
+    paged query and mark them TODO in batched mutations.
+    Tests that could not be created, given their steps or linked are reported per test instead
+    of aborting the upload, so the issues already created are never lost to the caller; raises
+    only when no Test was created at all.
+    Returns {"exec_key", "exec_id", "test_keys", "errors"}; exec_key is None if the execution failed.
+    """
+    tests, errors = create_issues_bulk([tc.title for tc in test_cases], "Test")
+    created = [(test, tc) for test, tc in zip(tests, test_cases) if test is not None]
+    if not created:
+        raise Exception(f"Bulk issue creation failed: {errors}")
+    for test, _ in created:
+        print(f" 🧪 Created Test issue: {test['key']} (id={test['id']})")
+
+    def add_steps(pair):
+        test, tc = pair
+        try:
+            add_jira_test_steps_bulk(token, test["id"], tc.steps)
+        except Exception as e:
+            return {"summary": tc.title, "key": test["key"], "error": f"Failed to add steps: {e}"}
+
+    with ThreadPoolExecutor(max_workers=XRAY_MAX_WORKERS) as pool:
+        errors.extend(error for error in pool.map(add_steps, created) if error)
+
+    result = {"exec_key": None, "exec_id": None, "test_keys": [test["key"] for test, _ in created], "errors": errors}
+    print("\n ==> Test Cases created. Now creating Test Execution and linking tests...\n")
+    try:
+        exec_issue = create_issue(f"Execution - {summary}", "Test Execution")
+    except Exception as e:
+        print(f" ❌ Test Execution creation failed: {e}")
+        errors.append({"summary": f"Execution - {summary}", "key": None, "error": str(e)})
+        return result
+    result["exec_key"], result["exec_id"] = exec_issue["key"], exec_issue["id"]
+    print(f"🧪 Created Test Execution: {exec_issue['key']} (id={exec_issue['id']})")
+
+    try:
+        linked = set(link_tests_to_execution(token, exec_issue["id"], [test["id"] for test, _ in created]))
+        link_error = "Not added by Xray"
+    except Exception as e:
+        linked, link_error = set(), str(e)
+    for test, tc in created:
+        if str(test["id"]) not in linked:
+            errors.append({"summary": tc.title, "key": test["key"], "error": f"Failed to link to {exec_issue['key']}: {link_error}"})
+    if not linked:
+        return result
+
+    # only linked tests get a run, so only they are polled for and marked TODO
+    try:
+        run_ids = get_test_run_ids(token, exec_issue["id"], linked)
+        update_test_results(token, run_ids.values(), "TODO")
+    except Exception as e:
+        print(f" ❌ Test Execution setup failed: {e}")
+        errors.append({"summary": f"Execution - {summary}", "key": exec_issue["key"], "error": str(e)})
+    return result
  
  
 # =====================================
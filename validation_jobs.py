@@ -0,0 +1,121 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from generate_test_scripts import validate_testcases_async
+from generation_cache import get_generation_cache
+
+load_dotenv()
+
+# off        -> never call the validator agent
+# background -> return as soon as generation is done, validate in a fire-and-forget task
+# blocking   -> validate the returned test cases before responding
+VALIDATION_MODES = ("off", "background", "blocking")
+VALIDATION_MODE = os.getenv("VALIDATION_MODE", "background").lower()
+VALIDATION_STORE_SIZE = int(os.getenv("VALIDATION_STORE_SIZE", "500"))
+
+if VALIDATION_MODE not in VALIDATION_MODES:
+    raise EnvironmentError(f"VALIDATION_MODE must be one of {', '.join(VALIDATION_MODES)}.")
+
+
+class ValidationStore:
+    """Bounded in-memory map of generation id -> validation record (oldest entries evicted first)."""
+
+    def __init__(self, max_entries=VALIDATION_STORE_SIZE):
+        self.max_entries = max_entries
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, generation_id, **record):
+        with self._lock:
+            entry = self._records.pop(generation_id, {"generation_id": generation_id})
+            entry.update(record, updated_at=time.time())
+            self._records[generation_id] = entry
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+            return dict(entry)
+
+    def get(self, generation_id):
+        with self._lock:
+            entry = self._records.get(generation_id)
+            return dict(entry) if entry else None
+
+
+validation_store = ValidationStore()
+# generation id -> pending task; also keeps a strong reference so the task is not garbage collected mid-flight
+_background_tasks = {}
+
+
+def new_generation_id() -> str:
+    return uuid.uuid4().hex
+
+
+def remember_verdict(cache_key, score, validation):
+    """Store a validator verdict with its cached generation, so later cache hits return it instead of validating again."""
+    cache = get_generation_cache()
+    cached = cache.get(cache_key)
+    if cached:
+        cache.set(cache_key, {**cached, "validator_score": score, "validation": validation})
+
+
+async def run_validation(generation_id, requirement, context, draft, cache_key=None, endpoint=None):
+    try:
+        validation = await validate_testcases_async(requirement, context, draft, endpoint)
+        score = validation.get("score") if isinstance(validation, dict) else None
+        print(f" 📊 Validator Score: {score}/5 (generation {generation_id})")
+        if cache_key:
+            await asyncio.to_thread(remember_verdict, cache_key, score, validation)
+        return validation_store.put(generation_id, status="DONE", score=score, validation=validation)
+    except Exception as e:
+        print(f" ⚠️ Validator failed: {e}")
+        return validation_store.put(generation_id, status="FAILED", error=str(e))
+
+
+def schedule_validation(generation_id, requirement, context, draft, cache_key=None, endpoint=None):
+    """Start validation as a fire-and-forget task on the running event loop."""
+    validation_store.put(generation_id, status="PENDING", validation=None)
+    task = asyncio.create_task(run_validation(generation_id, requirement, context, draft, cache_key, endpoint))
+    _background_tasks[generation_id] = task
+    task.add_done_callback(lambda _: _background_tasks.pop(generation_id, None))
+    return task
+
+
+async def wait_for_validation(generation_id):
+    """Wait for a scheduled validation to finish (without cancelling it if the waiter goes away)."""
+    task = _background_tasks.get(generation_id)
+    if task is not None:
+        await asyncio.shield(task)
+    return validation_store.get(generation_id)
+
+
+async def apply_validation(result, requirement, context, draft, mode=VALIDATION_MODE, cache_key=None, endpoint=None):
+    """
+    Attach a generation id to a generation result and validate it according to `mode`.
+    In background mode the result can be fetched later from `validation_store`.
+    A cached result that carries the verdict of an earlier validation returns that verdict;
+    a finished verdict is stored with the cache entry under `cache_key`.
+    The validator prompt is counted under `endpoint` in the prompt metrics.
+    """
+    generation_id = new_generation_id()
+    result["generation_id"] = generation_id
+    result["validation_mode"] = mode
+    cached_validation = result.pop("validation", None)
+
+    if result.get("cached") and cached_validation is not None:
+        validation_store.put(generation_id, status="DONE", score=result.get("validator_score"), validation=cached_validation)
+        result["validation_status"] = "DONE"
+    elif mode == "blocking":
+        record = await run_validation(generation_id, requirement, context, draft, cache_key, endpoint)
+        result["validation_status"] = record["status"]
+        result["validator_score"] = record.get("score")
+    elif mode == "background":
+        schedule_validation(generation_id, requirement, context, draft, cache_key, endpoint)
+        result["validation_status"] = "PENDING"
+    else:
+        result["validation_status"] = "SKIPPED"
+    return result